@@ -0,0 +1,304 @@
+"""Offline record/replay benchmark for the fact-check pipeline.
+
+Replays recorded LLM, Serper and web-page interactions from a fixture file, with
+optional artificial latency per dependency, and reports the p50/p95 of every
+pipeline stage (extract, questions, search, crawl, parse, analyze, report, explain).
+
+Run from certa-backend/:
+
+    python -m bench.replay_bench --fixture bench/fixtures/sample_article.json --runs 20 \\
+        --latency llm=0.8,report=2.0,search=0.4,crawl=0.3
+
+Record a new fixture against the live services (needs the usual API keys):
+
+    python -m bench.replay_bench --record bench/fixtures/my_article.json --text-file article.txt
+"""
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import argparse
+import itertools
+from unittest import mock
+
+from fc import serper_batcher, serper_search
+from fc.expAi import aexplain_factcheck_result, explain_factcheck_result
+from fc.fact_checker import FactChecker
+from fc.llm_client import LLMClient, TIMING_STAGES
+from fc.timing import STAGES, collect_timings, timed
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(q / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def parse_latency(spec: str) -> dict:
+    """"llm=0.8,report=2,search=0.4,crawl=0.3" -> {"llm": 0.8, ...} (seconds)."""
+    latency = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, _, value = item.partition("=")
+        latency[name.strip()] = float(value)
+    return latency
+
+
+class FakeResponse:
+    """Just enough of an httpx/requests response for the pipeline."""
+
+    def __init__(self, url: str = "", text: str = "", status_code: int = 200, pdf: bytes = None):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+        self.pdf = pdf
+        self.headers = {"content-type": "application/pdf" if pdf is not None else "text/html; charset=utf-8"}
+
+
+class Replayer:
+    """Serves recorded interactions in place of Gemini/Groq, Serper and the crawler."""
+
+    def __init__(self, fixture: dict, latency: dict):
+        self.fixture = fixture
+        self.latency = latency
+        self._by_hash = {}
+        self._cycles = {}
+        for stage, entries in fixture["llm"].items():
+            self._by_hash.update({(stage, e["prompt_hash"]): e["response"] for e in entries if e.get("prompt_hash")})
+            self._cycles[stage] = itertools.cycle([e["response"] for e in entries])
+
+    def _llm_delay(self, stage: str) -> float:
+        return self.latency.get(stage, self.latency.get("llm", 0.0))
+
+    def llm_response(self, stage: str, prompt: str) -> dict:
+        # Exact prompt match first, recorded order otherwise (hand-written fixtures carry no hashes)
+        response = self._by_hash.get((stage, prompt_hash(prompt)))
+        if response is None:
+            response = next(self._cycles[stage])
+        return json.loads(json.dumps(response))
+
+    def complete_json(self, client, stage: str, prompt: str) -> dict:
+        with timed(TIMING_STAGES.get(stage, stage)):
+            time.sleep(self._llm_delay(stage))
+            return self.llm_response(stage, prompt)
+
+    async def acomplete_json(self, client, stage: str, prompt: str) -> dict:
+        with timed(TIMING_STAGES.get(stage, stage)):
+            await asyncio.sleep(self._llm_delay(stage))
+            return self.llm_response(stage, prompt)
+
+    def post_serper(self, api_key: str, queries):
+        # Sent from the batcher's worker threads, for sync and async pipelines alike
+        time.sleep(self.latency.get("search", 0.0))
+        return [
+            self.fixture["serper"].get(query["q"], {"searchParameters": {"q": query["q"]}, "organic": []})
+            for query in queries
+        ]
+
+    def page(self, url: str):
+        page = self.fixture["pages"].get(url)
+        if page is None or page["status"] != 200:
+            return False, None
+        # PDFs are recorded base64-encoded, replayed as bytes so that they go through PDF extraction
+        pdf = base64.b64decode(page["pdf"]) if page.get("pdf") is not None else None
+        return True, FakeResponse(url=url, text=page["text"], status_code=page["status"], pdf=pdf)
+
+    def crawl_web(self, query_url_dict: dict, anchors: dict = None):
+        # Pages are fetched concurrently, so one crawl costs a single page latency
+        time.sleep(self.latency.get("crawl", 0.0))
+        return [(*self.page(url), url, query) for query, urls in query_url_dict.items() for url in urls]
+
+    async def acrawl_web(self, query_url_dict: dict, anchors: dict = None):
+        await asyncio.sleep(self.latency.get("crawl", 0.0))
+        return [(*self.page(url), url, query) for query, urls in query_url_dict.items() for url in urls]
+
+    def patches(self):
+        replayer = self
+        return [
+            mock.patch.object(LLMClient, "complete_json", lambda c, s, p: replayer.complete_json(c, s, p)),
+            mock.patch.object(LLMClient, "acomplete_json", lambda c, s, p: replayer.acomplete_json(c, s, p)),
+            mock.patch.object(serper_batcher, "post_serper", replayer.post_serper),
+            mock.patch.object(serper_search, "crawl_web", replayer.crawl_web),
+            mock.patch.object(serper_search, "acrawl_web", replayer.acrawl_web),
+        ]
+
+
+class Recorder:
+    """Wraps the live dependencies and captures every interaction into a fixture."""
+
+    def __init__(self, news_text: str):
+        self.fixture = {"news_text": news_text, "llm": {}, "serper": {}, "pages": {}}
+        self._complete_json = LLMClient.complete_json
+        self._acomplete_json = LLMClient.acomplete_json
+        self._post_serper = serper_batcher.post_serper
+        self._crawl_web = serper_search.crawl_web
+        self._acrawl_web = serper_search.acrawl_web
+
+    def _record_llm(self, stage: str, prompt: str, response: dict):
+        self.fixture["llm"].setdefault(stage, []).append({"prompt_hash": prompt_hash(prompt), "response": response})
+
+    def _record_pages(self, responses):
+        for flag, response, url, _ in responses:
+            if not flag:
+                self.fixture["pages"][url] = {"status": 0, "text": ""}
+                continue
+            page = {"status": response.status_code, "text": response.text}
+            pdf = getattr(response, "pdf", None)
+            if pdf is not None:
+                page["pdf"] = base64.b64encode(pdf).decode("ascii")
+            self.fixture["pages"][url] = page
+
+    def _record_serper(self, queries, responses):
+        for query, data in zip(queries, responses):
+            self.fixture["serper"][query["q"]] = data
+
+    def patches(self):
+        recorder = self
+
+        def complete_json(client, stage, prompt):
+            response = recorder._complete_json(client, stage, prompt)
+            recorder._record_llm(stage, prompt, response)
+            return response
+
+        async def acomplete_json(client, stage, prompt):
+            response = await recorder._acomplete_json(client, stage, prompt)
+            recorder._record_llm(stage, prompt, response)
+            return response
+
+        def post_serper(api_key, queries):
+            responses = recorder._post_serper(api_key, queries)
+            recorder._record_serper(queries, responses)
+            return responses
+
+        def crawl_web(query_url_dict, anchors=None):
+            responses = recorder._crawl_web(query_url_dict, anchors)
+            recorder._record_pages(responses)
+            return responses
+
+        async def acrawl_web(query_url_dict, anchors=None):
+            responses = await recorder._acrawl_web(query_url_dict, anchors)
+            recorder._record_pages(responses)
+            return responses
+
+        return [
+            mock.patch.object(LLMClient, "complete_json", complete_json),
+            mock.patch.object(LLMClient, "acomplete_json", acomplete_json),
+            mock.patch.object(serper_batcher, "post_serper", post_serper),
+            mock.patch.object(serper_search, "crawl_web", crawl_web),
+            mock.patch.object(serper_search, "acrawl_web", acrawl_web),
+        ]
+
+
+def new_fact_checker() -> FactChecker:
+    # No verdict or search cache: every run must exercise the whole pipeline
+    fact_checker = FactChecker(
+        groq_api_key=os.getenv("GROQ_API_KEY", "replay"),
+        serper_api_key=os.getenv("SERPER_API_KEY", "replay"),
+        claim_cache=None,
+    )
+    fact_checker.search_client.serper_cache = None
+    fact_checker.search_client.evidence_index = None
+    return fact_checker
+
+
+async def run_async(news_text: str) -> dict:
+    report = await new_fact_checker().agenerate_report(news_text)
+    await aexplain_factcheck_result(report)
+    return report
+
+
+def run_sync(news_text: str) -> dict:
+    report = new_fact_checker().generate_report(news_text)
+    explain_factcheck_result(report)
+    return report
+
+
+def benchmark(news_text: str, runs: int, mode: str, concurrency: int) -> list:
+    """Run the pipeline runs times and return one {"total", <stage>...} dict of seconds per run."""
+    results = []
+    for _ in range(runs):
+        with collect_timings() as timings:
+            start = time.perf_counter()
+            if mode == "sync":
+                run_sync(news_text)
+            else:
+                async def run_batch():
+                    await asyncio.gather(*(run_async(news_text) for _ in range(concurrency)))
+                asyncio.run(run_batch())
+            total = time.perf_counter() - start
+        results.append({"total": total, **timings.totals()})
+    return results
+
+
+def print_report(results: list):
+    print(f"{'stage':<10} {'p50 (s)':>9} {'p95 (s)':>9}")
+    for stage in ("total",) + STAGES:
+        values = [run.get(stage, 0.0) for run in results]
+        print(f"{stage:<10} {percentile(values, 50):>9.3f} {percentile(values, 95):>9.3f}")
+    print("(stage times are summed over concurrent calls, so they can exceed the total wall time)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", help="fixture to replay")
+    parser.add_argument("--record", help="record the live pipeline into this fixture file")
+    parser.add_argument("--text", help="news text to record")
+    parser.add_argument("--text-file", help="file with the news text to record")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--mode", choices=("async", "sync"), default="async")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent pipelines per run (async mode)")
+    parser.add_argument("--latency", default="", help="seconds per call, e.g. llm=0.8,report=2,search=0.4,crawl=0.3")
+    args = parser.parse_args()
+    # Cached page texts and indexed evidence would bypass the search, crawl and parse stages
+    os.environ["FC_PAGE_CACHE"] = "0"
+    os.environ["FC_EVIDENCE_INDEX"] = "0"
+
+    if args.record:
+        news_text = args.text or (open(args.text_file, encoding="utf-8").read() if args.text_file else None)
+        if not news_text:
+            parser.error("--record needs --text or --text-file")
+        recorder = Recorder(news_text)
+        patches = recorder.patches()
+        for patch in patches:
+            patch.start()
+        try:
+            if args.mode == "sync":
+                run_sync(news_text)
+            else:
+                asyncio.run(run_async(news_text))
+        finally:
+            for patch in patches:
+                patch.stop()
+        with open(args.record, "w", encoding="utf-8") as f:
+            json.dump(recorder.fixture, f, indent=2)
+        print(f"Recorded fixture to {args.record}")
+        return
+
+    if not args.fixture:
+        parser.error("either --fixture or --record is required")
+    with open(args.fixture, encoding="utf-8") as f:
+        fixture = json.load(f)
+
+    replayer = Replayer(fixture, parse_latency(args.latency))
+    patches = replayer.patches()
+    for patch in patches:
+        patch.start()
+    try:
+        results = benchmark(fixture["news_text"], args.runs, args.mode, max(1, args.concurrency))
+    finally:
+        for patch in patches:
+            patch.stop()
+    print_report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
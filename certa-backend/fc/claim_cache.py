@@ -0,0 +1,321 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from .llm_client import embed_texts, aembed_texts
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("FC_CACHE_DIR", "cache")
+
+# Verdicts older than this are recomputed
+CLAIM_CACHE_TTL = float(os.getenv("FC_CLAIM_CACHE_TTL", str(24 * 60 * 60)))
+# Maximum number of cached verdicts, least recently used ones are evicted first
+CLAIM_CACHE_MAX_ENTRIES = int(os.getenv("FC_CLAIM_CACHE_MAX_ENTRIES", "5000"))
+# Minimum cosine similarity for a paraphrase to count as the same claim
+CLAIM_CACHE_SIMILARITY = float(os.getenv("FC_CLAIM_CACHE_SIMILARITY", "0.92"))
+# Seconds between the batched writes of the last-access times of cache hits
+CLAIM_CACHE_FLUSH_SECONDS = float(os.getenv("FC_CLAIM_CACHE_FLUSH_SECONDS", "30"))
+
+
+# Words that flip a claim, "n't" is split into "n t" by normalize_claim
+NEGATIONS = {"not", "no", "never", "nor", "none", "nobody", "nothing", "neither", "nowhere", "without", "cannot", "t"}
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def normalize_claim(claim: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial variants share a key."""
+    claim = re.sub(r"[^\w\s]", " ", claim.lower())
+    return " ".join(claim.split())
+
+
+def claim_signature(key: str) -> Tuple[List[int], int]:
+    """Numbers and negation count of a normalized claim.
+
+    Paraphrases differing in a number, a year or a negation embed close to each other
+    but can have opposite verdicts, so a semantic hit needs the same signature.
+    """
+    # normalize_claim splits "3.5" into "3 5", on both sides of the comparison
+    numbers = sorted(int(number) for number in _NUMBER_RE.findall(key))
+    negations = sum(1 for word in key.split() if word in NEGATIONS)
+    return numbers, negations
+
+
+class ClaimCache:
+    """Claim-level verdict cache with TTL, LRU eviction and an on-disk SQLite store.
+
+    Lookups first try the normalized claim text. On a miss, and when an embedding
+    function is configured, the claim embedding is compared against the cached
+    ones so close paraphrases are served from the cache as well, as long as they
+    have the same numbers and negations (see claim_signature). The claims of
+    one lookup are embedded together, with a single embedding call.
+
+    Lookups only touch memory: last-access times and expired entries are written
+    to SQLite in batches, on the next put or once CLAIM_CACHE_FLUSH_SECONDS have passed.
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "claim_cache.sqlite3"),
+        ttl: float = CLAIM_CACHE_TTL,
+        max_entries: int = CLAIM_CACHE_MAX_ENTRIES,
+        similarity_threshold: float = CLAIM_CACHE_SIMILARITY,
+        embed_fn: Callable[[List[str]], List[List[float]]] = None,
+        aembed_fn: Callable = None,
+    ):
+        """
+        Args:
+            path: SQLite file backing the cache. Use ":memory:" for a process-local cache.
+            ttl: seconds a verdict stays valid.
+            max_entries: maximum number of verdicts kept.
+            similarity_threshold: minimum cosine similarity for a semantic hit.
+            embed_fn: texts -> one embedding per text, enables the semantic fallback.
+            aembed_fn: awaitable texts -> embeddings, used by aget. Without it aget runs embed_fn in a thread.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self.aembed_fn = aembed_fn
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # key -> (value, embedding, created_at), most recently used last
+        self._entries = OrderedDict()
+        # Embeddings computed on a miss, reused by the following put
+        self._recent_embeddings = OrderedDict()
+        # (keys, row-normalized embeddings) of the entries with an embedding, rebuilt after a change
+        self._matrix = None
+        # Writes deferred by lookups: key -> last access time, and keys of expired entries
+        self._accessed = {}
+        self._expired = set()
+        self._flushed_at = time.monotonic()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS claims ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, embedding TEXT, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self._db.execute("DELETE FROM claims WHERE created_at < ?", (cutoff,))
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT key, value, embedding, created_at FROM claims ORDER BY last_access DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+            for key, value, embedding, created_at in reversed(rows):
+                embedding = np.asarray(json.loads(embedding), dtype=np.float32) if embedding else None
+                self._entries[key] = (json.loads(value), embedding, created_at)
+
+    def _remember_embedding(self, key: str, embedding):
+        with self._lock:
+            self._recent_embeddings[key] = embedding
+            while len(self._recent_embeddings) > 256:
+                self._recent_embeddings.popitem(last=False)
+
+    def _touch(self, key: str):
+        # Caller holds the lock
+        self._entries.move_to_end(key)
+        self._accessed[key] = time.time()
+
+    def _lookup_exact(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, _, created_at = entry
+            if time.time() - created_at > self.ttl:
+                self._forget(key)
+                self._expired.add(key)
+                return None
+            self._touch(key)
+            return value
+
+    def _similarity_matrix(self):
+        # Caller holds the lock
+        if self._matrix is None:
+            keys = [k for k, (_, e, _) in self._entries.items() if e is not None]
+            matrix = np.stack([self._entries[k][1] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+            if keys:
+                matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+            self._matrix = (keys, matrix)
+        return self._matrix
+
+    def _lookup_similar(self, key: str, embedding) -> Optional[Dict]:
+        signature = claim_signature(key)
+        with self._lock:
+            keys, matrix = self._similarity_matrix()
+            if not keys:
+                return None
+            scores = matrix @ (embedding / (np.linalg.norm(embedding) + 1e-12))
+            now = time.time()
+            for best in np.argsort(-scores):
+                if scores[best] < self.similarity_threshold:
+                    return None
+                entry = self._entries.get(keys[best])
+                # Expired entries stay in the matrix until the next rebuild
+                if entry is None or now - entry[2] > self.ttl:
+                    continue
+                if claim_signature(keys[best]) == signature:
+                    self._touch(keys[best])
+                    return entry[0]
+            return None
+
+    def _record(self, value, semantic: bool = False):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.semantic_hits += int(semantic)
+        return value
+
+    def _exact_lookups(self, claims: List[str]):
+        """Exact lookup of every claim: (keys, values, indices of the misses)."""
+        keys = [normalize_claim(claim) for claim in claims]
+        values = [self._lookup_exact(key) for key in keys]
+        return keys, values, [i for i, value in enumerate(values) if value is None]
+
+    def _similar_lookups(self, keys: List[str], values: List, misses: List[int], embeddings) -> List[Optional[Dict]]:
+        for i, embedding in zip(misses, embeddings):
+            embedding = np.asarray(embedding, dtype=np.float32)
+            self._remember_embedding(keys[i], embedding)
+            values[i] = self._lookup_similar(keys[i], embedding)
+        for i, value in enumerate(values):
+            self._record(value, semantic=i in misses)
+        return values
+
+    def get_many(self, claims: List[str]) -> List[Optional[Dict]]:
+        """Cached verdict of every claim or of a close paraphrase, None for the misses.
+
+        The exact misses are embedded with a single embed_fn call.
+        """
+        keys, values, misses = self._exact_lookups(claims)
+        embeddings = []
+        if misses and self.embed_fn is not None:
+            try:
+                embeddings = self.embed_fn([claims[i] for i in misses])
+            except Exception as e:
+                logger.warning(f"Claim embedding failed, skipping semantic lookup: {e}")
+        values = self._similar_lookups(keys, values, misses if embeddings else [], embeddings)
+        if self._flush_due():
+            self.flush()
+        return values
+
+    async def aget_many(self, claims: List[str]) -> List[Optional[Dict]]:
+        """Awaitable get_many, the embedding call and database writes do not block the event loop."""
+        keys, values, misses = self._exact_lookups(claims)
+        embeddings = []
+        if misses and (self.aembed_fn is not None or self.embed_fn is not None):
+            texts = [claims[i] for i in misses]
+            try:
+                if self.aembed_fn is not None:
+                    embeddings = await self.aembed_fn(texts)
+                else:
+                    embeddings = await asyncio.to_thread(self.embed_fn, texts)
+            except Exception as e:
+                logger.warning(f"Claim embedding failed, skipping semantic lookup: {e}")
+        values = self._similar_lookups(keys, values, misses if embeddings else [], embeddings)
+        if self._flush_due():
+            await asyncio.to_thread(self.flush)
+        return values
+
+    def get(self, claim: str) -> Optional[Dict]:
+        """Return the cached verdict for the claim or a close paraphrase, None on a miss."""
+        return self.get_many([claim])[0]
+
+    async def aget(self, claim: str) -> Optional[Dict]:
+        """Awaitable get"""
+        return (await self.aget_many([claim]))[0]
+
+    def put(self, claim: str, value: Dict):
+        """Store a verdict, evicting the least recently used entries beyond max_entries."""
+        key = normalize_claim(claim)
+        now = time.time()
+        with self._lock:
+            embedding = self._recent_embeddings.pop(key, None)
+            self._forget(key)
+            self._entries[key] = (value, embedding, now)
+            self._expired.discard(key)
+            if embedding is not None:
+                self._matrix = None
+            self._db.execute(
+                "INSERT OR REPLACE INTO claims (key, value, embedding, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), json.dumps(embedding.tolist()) if embedding is not None else None, now, now),
+            )
+            while len(self._entries) > self.max_entries:
+                evicted = next(iter(self._entries))
+                self._forget(evicted)
+                self._db.execute("DELETE FROM claims WHERE key = ?", (evicted,))
+            self._flush_locked()
+
+    async def aput(self, claim: str, value: Dict):
+        """Awaitable put, the SQLite write runs in a worker thread."""
+        await asyncio.to_thread(self.put, claim, value)
+
+    def _forget(self, key: str):
+        # Caller holds the lock
+        entry = self._entries.pop(key, None)
+        self._accessed.pop(key, None)
+        if entry is not None and entry[1] is not None:
+            self._matrix = None
+
+    def _flush_due(self) -> bool:
+        return bool(self._accessed or self._expired) and time.monotonic() - self._flushed_at >= CLAIM_CACHE_FLUSH_SECONDS
+
+    def flush(self):
+        """Write the deferred last-access times and deletions to SQLite."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        accessed, self._accessed = self._accessed, {}
+        expired, self._expired = self._expired, set()
+        self._db.executemany("UPDATE claims SET last_access = ? WHERE key = ?", [(t, k) for k, t in accessed.items()])
+        self._db.executemany("DELETE FROM claims WHERE key = ?", [(k,) for k in expired])
+        self._db.commit()
+        self._flushed_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
+
+
+_claim_cache = None
+_claim_cache_lock = threading.Lock()
+
+
+def get_claim_cache() -> Optional[ClaimCache]:
+    """Process-wide claim cache, None when disabled with FC_CLAIM_CACHE=0."""
+    global _claim_cache
+    if os.getenv("FC_CLAIM_CACHE", "1") != "1":
+        return None
+    if _claim_cache is None:
+        with _claim_cache_lock:
+            if _claim_cache is None:
+                semantic = os.getenv("FC_CLAIM_CACHE_SEMANTIC", "1") == "1"
+                _claim_cache = ClaimCache(
+                    embed_fn=embed_texts if semantic else None,
+                    aembed_fn=aembed_texts if semantic else None,
+                )
+    return _claim_cache
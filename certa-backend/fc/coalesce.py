@@ -0,0 +1,95 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that do not change the page content
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref", "cmpid")
+
+
+def text_key(text: str) -> str:
+    """Coalescing key for a piece of news text: whitespace and case do not matter."""
+    normalized = " ".join(text.lower().split())
+    return "text:" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def canonical_url(url: str) -> str:
+    """Lowercase scheme and host, drop the fragment, tracking parameters and trailing slash, sort the query."""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMS)
+    )
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), host, path, urlencode(query), ""))
+
+
+def url_key(url: str) -> str:
+    return "url:" + hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Run one computation per key at a time and share its result.
+
+    Concurrent callers with the same key await the computation already in flight.
+    Successful results are retained for retain_seconds so that late arrivals get
+    them without recomputing. Failures are not retained.
+    """
+
+    def __init__(
+        self,
+        retain_seconds: float = float(os.getenv("FC_COALESCE_RETAIN_SECONDS", "30")),
+        max_retained: int = 256,
+    ):
+        self.retain_seconds = retain_seconds
+        self.max_retained = max_retained
+        self._in_flight = {}
+        # key -> (result, finished_at), oldest first
+        self._retained = OrderedDict()
+        self.shared = 0
+
+    def _retained_result(self, key: str):
+        entry = self._retained.get(key)
+        if entry is None:
+            return False, None
+        result, finished_at = entry
+        if time.monotonic() - finished_at > self.retain_seconds:
+            del self._retained[key]
+            return False, None
+        return True, result
+
+    def _retain(self, key: str, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._retained[key] = (task.result(), time.monotonic())
+        self._retained.move_to_end(key)
+        while len(self._retained) > self.max_retained:
+            self._retained.popitem(last=False)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return fn()'s result, sharing it with every concurrent or recent caller of the same key."""
+        found, result = self._retained_result(key)
+        if found:
+            self.shared += 1
+            return result
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._retain(key, t))
+        else:
+            self.shared += 1
+            logger.info(f"Coalesced request {key[:16]}... onto the computation in flight")
+        # A caller going away must not cancel the computation the others are waiting on
+        return await asyncio.shield(task)
@@ -0,0 +1,516 @@
+import os
+import re
+import html
+import time
+import codecs
+import asyncio
+import logging
+import threading
+from collections import Counter, OrderedDict
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from .snippet_anchor import find_anchor
+from .page_cache import get_page_cache
+from .fetch_scheduler import FetchScheduler
+from .pdf_text import PDF_MAX_BYTES, pdf_available
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:65.0) Gecko/20100101 Firefox/65.0"
+headers = {"User-Agent": USER_AGENT}
+
+# Pages fetched at the same time across all requests
+CRAWL_MAX_CONNECTIONS = int(os.getenv("FC_CRAWL_MAX_CONNECTIONS", "64"))
+# Pages fetched at the same time from one host
+CRAWL_MAX_PER_HOST = int(os.getenv("FC_CRAWL_MAX_PER_HOST", "6"))
+# Hosts whose connection limit is tracked, idle ones beyond this are forgotten first
+CRAWL_MAX_HOSTS = int(os.getenv("FC_CRAWL_MAX_HOSTS", "1024"))
+# Timeout of a host the crawler has no latency history for, see FetchScheduler
+CRAWL_TIMEOUT = float(os.getenv("FC_CRAWL_TIMEOUT", "3"))
+# Idle keep-alive connections are closed after this many seconds
+CRAWL_KEEPALIVE_EXPIRY = float(os.getenv("FC_CRAWL_KEEPALIVE_EXPIRY", "30"))
+# Bytes read per page at most, the rest of the page is dropped
+CRAWL_MAX_BYTES = int(os.getenv("FC_CRAWL_MAX_BYTES", str(2 * 1024 * 1024)))
+# Seconds spent reading one page body at most
+CRAWL_MAX_READ_SECONDS = float(os.getenv("FC_CRAWL_MAX_READ_SECONDS", "6"))
+# Visible characters read past the last anchor before the download stops.
+# The snippet extension keeps 500 characters after the snippet, the rest is margin.
+CRAWL_POST_CONTEXT = int(os.getenv("FC_CRAWL_POST_CONTEXT", "1000"))
+# Anchor score needed to stop early, stricter than the snippet extension's so a
+# better match further down the page is unlikely to be cut off
+CRAWL_ANCHOR_MIN_SCORE = float(os.getenv("FC_CRAWL_ANCHOR_MIN_SCORE", "0.8"))
+# Pages with any other content type are not downloaded, except PDFs when they can be
+# extracted. A missing header is accepted.
+CRAWL_CONTENT_TYPES = tuple(
+    t.strip() for t in os.getenv("FC_CRAWL_CONTENT_TYPES", "text/html,application/xhtml+xml,text/plain").split(",") if t.strip()
+)
+
+_TAG_RE = re.compile(r"<[^>]*>")
+# Elements whose content is not visible text, as in html_text, and comments. The
+# head itself is not skipped as its closing tag is optional; its script, style and title are.
+_HIDDEN_OPEN_RE = re.compile(r"<(script|style|title)\b[^>]*>|<!--", re.I)
+_HIDDEN_CLOSE_RES = {name: re.compile(rf"</{name}\s*>", re.I) for name in ("script", "style", "title")}
+_HIDDEN_CLOSE_RES["<!--"] = re.compile(r"-->")
+
+
+def _allowed_content_type(content_type: str) -> bool:
+    if not content_type:
+        return True
+    return content_type.split(";")[0].strip().lower() in CRAWL_CONTENT_TYPES
+
+
+def _is_pdf(response: httpx.Response) -> bool:
+    content_type = (response.headers.get("content-type") or "").split(";")[0].strip().lower()
+    if content_type == "application/pdf":
+        return True
+    return content_type in ("", "application/octet-stream") and response.url.path.lower().endswith(".pdf")
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+@dataclass
+class PageResponse:
+    """A fetched page. text may be cut short, see truncated.
+
+    When extracted is set, text is the page's visible text from the page cache
+    rather than its HTML. For a PDF, pdf holds the document and text is empty.
+    """
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    text: str
+    truncated: bool = False
+    extracted: bool = False
+    pdf: Optional[bytes] = None
+
+
+class AnchorWatcher:
+    """Follows the visible text of an HTML page while it streams in.
+
+    Reports when every anchor (search-result snippet) has been seen followed by
+    post_context characters, after which the rest of the page is not needed.
+    Anchors are located with find_anchor, like the snippet extension does.
+    """
+
+    def __init__(
+        self, anchors: List[str], post_context: int = CRAWL_POST_CONTEXT, min_score: float = CRAWL_ANCHOR_MIN_SCORE
+    ):
+        self.anchors = [anchor for anchor in anchors if anchor and anchor.strip()]
+        self.post_context = post_context
+        self.min_score = min_score
+        self.text = ""
+        self._pending = ""
+        # Closing tag of the hidden block being skipped
+        self._closing = None
+        self._ends = {}
+
+    def feed(self, chunk: str) -> bool:
+        """Add decoded page content, True once the rest of the page can be skipped."""
+        if not self.anchors:
+            return False
+        self._pending += chunk
+        visible = _normalize_text(html.unescape(_TAG_RE.sub(" ", self._visible_markup())))
+        if not visible:
+            return self._done()
+
+        searched = len(self.text)
+        self.text = f"{self.text} {visible}" if self.text else visible
+        for i, anchor in enumerate(self.anchors):
+            if i not in self._ends:
+                # Only the new text plus enough overlap to hold a match window
+                region_start = max(0, searched - 2 * len(anchor) - 500)
+                found = find_anchor(self.text[region_start:], anchor, self.min_score)
+                if found is not None:
+                    self._ends[i] = region_start + found[1]
+        return self._done()
+
+    def _visible_markup(self) -> str:
+        """Consume the complete part of the pending markup, without script, style and title blocks and comments."""
+        parts = []
+        while self._pending:
+            if self._closing is not None:
+                match = self._closing.search(self._pending)
+                if match is None:
+                    # Still inside the block, keep what may be the start of its closing tag
+                    self._pending = self._pending[-16:]
+                    break
+                self._pending = self._pending[match.end():]
+                self._closing = None
+                continue
+            match = _HIDDEN_OPEN_RE.search(self._pending)
+            if match is not None:
+                parts.append(self._pending[: match.start()])
+                self._closing = _HIDDEN_CLOSE_RES[(match.group(1) or match.group(0)).lower()]
+                self._pending = self._pending[match.end():]
+                continue
+            # Keep an unfinished tag for the next chunk
+            cut = self._pending.rfind("<")
+            if cut == -1 or self._pending.find(">", cut) != -1 or len(self._pending) - cut > 4096:
+                cut = len(self._pending)
+            parts.append(self._pending[:cut])
+            self._pending = self._pending[cut:]
+            break
+        return " ".join(parts)
+
+    def _done(self) -> bool:
+        if len(self._ends) < len(self.anchors):
+            return False
+        return len(self.text) >= max(self._ends.values()) + self.post_context
+
+
+def _http2_available() -> bool:
+    if os.getenv("FC_CRAWL_HTTP2", "1") != "1":
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Crawler:
+    """Long-lived, pooled HTTP client for fetching evidence pages.
+
+    The client lives on its own event loop in a background thread, so that
+    connections (keep-alive, HTTP/2) are reused by every caller: the request
+    handlers' event loop as well as worker threads running the sync pipeline.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = CRAWL_MAX_CONNECTIONS,
+        max_per_host: int = CRAWL_MAX_PER_HOST,
+        timeout: float = CRAWL_TIMEOUT,
+        http2: bool = None,
+        max_bytes: int = CRAWL_MAX_BYTES,
+        max_read_seconds: float = CRAWL_MAX_READ_SECONDS,
+        scheduler: FetchScheduler = None,
+        transport: httpx.AsyncBaseTransport = None,
+    ):
+        """
+        Args:
+            max_connections: maximum number of pages fetched at the same time.
+            max_per_host: maximum number of pages fetched at the same time from one host.
+            timeout: seconds to connect and between received chunks, for hosts without
+                latency history. Afterwards the scheduler derives it per host.
+            http2: negotiate HTTP/2 when the server supports it. Defaults to on when h2 is installed.
+            max_bytes: bytes read per page at most.
+            max_read_seconds: seconds spent reading one page body at most.
+            scheduler: per-host timeouts, hedging and circuit breaking. Defaults to a new one.
+            transport: sends the requests instead of a pooled connection transport, e.g. httpx.MockTransport.
+        """
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_read_seconds = max_read_seconds
+        self.http2 = _http2_available() if http2 is None else http2
+        self.scheduler = scheduler or FetchScheduler(default_timeout=timeout)
+        self.transport = transport
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._slots = None
+        # host -> semaphore, least recently used first, and fetches holding or waiting for each
+        self._host_slots = OrderedDict()
+        self._host_users = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def start(self):
+        """Start the crawler loop and client, a no-op when already running."""
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="crawler", daemon=True)
+            thread.start()
+            asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+            self._loop, self._thread = loop, thread
+        logger.info(f"Crawler started (max {self.max_connections} connections, {self.max_per_host} per host, http2={self.http2})")
+
+    def stop(self):
+        """Close the client and stop the crawler loop. Blocks until done."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None:
+                return
+            self._loop = self._thread = None
+        asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+        # Body streams closed early leave their async generators to finalize
+        asyncio.run_coroutine_threadsafe(loop.shutdown_asyncgens(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    async def _open(self):
+        transport = self.transport or httpx.AsyncHTTPTransport(
+            # Hedged requests take over from most connection retries
+            retries=1,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=CRAWL_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self._client = httpx.AsyncClient(transport=transport, headers=headers, timeout=self.timeout)
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self._host_slots = OrderedDict()
+        self._host_users = Counter()
+
+    async def _close(self):
+        await self._client.aclose()
+        self._client = None
+
+    def _host_slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+            if len(self._host_slots) > CRAWL_MAX_HOSTS:
+                # Hosts with a fetch under way keep their semaphore
+                idle = [h for h in self._host_slots if not self._host_users[h] and h != host]
+                for evicted in idle[: len(self._host_slots) - CRAWL_MAX_HOSTS]:
+                    del self._host_slots[evicted]
+        else:
+            self._host_slots.move_to_end(host)
+        return slot
+
+    def _release_host(self, host: str):
+        self._host_users[host] -= 1
+        if not self._host_users[host]:
+            del self._host_users[host]
+
+    async def _read_text(self, response: httpx.Response, anchors: List[str] = None):
+        """Stream the body within the byte and time budgets, stopping early once the anchors are covered.
+
+        Returns:
+            tuple[str, bool]: the decoded text and whether the page was cut short.
+        """
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        watcher = AnchorWatcher(anchors) if anchors else None
+        deadline = time.monotonic() + self.max_read_seconds
+        parts = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            if received + len(chunk) > self.max_bytes:
+                parts.append(decoder.decode(chunk[: self.max_bytes - received]))
+                return "".join(parts), True
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if (watcher is not None and watcher.feed(text)) or time.monotonic() > deadline:
+                return "".join(parts), True
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts), False
+
+    async def _read_bytes(self, response: httpx.Response, max_bytes: int):
+        """Read a binary body within the byte and time budgets.
+
+        Returns:
+            tuple[bytes, bool]: the body and whether it was cut short.
+        """
+        deadline = time.monotonic() + self.max_read_seconds
+        parts = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            if received + len(chunk) > max_bytes:
+                parts.append(chunk[: max_bytes - received])
+                return b"".join(parts), True
+            received += len(chunk)
+            parts.append(chunk)
+            if time.monotonic() > deadline:
+                return b"".join(parts), True
+        return b"".join(parts), False
+
+    def _cached_page(self, url: str, anchors: List[str] = None):
+        """Usable page cache entry for the url, None when the page must be downloaded.
+
+        A page cut short when it was crawled is only usable if it covers the anchors.
+        Reads SQLite and scans the page, so it is run in a worker thread. A failing cache counts as a miss.
+        """
+        cache = get_page_cache()
+        try:
+            entry = cache.get(url) if cache is not None else None
+            if entry is None:
+                return None
+            if entry["truncated"] and not (anchors and AnchorWatcher(anchors).feed(entry["text"])):
+                return None
+        except Exception as e:
+            logger.warning(f"Page cache lookup failed for {url}: {e}")
+            return None
+        return entry
+
+    def _touch_cached_page(self, url: str):
+        try:
+            get_page_cache().touch(url)
+        except Exception as e:
+            logger.warning(f"Failed to refresh the page cache entry of {url}: {e}")
+
+    def _cached_response(self, entry: dict) -> PageResponse:
+        return PageResponse(
+            url=entry["url"], status_code=200, headers={}, text=entry["text"], truncated=entry["truncated"], extracted=True
+        )
+
+    async def _open_response(self, url: str, host: str, conditional: dict):
+        """Send one GET of the url and wait for its response headers.
+
+        The connection slots are held until the returned stack is closed, which also
+        closes the response. Only the time to the headers is reported to the scheduler.
+
+        Returns:
+            tuple[AsyncExitStack, httpx.Response]: the stack owning the streamed response, and the response.
+        """
+        stack = AsyncExitStack()
+        try:
+            self._host_users[host] += 1
+            stack.callback(self._release_host, host)
+            await stack.enter_async_context(self._slots)
+            await stack.enter_async_context(self._host_slot(host))
+            started = time.monotonic()
+            stream = self._client.stream(
+                "GET", url, headers=conditional or None, timeout=self.scheduler.timeout(host)
+            )
+            try:
+                response = await stack.enter_async_context(stream)
+            except Exception:
+                self.scheduler.record(host, time.monotonic() - started, ok=False)
+                raise
+            self.scheduler.record(host, time.monotonic() - started, ok=response.status_code < 500)
+            return stack, response
+        except BaseException:
+            # Failed, or cancelled as the losing hedge
+            await stack.aclose()
+            raise
+
+    async def _read_body(self, response: httpx.Response, anchors: List[str]):
+        """Read the body of a response.
+
+        Returns:
+            tuple[str | bytes, bool]: its text (bytes for a PDF) and whether it was cut short.
+            The body is None when the response is not a page to read.
+        """
+        if response.status_code != 200:
+            return None, False
+        if pdf_available() and _is_pdf(response):
+            return await self._read_bytes(response, PDF_MAX_BYTES)
+        if not _allowed_content_type(response.headers.get("content-type")):
+            return None, False
+        return await self._read_text(response, anchors)
+
+    async def _fetch(self, url: str, anchors: List[str] = None):
+        host = urlsplit(url).netloc.lower()
+        cache = get_page_cache()
+        entry = await asyncio.to_thread(self._cached_page, url, anchors) if cache is not None else None
+        if entry is not None and entry["fresh"]:
+            cache.hits += 1
+            return True, self._cached_response(entry)
+        if not self.scheduler.allow(host):
+            # The host is failing: a stale copy beats no page at all
+            if entry is None:
+                return False, None
+            cache.hits += 1
+            return True, self._cached_response(entry)
+
+        conditional = {}
+        if entry is not None:
+            if entry["etag"]:
+                conditional["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                conditional["If-Modified-Since"] = entry["last_modified"]
+
+        async def discard(opened):
+            await opened[0].aclose()
+
+        # Hedged requests race up to the response headers; only the winner's body is downloaded
+        try:
+            stack, response = await self.scheduler.run(
+                host, lambda: self._open_response(url, host, conditional), discard=discard
+            )
+        except Exception as e:  # noqa: F841
+            return False, None
+        async with stack:
+            try:
+                body, truncated = await self._read_body(response, anchors)
+            except Exception as e:  # noqa: F841
+                return False, None
+
+        if response.status_code == 304 and entry is not None:
+            cache.revalidated += 1
+            await asyncio.to_thread(self._touch_cached_page, url)
+            return True, self._cached_response(entry)
+        if cache is not None:
+            cache.misses += 1
+        if body is None:
+            return False, None
+        is_pdf = isinstance(body, bytes)
+        return True, PageResponse(
+            url=str(response.url),
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            text="" if is_pdf else body,
+            truncated=truncated,
+            pdf=body if is_pdf else None,
+        )
+
+    async def _crawl(self, query_url_dict: dict, anchors: Dict[str, List[str]] = None):
+        anchors = anchors or {}
+        pairs = [(query, url) for query, urls in query_url_dict.items() for url in urls]
+        # One fetch per distinct url, shared by every query that found it
+        fetches = {}
+        for _, url in pairs:
+            if url not in fetches:
+                fetches[url] = asyncio.ensure_future(self._fetch(url, anchors.get(url)))
+        await asyncio.gather(*fetches.values())
+        return [(*fetches[url].result(), url, query) for query, url in pairs]
+
+    def crawl(self, query_url_dict: dict, anchors: Dict[str, List[str]] = None):
+        """Fetch every url of {query: [urls]}, blocking the calling thread.
+
+        A url listed under several queries is fetched once.
+
+        Args:
+            query_url_dict: urls to fetch, grouped by the query that found them.
+            anchors: optional {url: [snippets]}. The download of a page stops once all
+                of its snippets and the text following them have been received.
+
+        Returns:
+            list[tuple]: (success, PageResponse or None, url, query) per url, in input order.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._crawl(query_url_dict, anchors), self._loop).result()
+
+    async def acrawl(self, query_url_dict: dict, anchors: Dict[str, List[str]] = None):
+        """Awaitable crawl with the same result, safe to call from a running event loop.
+
+        The calling loop only waits on a future, so crawls of concurrent requests
+        interleave on the crawler loop instead of blocking each other.
+        """
+        self.start()
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self._crawl(query_url_dict, anchors), self._loop)
+        )
+
+
+_crawler = None
+_crawler_lock = threading.Lock()
+
+
+def get_crawler() -> Crawler:
+    """Process-wide crawler, started on first use if the app did not start it."""
+    global _crawler
+    if _crawler is None:
+        with _crawler_lock:
+            if _crawler is None:
+                _crawler = Crawler()
+    return _crawler
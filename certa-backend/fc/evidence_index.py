@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .coalesce import url_key
+from .evidence_ranker import tokenize
+from .llm_client import embed_texts
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("FC_CACHE_DIR", "cache")
+
+# Words per indexed passage, consecutive passages overlap by half
+INDEX_PASSAGE_WORDS = int(os.getenv("FC_INDEX_PASSAGE_WORDS", "120"))
+# Maximum number of indexed pages, the least recently indexed ones are dropped first
+INDEX_MAX_PAGES = int(os.getenv("FC_INDEX_MAX_PAGES", "5000"))
+# Pages indexed longer ago than this are not used as evidence, and dropped on the next write.
+# Defaults to the page cache TTL, after which a crawled page is not trusted without refetching it.
+INDEX_MAX_AGE = float(os.getenv("FC_INDEX_MAX_AGE", os.getenv("FC_PAGE_CACHE_TTL", str(7 * 24 * 60 * 60))))
+# A passage answers a query locally when it holds at least this fraction of the query's terms
+INDEX_MIN_COVERAGE = float(os.getenv("FC_INDEX_MIN_COVERAGE", "0.8"))
+# Lookups of one batch of queries run at the same time
+INDEX_LOOKUP_WORKERS = int(os.getenv("FC_INDEX_LOOKUP_WORKERS", "4"))
+# Query terms found in more than this fraction of the passages are left out of the
+# full-text match: their long posting lists cost most of the lookup and barely move BM25.
+# They still count towards a passage's coverage. Posting lists shorter than
+# INDEX_COMMON_TERM_MIN_DF are cheap and always matched.
+INDEX_COMMON_TERM_SHARE = float(os.getenv("FC_INDEX_COMMON_TERM_SHARE", "0.1"))
+INDEX_COMMON_TERM_MIN_DF = 500
+# Rank offset of the reciprocal rank fusion of the BM25 and dense rankings
+INDEX_RRF_K = 60
+# Texts per embedding call
+INDEX_EMBED_BATCH = 100
+# Bumped when the table layout changes, an older index is dropped and rebuilt from new crawls
+INDEX_SCHEMA_VERSION = 2
+
+
+def split_passages(text: str, words_per_passage: int = INDEX_PASSAGE_WORDS) -> List[str]:
+    """Overlapping passages of a page text, half a passage apart."""
+    words = text.split()
+    if len(words) <= words_per_passage:
+        return [" ".join(words)] if words else []
+    stride = max(1, words_per_passage // 2)
+    starts = range(0, len(words) - words_per_passage + stride, stride)
+    return [" ".join(words[start : start + words_per_passage]) for start in starts]
+
+
+class EvidenceIndex:
+    """On-disk BM25 index of the passages of already crawled pages, with optional dense vectors.
+
+    Passages live in SQLite, in an FTS5 table ranked with its bm25() function.
+    They are updated page by page, so the index grows with every crawl and
+    survives restarts. With an embedding function, passage embeddings are stored too and
+    the lexical and dense rankings are fused.
+
+    Passages of pages indexed more than max_age seconds ago are ignored, so
+    time-sensitive queries go back to web search. Re-indexing an unchanged page
+    renews it.
+
+    Pages are written by a single background thread. The database is in WAL
+    mode and every reading thread has its own connection, so lookups do not
+    wait for writes.
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "evidence_index.sqlite3"),
+        max_pages: int = INDEX_MAX_PAGES,
+        words_per_passage: int = INDEX_PASSAGE_WORDS,
+        embed_fn: Callable[[List[str]], List[List[float]]] = None,
+        lookup_workers: int = INDEX_LOOKUP_WORKERS,
+        max_age: float = INDEX_MAX_AGE,
+    ):
+        """
+        Args:
+            path: SQLite file backing the index. Use ":memory:" for a process-local index,
+                whose lookups and writes share one connection.
+            max_pages: maximum number of pages kept.
+            words_per_passage: words per indexed passage.
+            embed_fn: texts -> one embedding per text, enables the dense index.
+            lookup_workers: lookups of one lookup_many call run at the same time.
+            max_age: seconds an indexed page is used as evidence.
+        """
+        self.path = path
+        self.max_pages = max_pages
+        self.words_per_passage = words_per_passage
+        self.embed_fn = embed_fn
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+        # Serializes writes, and every use of the connection of a ":memory:" index
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Pages are indexed off the request path, one at a time
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="evidence-index")
+        self._readers = ThreadPoolExecutor(max_workers=max(1, lookup_workers), thread_name_prefix="evidence-lookup")
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != INDEX_SCHEMA_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS terms; DROP TABLE IF EXISTS passages_fts;"
+                "DROP TABLE IF EXISTS passages; DROP TABLE IF EXISTS pages;"
+                f"PRAGMA user_version = {INDEX_SCHEMA_VERSION};"
+            )
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, url TEXT NOT NULL, digest TEXT NOT NULL, indexed_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS pages_indexed_at ON pages (indexed_at);"
+            "CREATE TABLE IF NOT EXISTS passages ("
+            "id INTEGER PRIMARY KEY, page_key TEXT NOT NULL, url TEXT NOT NULL, text TEXT NOT NULL, embedding TEXT);"
+            "CREATE INDEX IF NOT EXISTS passages_page ON passages (page_key);"
+            # Full-text index over passages.text, kept in sync by add_page and _delete_pages
+            "CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5(text, content='passages', content_rowid='id');"
+            # Number of passages holding each term
+            "CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;"
+        )
+        self._db.commit()
+        self._pages = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        self._passages = self._db.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+        # passage id -> embedding, and the stacked, normalized matrix rebuilt after changes
+        self._vectors = {}
+        self._matrix = None
+        if self.embed_fn is not None:
+            for passage_id, embedding in self._db.execute("SELECT id, embedding FROM passages WHERE embedding IS NOT NULL"):
+                self._vectors[passage_id] = np.asarray(json.loads(embedding), dtype=np.float32)
+
+    @contextmanager
+    def _reading(self):
+        """A connection for reads from the calling thread."""
+        if self.path == ":memory:":
+            with self._lock:
+                yield self._db
+            return
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA query_only=1")
+        yield db
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for start in range(0, len(texts), INDEX_EMBED_BATCH):
+            embeddings += self.embed_fn(texts[start : start + INDEX_EMBED_BATCH])
+        return embeddings
+
+    def add_page(self, url: str, text: str):
+        """Index the passages of a page, replacing its previous version. Unchanged pages are skipped."""
+        key = url_key(url)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._reading() as db:
+            row = db.execute("SELECT digest FROM pages WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[0] == digest:
+            # Crawled again and unchanged: its passages are current again
+            with self._lock:
+                self._db.execute("UPDATE pages SET indexed_at = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+            return
+
+        passages = split_passages(text, self.words_per_passage)
+        embeddings = [None] * len(passages)
+        if self.embed_fn is not None and passages:
+            try:
+                embeddings = [json.dumps(list(map(float, e))) for e in self._embed(passages)]
+            except Exception as e:
+                logger.warning(f"Failed to embed the passages of {url}: {e}")
+        with self._lock:
+            self._delete_pages([key])
+            self._db.execute(
+                "INSERT INTO pages (key, url, digest, indexed_at) VALUES (?, ?, ?, ?)", (key, url, digest, time.time())
+            )
+            self._pages += 1
+            vectors = {}
+            df = Counter()
+            for passage, embedding in zip(passages, embeddings):
+                passage_id = self._db.execute(
+                    "INSERT INTO passages (page_key, url, text, embedding) VALUES (?, ?, ?, ?)",
+                    (key, url, passage, embedding),
+                ).lastrowid
+                self._db.execute("INSERT INTO passages_fts (rowid, text) VALUES (?, ?)", (passage_id, passage))
+                df.update(set(tokenize(passage)))
+                if embedding is not None:
+                    vectors[passage_id] = np.asarray(json.loads(embedding), dtype=np.float32)
+            self._db.executemany(
+                "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+                df.items(),
+            )
+            self._passages += len(passages)
+            stale = self._db.execute("SELECT key FROM pages WHERE indexed_at < ?", (self._cutoff(),)).fetchall()
+            self._delete_pages([k for (k,) in stale])
+            if self._pages > self.max_pages:
+                oldest = self._db.execute(
+                    "SELECT key FROM pages ORDER BY indexed_at LIMIT ?", (self._pages - self.max_pages,)
+                ).fetchall()
+                self._delete_pages([k for (k,) in oldest])
+            self._db.commit()
+            if vectors:
+                self._vectors.update(vectors)
+                self._matrix = None
+
+    def add_page_later(self, url: str, text: str):
+        """add_page in the background, the caller does not wait for the index update."""
+
+        def add():
+            try:
+                self.add_page(url, text)
+            except Exception as e:
+                logger.warning(f"Failed to index {url}: {e}")
+
+        self._writer.submit(add)
+
+    def _delete_pages(self, keys: List[str]):
+        # Caller holds the lock
+        for key in keys:
+            rows = self._db.execute("SELECT id, text FROM passages WHERE page_key = ?", (key,)).fetchall()
+            self._db.executemany(
+                "INSERT INTO passages_fts (passages_fts, rowid, text) VALUES ('delete', ?, ?)", rows
+            )
+            df = Counter()
+            for passage_id, text in rows:
+                df.update(set(tokenize(text)))
+                if self._vectors.pop(passage_id, None) is not None:
+                    self._matrix = None
+            self._db.executemany("UPDATE terms SET df = df - ? WHERE term = ?", [(n, term) for term, n in df.items()])
+            self._db.executemany("DELETE FROM terms WHERE term = ? AND df <= 0", [(term,) for term in df])
+            self._passages -= len(rows)
+            self._db.execute("DELETE FROM passages WHERE page_key = ?", (key,))
+            if self._db.execute("DELETE FROM pages WHERE key = ?", (key,)).rowcount:
+                self._pages -= 1
+
+    def _cutoff(self) -> float:
+        """Pages indexed before this time are too old to be used."""
+        return time.time() - self.max_age
+
+    def _lexical(self, terms: List[str], limit: int) -> List[tuple]:
+        """(id, url, text, bm25 score) of the best passages holding any query term, best first."""
+        with self._reading() as db:
+            df = dict(db.execute(f"SELECT term, df FROM terms WHERE term IN ({','.join('?' * len(terms))})", terms))
+            present = sorted((term for term in terms if df.get(term, 0) > 0), key=df.get)
+            if not present:
+                return []
+            # The rarest term is kept even when every term is common
+            common_df = max(INDEX_COMMON_TERM_SHARE * self._passages, INDEX_COMMON_TERM_MIN_DF)
+            matched = [term for term in present if df[term] <= common_df] or present[:1]
+            rows = db.execute(
+                "SELECT passages.id, passages.url, passages.text, -bm25(passages_fts) FROM passages_fts "
+                "JOIN passages ON passages.id = passages_fts.rowid JOIN pages ON pages.key = passages.page_key "
+                "WHERE passages_fts MATCH ? AND pages.indexed_at >= ? ORDER BY bm25(passages_fts) LIMIT ?",
+                (" OR ".join('"' + term.replace('"', '""') + '"' for term in matched), self._cutoff(), limit),
+            ).fetchall()
+        return rows
+
+    def _dense(self, embedding, limit: int) -> List[int]:
+        """Ids of the passages closest to the query embedding, best first."""
+        if embedding is None:
+            return []
+        matrix = self._matrix
+        if matrix is None:
+            # Rebuilt once after each indexed page, the writer changes _vectors under the lock
+            with self._lock:
+                if self._matrix is None and self._vectors:
+                    ids = list(self._vectors)
+                    stacked = np.stack([self._vectors[i] for i in ids])
+                    self._matrix = (ids, stacked / (np.linalg.norm(stacked, axis=1, keepdims=True) + 1e-12))
+                matrix = self._matrix
+            if matrix is None:
+                return []
+        ids, vectors = matrix
+        embedding = np.asarray(embedding, dtype=np.float32)
+        scores = vectors @ (embedding / (np.linalg.norm(embedding) + 1e-12))
+        return [ids[i] for i in np.argsort(-scores)[:limit]]
+
+    def _passages_by_id(self, passage_ids: List[int]) -> Dict[int, tuple]:
+        if not passage_ids:
+            return {}
+        with self._reading() as db:
+            rows = db.execute(
+                "SELECT passages.id, passages.url, passages.text FROM passages JOIN pages ON pages.key = passages.page_key "
+                f"WHERE passages.id IN ({','.join('?' * len(passage_ids))}) AND pages.indexed_at >= ?",
+                (*passage_ids, self._cutoff()),
+            ).fetchall()
+        return {passage_id: (url, text) for passage_id, url, text in rows}
+
+    def _search(self, query: str, top_k: int, min_coverage: float, embedding=None) -> List[Dict]:
+        terms = sorted(set(tokenize(query)))
+        if not terms or not self._passages:
+            return []
+        limit = max(50, 10 * top_k)
+        lexical = self._lexical(terms, limit)
+        dense = self._dense(embedding, limit)
+
+        passages = {passage_id: (url, text) for passage_id, url, text, _ in lexical}
+        scores = {passage_id: score for passage_id, _, _, score in lexical}
+        fused = {passage_id: 1 / (INDEX_RRF_K + rank) for rank, (passage_id, *_) in enumerate(lexical)}
+        for rank, passage_id in enumerate(dense):
+            fused[passage_id] = fused.get(passage_id, 0.0) + 1 / (INDEX_RRF_K + rank)
+        passages.update(self._passages_by_id([i for i in dense if i not in passages]))
+
+        hits = []
+        seen_urls = set()
+        query_terms = set(terms)
+        for passage_id in sorted(fused, key=fused.get, reverse=True):
+            if passage_id not in passages:
+                continue
+            url, text = passages[passage_id]
+            if url in seen_urls:
+                continue
+            coverage = len(query_terms.intersection(tokenize(text))) / len(terms)
+            if coverage < min_coverage:
+                continue
+            seen_urls.add(url)
+            hits.append({"text": text, "url": url, "score": scores.get(passage_id, 0.0), "coverage": coverage})
+            if len(hits) == top_k:
+                break
+        return hits
+
+    def search(self, query: str, top_k: int = 3, min_coverage: float = 0.0) -> List[Dict]:
+        """Best passages for a query, at most one per page.
+
+        Passages are ranked by BM25, fused with the dense ranking by reciprocal rank
+        when embeddings are enabled.
+
+        Args:
+            query: the search query.
+            top_k: maximum number of passages returned.
+            min_coverage: minimum fraction of the query's terms a passage must hold.
+        Returns:
+            {"text", "url", "score", "coverage"} per passage, best first.
+        """
+        return self._search(query, top_k, min_coverage, self._query_embeddings([query])[0])
+
+    def _query_embeddings(self, queries: List[str]) -> list:
+        if self.embed_fn is None or not self._vectors:
+            return [None] * len(queries)
+        try:
+            return self._embed(queries)
+        except Exception as e:
+            logger.warning(f"Failed to embed the queries, using BM25 only: {e}")
+            return [None] * len(queries)
+
+    def lookup_many(
+        self, queries: List[str], top_k: int = 3, min_coverage: float = INDEX_MIN_COVERAGE
+    ) -> List[Optional[List[Dict]]]:
+        """lookup for several queries, run at the same time, with one embedding call for all of them."""
+        if not queries:
+            return []
+        if not self._passages:
+            self.misses += len(queries)
+            return [None] * len(queries)
+        embeddings = self._query_embeddings(queries)
+        if len(queries) == 1:
+            found = [self._search(queries[0], top_k, min_coverage, embeddings[0])]
+        else:
+            found = list(
+                self._readers.map(lambda args: self._search(args[0], top_k, min_coverage, args[1]), zip(queries, embeddings))
+            )
+        results = []
+        for hits in found:
+            if len(hits) < top_k:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(hits)
+        return results
+
+    def lookup(self, query: str, top_k: int = 3, min_coverage: float = INDEX_MIN_COVERAGE) -> Optional[List[Dict]]:
+        """top_k passages covering the query well, None when the index does not hold that many.
+
+        A None answer means local recall is weak and the query should go to web search.
+        """
+        return self.lookup_many([query], top_k, min_coverage)[0]
+
+    def stats(self) -> Dict:
+        return {"pages": self._pages, "passages": self._passages, "hits": self.hits, "misses": self.misses}
+
+
+_evidence_index = None
+_evidence_index_lock = threading.Lock()
+
+
+def get_evidence_index() -> Optional[EvidenceIndex]:
+    """Process-wide evidence index, None when disabled with FC_EVIDENCE_INDEX=0.
+
+    FC_EVIDENCE_INDEX_DENSE=1 adds passage embeddings, one embedding call per indexed page.
+    """
+    global _evidence_index
+    if os.getenv("FC_EVIDENCE_INDEX", "1") != "1":
+        return None
+    if _evidence_index is None:
+        with _evidence_index_lock:
+            if _evidence_index is None:
+                dense = os.getenv("FC_EVIDENCE_INDEX_DENSE", "0") == "1"
+                _evidence_index = EvidenceIndex(embed_fn=embed_texts if dense else None)
+    return _evidence_index
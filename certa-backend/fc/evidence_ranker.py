@@ -0,0 +1,93 @@
+import os
+import re
+import math
+from collections import Counter
+from typing import Dict, List
+
+# Token budgets for the evidence serialized into each LLM stage
+ANALYZE_TOKEN_BUDGET = int(os.getenv("FC_ANALYZE_TOKEN_BUDGET", "3000"))
+# Shared by all claims of one report
+REPORT_TOKEN_BUDGET = int(os.getenv("FC_REPORT_TOKEN_BUDGET", "4000"))
+
+STOPWORDS = frozenset(
+    "a an and are as at be been but by did do does for from had has have he her his how i if in into is it its "
+    "of on or she that the their them there they this to was were what when where which who why will with you".split()
+)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords."""
+    return [t for t in _WORD_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap LLM token estimate (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class BM25:
+    """Okapi BM25 over a small in-memory collection of documents."""
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_tokens = [Counter(tokenize(doc)) for doc in documents]
+        self.doc_lengths = [sum(tokens.values()) for tokens in self.doc_tokens]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        document_frequency = Counter(term for tokens in self.doc_tokens for term in tokens)
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def score(self, query: str) -> List[float]:
+        """BM25 score of every document for the query, in document order."""
+        query_terms = set(tokenize(query))
+        scores = []
+        for tokens, length in zip(self.doc_tokens, self.doc_lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in query_terms:
+                tf = tokens.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+
+def _dedup_key(text: str) -> str:
+    return " ".join(text.lower().rstrip(". ").split())
+
+
+def select_evidence(claim: str, evidence: List[Dict], token_budget: int) -> List[Dict]:
+    """Rank evidence against the claim and keep the best items that fit the token budget.
+
+    Args:
+        claim: the claim the evidence should support or refute.
+        evidence: evidence items with at least a "text" key.
+        token_budget: maximum estimated tokens of the selected items.
+    Returns:
+        The selected items, most relevant first, without duplicate texts.
+    """
+    if not evidence:
+        return []
+
+    scores = BM25([item["text"] for item in evidence]).score(claim)
+    ranked = sorted(range(len(evidence)), key=lambda i: scores[i], reverse=True)
+
+    selected = []
+    seen = set()
+    used = 0
+    for i in ranked:
+        item = evidence[i]
+        key = _dedup_key(item["text"])
+        if key in seen:
+            continue
+        cost = estimate_tokens(item["text"])
+        # Skip items that do not fit, a shorter one further down may still fit
+        if used + cost > token_budget:
+            continue
+        seen.add(key)
+        selected.append(item)
+        used += cost
+    return selected
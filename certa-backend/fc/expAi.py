@@ -1,74 +1,16 @@
-import google.generativeai as genai
-from google.ai.generativelanguage_v1beta.types import content
 import os
 from typing import Dict
 import json
+from .llm_client import LLMClient
 
 
-generation_config = {
-    "temperature": 0.7,
-    "top_p": 0.95,
-    "top_k": 40,
-    "max_output_tokens": 8192,
-    "response_schema": content.Schema(
-        type=content.Type.OBJECT,
-        required=["explanation_summary", "claim_explanations", "evidence_analysis", "trust_factors"],
-        properties={
-            "explanation_summary": content.Schema(
-                type=content.Type.STRING,
-            ),
-            "claim_explanations": content.Schema(
-                type=content.Type.ARRAY,
-                items=content.Schema(
-                    type=content.Type.OBJECT,
-                    required=["claim", "reasoning", "key_factors", "confidence_explanation"],
-                    properties={
-                        "claim": content.Schema(type=content.Type.STRING),
-                        "reasoning": content.Schema(type=content.Type.STRING),
-                        "key_factors": content.Schema(
-                            type=content.Type.ARRAY,
-                            items=content.Schema(type=content.Type.STRING)
-                        ),
-                        "confidence_explanation": content.Schema(type=content.Type.STRING)
-                    }
-                )
-            ),
-            "evidence_analysis": content.Schema(
-                type=content.Type.OBJECT,
-                required=["strength_explanation", "gap_analysis", "contradiction_details"],
-                properties={
-                    "strength_explanation": content.Schema(type=content.Type.STRING),
-                    "gap_analysis": content.Schema(type=content.Type.STRING),
-                    "contradiction_details": content.Schema(type=content.Type.STRING)
-                }
-            ),
-            "trust_factors": content.Schema(
-                type=content.Type.ARRAY,
-                items=content.Schema(
-                    type=content.Type.OBJECT,
-                    required=["factor", "impact", "recommendation"],
-                    properties={
-                        "factor": content.Schema(type=content.Type.STRING),
-                        "impact": content.Schema(type=content.Type.STRING),
-                        "recommendation": content.Schema(type=content.Type.STRING)
-                    }
-                )
-            )
-        }
-    ),
-    "response_mime_type": "application/json"
-}
+llm = LLMClient()
 
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash",
-    generation_config=generation_config
-)
-
-def explain_factcheck_result(factcheck_report: Dict) -> Dict:
+def _explanation_prompt(factcheck_report: Dict) -> str:
     # Extract relevant components from the fact-check report
     detailed_analysis = factcheck_report["detailed_analysis"]
     
-    prompt = f"""
+    return f"""
     Explain why these fact-checking conclusions were reached based on the following analysis:
     
     Overall Analysis:
@@ -85,8 +27,17 @@ def explain_factcheck_result(factcheck_report: Dict) -> Dict:
     4. What factors influenced the trust assessment
     """
 
-    response = model.generate_content(prompt)
-    explanation = json.loads(response.text)
+def explain_factcheck_result(factcheck_report: Dict) -> Dict:
+    explanation = llm.complete_json("explain", _explanation_prompt(factcheck_report))
+    
+    return {
+        "original_report": factcheck_report,
+        "explanation": explanation
+    }
+
+async def aexplain_factcheck_result(factcheck_report: Dict) -> Dict:
+    """Awaitable explain_factcheck_result for use inside the API event loop"""
+    explanation = await llm.acomplete_json("explain", _explanation_prompt(factcheck_report))
     
     return {
         "original_report": factcheck_report,
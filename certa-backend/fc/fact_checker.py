@@ -1,4 +1,3 @@
-from groq import Groq
 import os
 import dotenv
 import google.generativeai as genai
@@ -9,13 +8,26 @@ from datetime import datetime
 import requests
 from urllib.parse import quote
 from .serper_search import SerperEvidenceRetriever
-from google.ai.generativelanguage_v1beta.types import content
+from .llm_client import LLMClient, get_gemini_model
+from .claim_cache import ClaimCache, get_claim_cache
+from .evidence_ranker import select_evidence, ANALYZE_TOKEN_BUDGET, REPORT_TOKEN_BUDGET
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
 import time
 
 dotenv.load_dotenv()
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on how many claims are analyzed at the same time in generate_report
+MAX_CONCURRENT_CLAIMS = int(os.getenv("FC_MAX_CONCURRENT_CLAIMS", "3"))
+
+# Generate the verification questions of all claims in one LLM call and search them in one batch
+BATCH_VERIFICATION_QUESTIONS = os.getenv("FC_BATCH_QUESTIONS", "1") == "1"
+
 @dataclass
 class Claim:
     statement: str
@@ -25,378 +37,164 @@ class Claim:
     sources: List[str]
     worthiness_score: int
 
-class FactChecker:
-    def __init__(self, groq_api_key: str, serper_api_key: str):
-        generation_config = {
-        "temperature": 1,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 8192,
-        "response_schema": content.Schema(
-            type = content.Type.OBJECT,
-            enum = [],
-            required = ["overall_analysis", "claim_analysis", "meta_analysis"],
-            properties = {
-            "overall_analysis": content.Schema(
-                type = content.Type.OBJECT,
-                enum = [],
-                required = ["truth_score", "reliability_assessment", "key_findings", "patterns_identified"],
-                properties = {
-                "truth_score": content.Schema(
-                    type = content.Type.NUMBER,
-                ),
-                "reliability_assessment": content.Schema(
-                    type = content.Type.STRING,
-                ),
-                "key_findings": content.Schema(
-                    type = content.Type.ARRAY,
-                    items = content.Schema(
-                    type = content.Type.STRING,
-                    ),
-                ),
-                "patterns_identified": content.Schema(
-                    type = content.Type.ARRAY,
-                    items = content.Schema(
-                    type = content.Type.STRING,
-                    ),
-                ),
-                },
-            ),
-            "claim_analysis": content.Schema(
-                type = content.Type.ARRAY,
-                items = content.Schema(
-                type = content.Type.OBJECT,
-                required = ["claim", "verification_status", "confidence_level", "evidence_quality", "source_assessment", "misinformation_impact", "correction_suggestions"],
-                properties = {
-                    "claim": content.Schema(
-                    type = content.Type.STRING,
-                    ),
-                    "verification_status": content.Schema(
-                    type = content.Type.STRING,
-                    ),
-                    "confidence_level": content.Schema(
-                    type = content.Type.NUMBER,
-                    ),
-                    "evidence_quality": content.Schema(
-                    type = content.Type.OBJECT,
-                    required = ["strength", "gaps", "contradictions"],
-                    properties = {
-                        "strength": content.Schema(
-                        type = content.Type.NUMBER,
-                        ),
-                        "gaps": content.Schema(
-                        type = content.Type.ARRAY,
-                        items = content.Schema(
-                            type = content.Type.STRING,
-                        ),
-                        ),
-                        "contradictions": content.Schema(
-                        type = content.Type.ARRAY,
-                        items = content.Schema(
-                            type = content.Type.STRING,
-                        ),
-                        ),
-                    },
-                    ),
-                    "source_assessment": content.Schema(
-                    type = content.Type.ARRAY,
-                    items = content.Schema(
-                        type = content.Type.OBJECT,
-                        required = ["url", "credibility_metrics", "relevance_to_claim"],
-                        properties = {
-                        "url": content.Schema(
-                            type = content.Type.STRING,
-                        ),
-                        "credibility_metrics": content.Schema(
-                            type = content.Type.OBJECT,
-                            required = ["credibility_score", "bias_rating", "fact_checking_history"],
-                            properties = {
-                            "credibility_score": content.Schema(
-                                type = content.Type.NUMBER,
-                            ),
-                            "bias_rating": content.Schema(
-                                type = content.Type.STRING,
-                            ),
-                            "fact_checking_history": content.Schema(
-                                type = content.Type.NUMBER,
-                            ),
-                            },
-                        ),
-                        "relevance_to_claim": content.Schema(
-                            type = content.Type.NUMBER,
-                        ),
-                        },
-                    ),
-                    ),
-                    "misinformation_impact": content.Schema(
-                    type = content.Type.OBJECT,
-                    required = ["severity", "affected_domains", "potential_consequences", "spread_risk"],
-                    properties = {
-                        "severity": content.Schema(
-                        type = content.Type.NUMBER,
-                        ),
-                        "affected_domains": content.Schema(
-                        type = content.Type.ARRAY,
-                        items = content.Schema(
-                            type = content.Type.STRING,
-                        ),
-                        ),
-                        "potential_consequences": content.Schema(
-                        type = content.Type.ARRAY,
-                        items = content.Schema(
-                            type = content.Type.STRING,
-                        ),
-                        ),
-                        "spread_risk": content.Schema(
-                        type = content.Type.NUMBER,
-                        ),
-                    },
-                    ),
-                    "correction_suggestions": content.Schema(
-                    type = content.Type.OBJECT,
-                    required = ["verified_facts", "recommended_sources", "context_missing"],
-                    properties = {
-                        "verified_facts": content.Schema(
-                        type = content.Type.ARRAY,
-                        items = content.Schema(
-                            type = content.Type.STRING,
-                        ),
-                        ),
-                        "recommended_sources": content.Schema(
-                        type = content.Type.ARRAY,
-                        items = content.Schema(
-                            type = content.Type.OBJECT,
-                            properties = {
-                            "url": content.Schema(
-                                type = content.Type.STRING,
-                            ),
-                            "credibility_score": content.Schema(
-                                type = content.Type.NUMBER,
-                            ),
-                            "relevance": content.Schema(
-                                type = content.Type.NUMBER,
-                            ),
-                            },
-                        ),
-                        ),
-                        "context_missing": content.Schema(
-                        type = content.Type.ARRAY,
-                        items = content.Schema(
-                            type = content.Type.STRING,
-                        ),
-                        ),
-                    },
-                    ),
-                },
-                ),
-            ),
-            "meta_analysis": content.Schema(
-                type = content.Type.OBJECT,
-                required = ["information_ecosystem_impact", "recommended_actions", "prevention_strategies"],
-                properties = {
-                "information_ecosystem_impact": content.Schema(
-                    type = content.Type.STRING,
-                ),
-                "recommended_actions": content.Schema(
-                    type = content.Type.ARRAY,
-                    items = content.Schema(
-                    type = content.Type.STRING,
-                    ),
-                ),
-                "prevention_strategies": content.Schema(
-                    type = content.Type.ARRAY,
-                    items = content.Schema(
-                    type = content.Type.STRING,
-                    ),
-                ),
-                },
-            ),
-            },
-        ),
-        "response_mime_type": "application/json",
-        }
+_DEFAULT_CLAIM_CACHE = object()
 
-        generation_config_sources = {
-        "temperature": 1,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 8192,
-        "response_schema": content.Schema(
-            type = content.Type.OBJECT,
-            enum = [],
-            required = ["credibility_score", "fact_checking_history", "transparency_score", "expertise_level", "brief_explanation"],
-            properties = {
-            "credibility_score": content.Schema(
-                type = content.Type.INTEGER,
-            ),
-            "fact_checking_history": content.Schema(
-                type = content.Type.INTEGER,
-            ),
-            "transparency_score": content.Schema(
-                type = content.Type.INTEGER,
-            ),
-            "expertise_level": content.Schema(
-                type = content.Type.INTEGER,
-            ),
-            "brief_explanation": content.Schema(
-                type = content.Type.STRING,
-            ),
-            "additional_metrics": content.Schema(
-                type = content.Type.OBJECT,
-                properties = {
-                "citation_score": content.Schema(
-                    type = content.Type.INTEGER,
-                ),
-                "peer_recognition": content.Schema(
-                    type = content.Type.INTEGER,
-                ),
-                },
-            ),
-            },
-        ),
-        "response_mime_type": "application/json",
-        }
+class FactChecker:
+    def __init__(self, groq_api_key: str, serper_api_key: str, claim_cache: ClaimCache = _DEFAULT_CLAIM_CACHE):
+        self.search_client = SerperEvidenceRetriever(api_key=serper_api_key)
+        # Verdict cache shared by all requests; pass None to always recompute
+        self.claim_cache = get_claim_cache() if claim_cache is _DEFAULT_CLAIM_CACHE else claim_cache
+        # One provider/model per stage; schemas and model handles come from the shared registry
+        self.llm = LLMClient(groq_api_key=groq_api_key)
 
+        self.source_correction = get_gemini_model("sources")
 
-        self.client = Groq(api_key=groq_api_key)
-        self.search_client = SerperEvidenceRetriever(api_key=serper_api_key)
-        
-        self.gemini_client = genai.GenerativeModel(
-            model_name="gemini-2.0-flash",
-            generation_config=generation_config,
-        )
-        self.gemini_chat = self.gemini_client.start_chat(
-            history=[]
-        )
+    def _extract_prompt(self, news_text: str) -> str:
+        return f"Break the following news into atomic claims. Make a maximum of 3 claims, not more at all. Return as JSON array of claim statements:\n\n{news_text}"
 
-        self.source_correction = genai.GenerativeModel(
-            model_name="gemini-2.0-flash",
-            generation_config=generation_config_sources,
-        )
-        self.gemini_chat_sources = self.source_correction.start_chat(
-            history=[]
-        )
-        
     def extract_claims(self, news_text: str) -> List[str]:
-        prompt = {
-            "role": "user",
-            "content": f"Break the following news into atomic claims. Make a maximum of 3 claims, not more at all. Return as JSON array of claim statements:\n\n{news_text}"
-        }
-        
-        response = self.client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[prompt],
-            temperature=0.2,
-            response_format={"type": "json_object"}
-        )
+        return self.llm.complete_json("extract", self._extract_prompt(news_text))
 
-        gemini_extract_prompt = f"Break the following news into atomic claims. Make a maximum of 3 claims, not more at all. Return as JSON array of claim statements:\n\n{news_text}"
-
-        generation_config_extract = {
-        "temperature": 1,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 8192,
-        "response_schema": content.Schema(
-            type = content.Type.OBJECT,
-            enum = [],
-            required = ["claims"],
-            properties = {
-            "claims": content.Schema(
-                type = content.Type.ARRAY,
-                items = content.Schema(
-                type = content.Type.STRING,
-                ),
-            ),
-            },
-        ),
-        "response_mime_type": "application/json",
-        }
+    async def aextract_claims(self, news_text: str) -> List[str]:
+        return await self.llm.acomplete_json("extract", self._extract_prompt(news_text))
 
-        model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        generation_config=generation_config_extract,
-        )
+    def _questions_prompt(self, claim: str) -> str:
+        return f"Generate specific questions to verify this claim. Make a maximum of 5 questions for the claim. Return as JSON array:\n\n{claim}"
 
-        chat_session = model.start_chat(
-        history=[
-        ]
-        )
+    def generate_verification_questions(self, claim: str) -> List[str]:
+        return self.llm.complete_json("questions", self._questions_prompt(claim))
 
-        response = chat_session.send_message(gemini_extract_prompt)
+    async def agenerate_verification_questions(self, claim: str) -> List[str]:
+        return await self.llm.acomplete_json("questions", self._questions_prompt(claim))
 
-        return json.loads(response.text)
+    def _batch_questions_prompt(self, claims: List[str]) -> str:
+        numbered_claims = "\n".join(f"{i + 1}. {claim}" for i, claim in enumerate(claims))
+        return f"Generate specific questions to verify each of the following claims. Make a maximum of 5 questions per claim. Return a JSON object with one entry per claim, in the same order, repeating the claim text exactly:\n\n{numbered_claims}"
 
-    def generate_verification_questions(self, claim: str) -> List[str]:
-        prompt = {
-            "role": "user",
-            "content": f"Generate specific questions to verify this claim. Make a maximum of 5 questions for the claim. Return as JSON array:\n\n{claim}"
-        }
-        
-        response = self.client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[prompt],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        gemini_questions_prompt = f"Generate specific questions to verify this claim. Make a maximum of 5 questions for the claim. Return as JSON array:\n\n{claim}"
-
-        generation_config_questions = {
-        "temperature": 1,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 8192,
-        "response_schema": content.Schema(
-            type = content.Type.OBJECT,
-            enum = [],
-            required = ["questions"],
-            properties = {
-            "questions": content.Schema(
-                type = content.Type.ARRAY,
-                items = content.Schema(
-                type = content.Type.STRING,
-                ),
-            ),
-            },
-        ),
-        "response_mime_type": "application/json",
-        }
+    def _claim_questions_map(self, claims: List[str], result: Dict) -> Dict[str, List[str]]:
+        """Map claims to their questions, falling back to position when the model rewords a claim.
 
-        model_questions = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        generation_config=generation_config_questions,
-        )
+        Claims the model dropped, or that cannot be matched to an entry, are left out.
+        """
+        entries = [entry for entry in result.get("claims", []) if isinstance(entry, dict)]
+        by_text = {entry.get("claim", "").strip(): entry.get("questions", []) for entry in entries}
+        claim_texts = {claim.strip() for claim in claims}
+
+        claim_questions = {}
+        for i, claim in enumerate(claims):
+            if claim.strip() in by_text:
+                questions = by_text[claim.strip()]
+            elif len(entries) == len(claims) and entries[i].get("claim", "").strip() not in claim_texts:
+                # One entry per claim and this one belongs to no other claim: a reworded claim
+                questions = entries[i].get("questions", [])
+            else:
+                continue
+            if questions:
+                claim_questions[claim] = questions
+        return claim_questions
+
+    def generate_verification_questions_batch(self, claims: List[str]) -> Dict[str, List[str]]:
+        """Generate the verification questions for all claims with a single LLM round trip.
+
+        Returns:
+            Dict[str, List[str]]: claim -> questions, for the claims the model answered for.
+        """
+        result = self.llm.complete_json("questions_batch", self._batch_questions_prompt(claims))
+        return self._claim_questions_map(claims, result)
+
+    async def agenerate_verification_questions_batch(self, claims: List[str]) -> Dict[str, List[str]]:
+        result = await self.llm.acomplete_json("questions_batch", self._batch_questions_prompt(claims))
+        return self._claim_questions_map(claims, result)
+
+    def search_evidence(self, query: str) -> List[Dict]:
+        return self.search_client.retrieve_evidence(query)
+
+    async def asearch_evidence(self, claim_queries_dict: Dict[str, List[str]]) -> Dict[str, List[Dict]]:
+        return await self.search_client.aretrieve_evidence(claim_queries_dict=claim_queries_dict)
 
-        chat_session_questions = model_questions.start_chat(
-        history=[
+    def _collect_evidence(self, claim: str, evidence_dict: Dict[str, List[Dict]]):
+        # The most relevant evidence that fits the analysis budget, plus the url of every retrieved item
+        evidence = evidence_dict.get(claim, [])
+        sources = [
+            url for evidence_item in evidence for url in [evidence_item['url'], *evidence_item.get('corroborating_urls', [])]
         ]
+
+        return select_evidence(claim, evidence, token_budget=ANALYZE_TOKEN_BUDGET), sources
+
+    def _analysis_prompt(self, claim: str, evidence: List[Dict]) -> str:
+        return f"Analyze this claim and evidence. Return JSON with confidence_score - integer - from 1-100, verified_status - an integer in the range 0-100, and worthiness_score, an integer ranging from 1-100:\n\nClaim: {claim}\n\nEvidence: {json.dumps(evidence)}"
+
+    def _build_claim(self, claim: str, evidence: List[Dict], sources: List[str], result: Dict) -> Claim:
+        return Claim(
+            statement=claim,
+            confidence_score=result["confidence_score"],
+            verified_status=result["verified_status"],
+            key_evidence=evidence,
+            sources=sources,
+            worthiness_score=result["worthiness_score"]
         )
 
-        response = chat_session_questions.send_message(gemini_questions_prompt)
+    def _claim_from_cache(self, claim: str, value: Dict) -> Claim:
+        # The cached verdict may belong to a paraphrase, report it under the claim being checked
+        return Claim(**{**value, "statement": claim})
 
+    def _lookup_cached_claims(self, claims: List[str]) -> Dict[str, Claim]:
+        if self.claim_cache is None:
+            return {}
+        values = self.claim_cache.get_many(claims)
+        return {
+            claim: self._claim_from_cache(claim, value) for claim, value in zip(claims, values) if value is not None
+        }
 
-        return json.loads(response.text)
+    async def _alookup_cached_claims(self, claims: List[str]) -> Dict[str, Claim]:
+        if self.claim_cache is None:
+            return {}
+        values = await self.claim_cache.aget_many(claims)
+        return {
+            claim: self._claim_from_cache(claim, value) for claim, value in zip(claims, values) if value is not None
+        }
 
-    def search_evidence(self, query: str) -> List[Dict]:
-        return self.search_client.retrieve_evidence(query)
+    def _store_claim(self, claim: Claim):
+        # A verdict reached without evidence is not worth serving again, the next request may find some
+        if self.claim_cache is None or not claim.key_evidence:
+            return
+        try:
+            self.claim_cache.put(claim.statement, vars(claim))
+        except Exception as e:
+            logger.warning(f"Failed to cache verdict for {claim.statement!r}: {e}")
+
+    async def _astore_claim(self, claim: Claim):
+        if self.claim_cache is None or not claim.key_evidence:
+            return
+        try:
+            await self.claim_cache.aput(claim.statement, vars(claim))
+        except Exception as e:
+            logger.warning(f"Failed to cache verdict for {claim.statement!r}: {e}")
+
+    def analyze_claim(self, claim: str, evidence_dict: Dict[str, List[Dict]] = None, check_cache: bool = True) -> Claim:
+        """Verify one claim.
+
+        Args:
+            claim (str): the claim statement.
+            evidence_dict (Dict[str, List[Dict]], optional): evidence already retrieved for the claim
+                (e.g. by the batched mode of generate_report). When it holds the claim, question
+                generation and search are skipped.
+            check_cache (bool, optional): look the claim up in the verdict cache first. The fresh
+                verdict is stored in the cache either way, unless no evidence was found.
+        """
+        if check_cache and self.claim_cache is not None:
+            value = self.claim_cache.get(claim)
+            if value is not None:
+                return self._claim_from_cache(claim, value)
 
-    def analyze_claim(self, claim: str) -> Claim:
-        # Generate verification questions
-        questions = self.generate_verification_questions(claim=claim)["questions"]
+        if evidence_dict is None or claim not in evidence_dict:
+            # Generate verification questions
+            questions = self.generate_verification_questions(claim=claim)["questions"]
 
-        claim_queries_dict = {claim: [q for q in questions]}
+            claim_queries_dict = {claim: [q for q in questions]}
 
-        evidence_dict = self.search_client.retrieve_evidence(claim_queries_dict=claim_queries_dict)
-        
-        # Collect evidence for each question
-        evidences = []
-        sources = []
-        
-        for claim, evidence in evidence_dict.items():
-            for evidence_item in evidence:
-                evidences.append(evidence_item['text'])
-                sources.append(evidence_item['url'])
+            evidence_dict = self.search_client.retrieve_evidence(claim_queries_dict=claim_queries_dict)
+        evidence, sources = self._collect_evidence(claim, evidence_dict)
         
         # # Analyze evidence using Groq
         # analysis_prompt = {
@@ -412,59 +210,174 @@ class FactChecker:
         # )
 
         # result = json.loads(analysis.choices[0].message.content)
-        
-        gemini_analysis_prompt = f"Analyze this claim and evidence. Return JSON with confidence_score - integer - from 1-100, verified_status - an integer in the range 0-100, and worthiness_score, an integer ranging from 1-100:\n\nClaim: {claim}\n\nEvidence: {json.dumps(evidence)}"
-
-        generation_config_analysis = {
-        "temperature": 1,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 8192,
-        "response_schema": content.Schema(
-            type = content.Type.OBJECT,
-            enum = [],
-            required = ["confidence_score", "verified_status", "worthiness_score"],
-            properties = {
-            "confidence_score": content.Schema(
-                type = content.Type.INTEGER,
-            ),
-            "verified_status": content.Schema(
-                type = content.Type.INTEGER,
-            ),
-            "worthiness_score": content.Schema(
-                type = content.Type.INTEGER,
-            ),
-            },
-        ),
-        "response_mime_type": "application/json",
-        }
 
-        model_analysis = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        generation_config=generation_config_analysis,
-        )
-
-        chat_session_analysis = model_analysis.start_chat(
-        history=[
+        result = self.llm.complete_json("analyze", self._analysis_prompt(claim, evidence))
+
+        analyzed_claim = self._build_claim(claim, evidence, sources, result)
+        self._store_claim(analyzed_claim)
+        return analyzed_claim
+
+    async def aanalyze_claim(
+        self, claim: str, evidence_dict: Dict[str, List[Dict]] = None, check_cache: bool = True
+    ) -> Claim:
+        if check_cache and self.claim_cache is not None:
+            value = await self.claim_cache.aget(claim)
+            if value is not None:
+                return self._claim_from_cache(claim, value)
+
+        if evidence_dict is None or claim not in evidence_dict:
+            questions = (await self.agenerate_verification_questions(claim=claim))["questions"]
+
+            evidence_dict = await self.asearch_evidence({claim: [q for q in questions]})
+        evidence, sources = self._collect_evidence(claim, evidence_dict)
+
+        result = await self.llm.acomplete_json("analyze", self._analysis_prompt(claim, evidence))
+
+        analyzed_claim = self._build_claim(claim, evidence, sources, result)
+        await self._astore_claim(analyzed_claim)
+        return analyzed_claim
+
+    def _analyze_each(
+        self,
+        claims: List[str],
+        max_concurrent_claims: int = MAX_CONCURRENT_CLAIMS,
+        evidence_dict: Dict[str, List[Dict]] = None,
+        check_cache: bool = True,
+    ) -> List:
+        """analyze_claim for every claim concurrently.
+
+        Args:
+            claims (List[str]): the claim statements to analyze.
+            max_concurrent_claims (int, optional): maximum number of claims analyzed at once.
+                Values <= 1 analyze the claims one after another.
+            evidence_dict (Dict[str, List[Dict]], optional): pre-retrieved evidence for the claims.
+            check_cache (bool, optional): look every claim up in the verdict cache first.
+
+        Returns:
+            List: per claim, in claim order, its Claim or the exception its analysis raised.
+        """
+        if not claims:
+            return []
+
+        outcomes = []
+        max_workers = max(1, min(max_concurrent_claims, len(claims)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.analyze_claim, claim=claim, evidence_dict=evidence_dict, check_cache=check_cache)
+                for claim in claims
+            ]
+            # Collect in submission order so the report keeps the original claim order
+            for claim, future in zip(claims, futures):
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    logger.error(f"Failed to analyze claim {claim!r}: {e}")
+                    outcomes.append(e)
+        return outcomes
+
+    def _report_claims(self, analyzed_claims: List[Claim]) -> List[Dict]:
+        """Claims as serialized into the report prompt, with evidence trimmed to the report budget."""
+        budget_per_claim = REPORT_TOKEN_BUDGET // max(1, len(analyzed_claims))
+        return [
+            {**vars(claim), "key_evidence": select_evidence(claim.statement, claim.key_evidence, budget_per_claim)}
+            for claim in analyzed_claims
         ]
-        )
 
-        response = chat_session_analysis.send_message(gemini_analysis_prompt)
+    def _report_prompt(self, analyzed_claims: List[Claim]) -> str:
+        return f"""Generate a comprehensive fact-check analysis report for the following claims and evidence. Structure your analysis according to these sections:
 
-        result = json.loads(response.text)
+        1. Overall Analysis:
+        - Calculate an aggregate truth score (0-100) based on all claims
+        - Provide a detailed reliability assessment explaining major patterns
+        - List key findings that emerge from analyzing all claims together
+        - Identify recurring patterns in misinformation/disinformation if any
 
-        return Claim(
-            statement=claim,
-            confidence_score=result["confidence_score"],
-            verified_status=result["verified_status"],
-            key_evidence=evidence,
-            sources=sources,
-            worthiness_score=result["worthiness_score"]
-        )
+        2. Claim-by-Claim Analysis:
+        For each claim in: {json.dumps(self._report_claims(analyzed_claims))}
+        - Evaluate verification status with specific reasoning
+        - Assign confidence level based on evidence strength
+        - Analyze evidence quality:
+        * Evaluate evidence strength
+        * Identify information gaps
+        * Note any contradictions in sources
+        - Assess sources:
+        * Evaluate credibility metrics
+        * Check for bias patterns
+        * Review fact-checking history
 
-    def generate_report(self, news_text: str) -> Dict:
-        claims = self.extract_claims(news_text)
-        analyzed_claims = []
+        3. Meta Analysis:
+        - Assess potential impact on information ecosystem
+        - Suggest specific actions for correction/prevention
+        - Recommend strategies to prevent spread of misinformation
+
+        Please be specific and provide numerical scores where applicable. Include direct quotes from evidence when relevant.
+        """
+
+    def _build_report(self, news_text: str, report_content: Dict, claim_errors: List[Dict]) -> Dict:
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "original_text": news_text,
+            "detailed_analysis": report_content,
+            "claim_errors": claim_errors,
+        }
+
+    def _batched_evidence(self, claims: List[str]) -> Dict[str, List[Dict]]:
+        """Questions for all claims in one LLM call, then one combined Serper batch.
+
+        Returns None if the batched questions or the search fail, so callers fall back to per-claim mode.
+        Claims missing from the batched questions are missing from the result too, and get
+        their own questions and search in analyze_claim.
+        """
+        try:
+            claim_queries_dict = self.generate_verification_questions_batch(claims)
+        except Exception as e:
+            logger.error(f"Batched question generation failed, falling back to per-claim questions: {e}")
+            return None
+        self._log_missing_claims(claims, claim_queries_dict)
+        if not claim_queries_dict:
+            return {}
+        try:
+            return self.search_client.retrieve_evidence(claim_queries_dict=claim_queries_dict)
+        except Exception as e:
+            logger.error(f"Batched evidence retrieval failed, falling back to per-claim search: {e}")
+            return None
+
+    async def _abatched_evidence(self, claims: List[str]) -> Dict[str, List[Dict]]:
+        try:
+            claim_queries_dict = await self.agenerate_verification_questions_batch(claims)
+        except Exception as e:
+            logger.error(f"Batched question generation failed, falling back to per-claim questions: {e}")
+            return None
+        self._log_missing_claims(claims, claim_queries_dict)
+        if not claim_queries_dict:
+            return {}
+        try:
+            return await self.asearch_evidence(claim_queries_dict)
+        except Exception as e:
+            logger.error(f"Batched evidence retrieval failed, falling back to per-claim search: {e}")
+            return None
+
+    def _log_missing_claims(self, claims: List[str], claim_queries_dict: Dict[str, List[str]]):
+        missing = [claim for claim in claims if claim not in claim_queries_dict]
+        if missing:
+            logger.warning(f"No batched questions for {len(missing)} claim(s), generating them per claim: {missing}")
+
+    def generate_report(
+        self,
+        news_text: str,
+        max_concurrent_claims: int = MAX_CONCURRENT_CLAIMS,
+        batch_questions: bool = BATCH_VERIFICATION_QUESTIONS,
+    ) -> Dict:
+        claims = self.extract_claims(news_text)["claims"]
+        # Claims with a cached verdict skip questions, search and analysis altogether
+        cached_claims = self._lookup_cached_claims(claims)
+        # Results are kept by position, the same claim text may be extracted twice
+        results = [cached_claims.get(claim) for claim in claims]
+        pending = [i for i, result in enumerate(results) if result is None]
+        pending_claims = [claims[i] for i in pending]
+        evidence_dict = None
+        if batch_questions and pending_claims:
+            evidence_dict = self._batched_evidence(pending_claims)
         # for claim in claims:
         #     cl = ""
         #     if type(claim) == str:
@@ -474,8 +387,16 @@ class FactChecker:
         #             cl += tup[1] + " "
         #     analyzed_claims.append(self.analyze_claim(claim=cl))
 
-        for claim in claims["claims"]:
-            analyzed_claims.append(self.analyze_claim(claim=claim))
+        outcomes = self._analyze_each(
+            pending_claims, max_concurrent_claims=max_concurrent_claims, evidence_dict=evidence_dict, check_cache=False
+        )
+        claim_errors = []
+        for i, outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                claim_errors.append({"claim": claims[i], "error": str(outcome)})
+            else:
+                results[i] = outcome
+        analyzed_claims = [result for result in results if result is not None]
 
         # # Source credibility analysis
         # source_ratings = {}
@@ -497,36 +418,6 @@ class FactChecker:
         # #sleep for one minute
         # time.sleep(60)
 
-        report_prompt = f"""Generate a comprehensive fact-check analysis report for the following claims and evidence. Structure your analysis according to these sections:
-
-        1. Overall Analysis:
-        - Calculate an aggregate truth score (0-100) based on all claims
-        - Provide a detailed reliability assessment explaining major patterns
-        - List key findings that emerge from analyzing all claims together
-        - Identify recurring patterns in misinformation/disinformation if any
-
-        2. Claim-by-Claim Analysis:
-        For each claim in: {json.dumps([vars(claim) for claim in analyzed_claims])}
-        - Evaluate verification status with specific reasoning
-        - Assign confidence level based on evidence strength
-        - Analyze evidence quality:
-        * Evaluate evidence strength
-        * Identify information gaps
-        * Note any contradictions in sources
-        - Assess sources:
-        * Evaluate credibility metrics
-        * Check for bias patterns
-        * Review fact-checking history
-
-        3. Meta Analysis:
-        - Assess potential impact on information ecosystem
-        - Suggest specific actions for correction/prevention
-        - Recommend strategies to prevent spread of misinformation
-
-        Please be specific and provide numerical scores where applicable. Include direct quotes from evidence when relevant.
-        """
-
-
         # Source Ratings: {json.dumps(source_ratings)}
         # Get additional correction sources for misinfo claims
         # correction_sources = {}
@@ -536,14 +427,82 @@ class FactChecker:
         #         correction_results = self.search_client.retrieve_evidence({claim.statement: [correction_query]})
         #         correction_sources[claim.statement] = correction_results
             
-        enhanced_report = self.gemini_client.generate_content(report_prompt)
-
-        report_content = json.loads(enhanced_report.text)
-            # "source_credibility": source_ratings,
-        
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "original_text": news_text,
-            "detailed_analysis": report_content,
-        }
-            # "correction_sources": correction_sources
\ No newline at end of file
+        report_content = self.llm.complete_json("report", self._report_prompt(analyzed_claims))
+
+        return self._build_report(news_text, report_content, claim_errors)
+
+    async def agenerate_report(
+        self,
+        news_text: str,
+        max_concurrent_claims: int = MAX_CONCURRENT_CLAIMS,
+        batch_questions: bool = BATCH_VERIFICATION_QUESTIONS,
+    ) -> Dict:
+        """Awaitable generate_report: every LLM and HTTP call yields to the event loop."""
+        async for event in self.astream_report(
+            news_text, max_concurrent_claims=max_concurrent_claims, batch_questions=batch_questions
+        ):
+            if event["event"] == "report":
+                return event["data"]
+
+    async def astream_report(
+        self,
+        news_text: str,
+        max_concurrent_claims: int = MAX_CONCURRENT_CLAIMS,
+        batch_questions: bool = BATCH_VERIFICATION_QUESTIONS,
+    ):
+        """Run the async pipeline and yield progress events as soon as they are available.
+
+        Events are dicts with an "event" name and its "data":
+            claims      -- {"claims": [...]} right after extraction
+            claim       -- {"index", "cached", **Claim fields} whenever a claim verdict is ready
+            claim_error -- {"index", "claim", "error"} when a claim could not be analyzed
+            report      -- the same dict agenerate_report returns, always the last event
+        """
+        claims = (await self.aextract_claims(news_text))["claims"]
+        yield {"event": "claims", "data": {"claims": claims}}
+
+        results = [None] * len(claims)
+        claim_errors = []
+
+        cached_claims = await self._alookup_cached_claims(claims)
+        for i, claim in enumerate(claims):
+            if claim in cached_claims:
+                results[i] = cached_claims[claim]
+                yield {"event": "claim", "data": {"index": i, "cached": True, **vars(results[i])}}
+
+        pending = [(i, claim) for i, claim in enumerate(claims) if claim not in cached_claims]
+        evidence_dict = None
+        if batch_questions and pending:
+            evidence_dict = await self._abatched_evidence([claim for _, claim in pending])
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrent_claims))
+
+        async def bounded_analyze(i: int, claim: str):
+            async with semaphore:
+                try:
+                    return i, await self.aanalyze_claim(claim=claim, evidence_dict=evidence_dict, check_cache=False), None
+                except Exception as e:
+                    return i, None, e
+
+        tasks = [asyncio.create_task(bounded_analyze(i, claim)) for i, claim in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, analyzed_claim, error = await next_done
+                if error is not None:
+                    logger.error(f"Failed to analyze claim {claims[i]!r}: {error}")
+                    claim_errors.append((i, {"claim": claims[i], "error": str(error)}))
+                    yield {"event": "claim_error", "data": {"index": i, **claim_errors[-1][1]}}
+                else:
+                    results[i] = analyzed_claim
+                    yield {"event": "claim", "data": {"index": i, "cached": False, **vars(analyzed_claim)}}
+        finally:
+            # The consumer may stop listening early (e.g. a client disconnect)
+            for task in tasks:
+                task.cancel()
+
+        analyzed_claims = [claim for claim in results if claim is not None]
+        claim_errors = [error for _, error in sorted(claim_errors, key=lambda item: item[0])]
+
+        report_content = await self.llm.acomplete_json("report", self._report_prompt(analyzed_claims))
+
+        yield {"event": "report", "data": self._build_report(news_text, report_content, claim_errors)}
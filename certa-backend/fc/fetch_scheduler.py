@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bounds of the timeout derived from a domain's observed latencies
+FETCH_MIN_TIMEOUT = float(os.getenv("FC_CRAWL_MIN_TIMEOUT", "1"))
+FETCH_MAX_TIMEOUT = float(os.getenv("FC_CRAWL_MAX_TIMEOUT", "6"))
+# The timeout is this many times the domain's p95 latency
+FETCH_TIMEOUT_FACTOR = float(os.getenv("FC_CRAWL_TIMEOUT_FACTOR", "2"))
+# Fetches kept per domain, and needed before its percentiles are used
+FETCH_WINDOW = int(os.getenv("FC_CRAWL_STATS_WINDOW", "50"))
+FETCH_MIN_SAMPLES = int(os.getenv("FC_CRAWL_MIN_SAMPLES", "5"))
+# A duplicate request is sent once a fetch runs longer than the p90 latency, never sooner than this
+FETCH_HEDGE = os.getenv("FC_CRAWL_HEDGE", "1") == "1"
+FETCH_MIN_HEDGE_DELAY = float(os.getenv("FC_CRAWL_MIN_HEDGE_DELAY", "0.2"))
+# Consecutive failures after which a domain is skipped, and for how many seconds
+FETCH_BREAKER_FAILURES = int(os.getenv("FC_CRAWL_BREAKER_FAILURES", "3"))
+FETCH_BREAKER_SECONDS = float(os.getenv("FC_CRAWL_BREAKER_SECONDS", "60"))
+# Domains whose history is kept, the least recently fetched ones are forgotten first
+FETCH_MAX_DOMAINS = int(os.getenv("FC_CRAWL_MAX_DOMAINS", "2048"))
+
+
+def _percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class DomainStats:
+    """Recent fetch latencies and failures of one domain."""
+
+    def __init__(self, window: int = FETCH_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record(self, latency: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class FetchScheduler:
+    """Per-domain timeouts, hedged requests and circuit breaking for the crawler.
+
+    Every fetch reports its latency up to the response headers, and its outcome.
+    Body download time is left out: it depends on the page size, not on how
+    responsive the server is. A domain's timeout follows its
+    p95 latency, a fetch still waiting past the domain's p90 gets a duplicate
+    request (the first response wins), and a domain failing repeatedly is
+    skipped for a while. Domains without history use the defaults, hedging
+    falls back to the p90 over all domains. The history of at most max_domains
+    domains is kept.
+
+    Not thread-safe: it is only used from the crawler's event loop.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = 3,
+        min_timeout: float = FETCH_MIN_TIMEOUT,
+        max_timeout: float = FETCH_MAX_TIMEOUT,
+        hedge: bool = FETCH_HEDGE,
+        min_hedge_delay: float = FETCH_MIN_HEDGE_DELAY,
+        breaker_failures: int = FETCH_BREAKER_FAILURES,
+        breaker_seconds: float = FETCH_BREAKER_SECONDS,
+        max_domains: int = FETCH_MAX_DOMAINS,
+    ):
+        """
+        Args:
+            default_timeout: seconds allowed to a domain without enough history.
+            min_timeout: lower bound of a derived timeout.
+            max_timeout: upper bound of a derived timeout.
+            hedge: send duplicate requests for slow fetches.
+            min_hedge_delay: seconds a fetch runs at least before it is hedged.
+            breaker_failures: consecutive failures after which a domain is skipped. 0 disables skipping.
+            breaker_seconds: seconds a failing domain is skipped before it is tried again.
+            max_domains: domains whose history is kept.
+        """
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+        self.breaker_failures = breaker_failures
+        self.breaker_seconds = breaker_seconds
+        self.max_domains = max_domains
+        # Least recently recorded first
+        self.domains: Dict[str, DomainStats] = OrderedDict()
+        self._recent = deque(maxlen=10 * FETCH_WINDOW)
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped = 0
+
+    def _stats(self, domain: str) -> DomainStats:
+        stats = self.domains.get(domain)
+        if stats is None:
+            stats = self.domains[domain] = DomainStats()
+            while len(self.domains) > self.max_domains:
+                self.domains.popitem(last=False)
+        else:
+            self.domains.move_to_end(domain)
+        return stats
+
+    def allow(self, domain: str) -> bool:
+        """Whether the domain may be fetched, False while its circuit is open."""
+        stats = self.domains.get(domain)
+        if stats is None or time.monotonic() >= stats.open_until:
+            return True
+        self.skipped += 1
+        return False
+
+    def timeout(self, domain: str) -> float:
+        """Seconds to connect and between received chunks for a fetch from the domain."""
+        stats = self.domains.get(domain)
+        if stats is None or len(stats.latencies) < FETCH_MIN_SAMPLES:
+            return self.default_timeout
+        derived = FETCH_TIMEOUT_FACTOR * _percentile(stats.latencies, 0.95)
+        return min(self.max_timeout, max(self.min_timeout, derived))
+
+    def hedge_delay(self, domain: str) -> Optional[float]:
+        """Seconds after which a duplicate request is sent, None when there is no basis for one yet."""
+        if not self.hedge:
+            return None
+        stats = self.domains.get(domain)
+        if stats is not None and len(stats.latencies) >= FETCH_MIN_SAMPLES:
+            delay = _percentile(stats.latencies, 0.9)
+        elif len(self._recent) >= 4 * FETCH_MIN_SAMPLES:
+            delay = _percentile(self._recent, 0.9)
+        else:
+            return None
+        return max(self.min_hedge_delay, delay)
+
+    def record(self, domain: str, latency: float, ok: bool):
+        """Report a fetch once its response headers arrived, or once it failed.
+
+        Failures are network errors, timeouts and 5xx responses.
+        """
+        stats = self._stats(domain)
+        stats.record(latency, ok)
+        if ok:
+            self._recent.append(latency)
+        elif self.breaker_failures and stats.consecutive_failures >= self.breaker_failures:
+            if time.monotonic() >= stats.open_until:
+                logger.info(f"Skipping {domain} for {self.breaker_seconds:.0f}s after {stats.consecutive_failures} failures")
+            stats.open_until = time.monotonic() + self.breaker_seconds
+
+    async def run(
+        self,
+        domain: str,
+        attempt: Callable[[], Awaitable],
+        discard: Callable[[object], Awaitable] = None,
+    ):
+        """Run a fetch, hedged with a second attempt when the first one is slow.
+
+        Only the part of a fetch that is raced should be in attempt, e.g. up to the
+        response headers: the losing attempt is cancelled as soon as one succeeds.
+
+        Args:
+            domain: the domain fetched from.
+            attempt: coroutine function performing one request.
+            discard: coroutine function releasing the result of a successful attempt
+                that lost, when both finish at the same time (e.g. closing its response).
+        Returns:
+            The result of the first attempt to succeed. When both fail, the first one's exception is raised.
+        """
+        delay = self.hedge_delay(domain)
+        first = asyncio.ensure_future(attempt())
+        tasks = [first]
+        winner = None
+        try:
+            if delay is None:
+                return await first
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done:
+                return first.result()
+
+            self.hedged += 1
+            second = asyncio.ensure_future(attempt())
+            tasks.append(second)
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        winner = task
+                        return task.result()
+            return first.result()
+        finally:
+            # The losing attempt, or both when the caller is cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif winner is not None and task is not winner and discard is not None:
+                    if not task.cancelled() and task.exception() is None:
+                        await discard(task.result())
+
+    def stats(self) -> Dict:
+        return {
+            "domains": len(self.domains),
+            "open_circuits": sum(time.monotonic() < s.open_until for s in self.domains.values()),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "skipped": self.skipped,
+        }
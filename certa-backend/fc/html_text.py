@@ -0,0 +1,186 @@
+"""Visible-text extraction from HTML pages.
+
+Engines, fastest first: selectolax (optional), lxml and BeautifulSoup. All of them
+drop the same invisible elements as is_tag_visible and return the text nodes
+joined by single spaces. FC_HTML_ENGINE picks one explicitly (default "auto").
+Large pages are parsed in a process pool, since parsing holds the GIL.
+"""
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+import bs4
+
+logger = logging.getLogger(__name__)
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+HTML_ENGINE = os.getenv("FC_HTML_ENGINE", "auto")
+# Pages at least this large (in characters) are parsed in the process pool
+HTML_POOL_MIN_CHARS = int(os.getenv("FC_HTML_POOL_MIN_CHARS", "100000"))
+HTML_POOL_WORKERS = int(os.getenv("FC_HTML_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+INVISIBLE_TAGS = ("style", "script", "head", "title", "meta")
+
+
+def is_tag_visible(element: bs4.element) -> bool:
+    """Determines if an HTML element is visible.
+
+    Args:
+        element: A BeautifulSoup element to check the visibility of.
+    returns:
+        Whether the element is visible.
+    """
+    if element.parent.name in [
+        "style",
+        "script",
+        "head",
+        "title",
+        "meta",
+        "[document]",
+    ] or isinstance(element, bs4.element.Comment):
+        return False
+    return True
+
+
+def _join(texts) -> str:
+    return " ".join(" ".join(texts).split())
+
+
+def _selectolax_text(html: str) -> str:
+    tree = HTMLParser(html)
+    tree.strip_tags(list(INVISIBLE_TAGS))
+    root = tree.root
+    return _join([root.text(separator=" ")]) if root is not None else ""
+
+
+def _lxml_text(html: str) -> str:
+    root = lxml.html.fromstring(html)
+    etree.strip_elements(root, etree.Comment, *INVISIBLE_TAGS, with_tail=False)
+    return _join(root.itertext())
+
+
+def _bs4_text(html: str) -> str:
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    return _join(t.strip() for t in filter(is_tag_visible, soup.findAll(text=True)))
+
+
+ENGINES = {"bs4": _bs4_text}
+if lxml is not None:
+    ENGINES["lxml"] = _lxml_text
+if HTMLParser is not None:
+    ENGINES["selectolax"] = _selectolax_text
+
+
+def _engine_name(engine: Optional[str]) -> str:
+    engine = engine or HTML_ENGINE
+    if engine == "auto":
+        return next(name for name in ("selectolax", "lxml", "bs4") if name in ENGINES)
+    if engine not in ENGINES:
+        logger.warning(f"HTML engine {engine} is not available, using bs4")
+        return "bs4"
+    return engine
+
+
+def extract_text(html: str, engine: str = None) -> str:
+    """Visible text of an HTML page, whitespace collapsed.
+
+    Args:
+        html: the page source.
+        engine: "selectolax", "lxml", "bs4" or "auto". Defaults to FC_HTML_ENGINE.
+    Returns:
+        The visible text, "" for an empty page.
+    """
+    if not html or not html.strip():
+        return ""
+    name = _engine_name(engine)
+    try:
+        return ENGINES[name](html)
+    except Exception as e:
+        if name == "bs4":
+            raise
+        # e.g. lxml refuses str input with an XML encoding declaration
+        logger.debug(f"{name} failed to parse the page, falling back to bs4: {e}")
+        return _bs4_text(html)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if HTML_POOL_WORKERS < 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Not fork: the server process runs threads (crawler loop, thread pools)
+                _pool = ProcessPoolExecutor(
+                    max_workers=HTML_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the extraction worker processes, they are restarted on demand."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def extract_texts(htmls: List[Optional[str]], engine: str = None) -> List[Optional[str]]:
+    """extract_text for many pages, large ones in the process pool.
+
+    Args:
+        htmls: page sources, None entries are passed through.
+        engine: see extract_text.
+    Returns:
+        The visible text of every page, in order; None where the page was None or failed to parse.
+    """
+    def safe_extract(html):
+        try:
+            return extract_text(html, engine)
+        except Exception as e:
+            logger.warning(f"Failed to extract page text: {e}")
+            return None
+
+    texts = [None] * len(htmls)
+    large = [i for i, html in enumerate(htmls) if html is not None and len(html) >= HTML_POOL_MIN_CHARS]
+    pool = _get_pool() if len(large) > 0 else None
+    futures = {}
+    if pool is not None:
+        try:
+            futures = {i: pool.submit(extract_text, htmls[i], _engine_name(engine)) for i in large}
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning(f"HTML extraction pool unavailable, parsing in-process: {e}")
+            shutdown_pool()
+            futures = {}
+
+    for i, html in enumerate(htmls):
+        if html is not None and i not in futures:
+            texts[i] = safe_extract(html)
+    for i, future in futures.items():
+        try:
+            texts[i] = future.result()
+        except BrokenProcessPool:
+            shutdown_pool()
+            texts[i] = safe_extract(htmls[i])
+        except Exception as e:
+            logger.warning(f"Failed to extract page text: {e}")
+    return texts
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+import itertools
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("FC_CACHE_DIR", "cache")
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# Job states; done and failed are terminal
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when the queue already holds max_depth jobs."""
+
+
+class JobQueue:
+    """Bounded, prioritized background job queue with a SQLite-backed job store.
+
+    A fixed pool of worker tasks pulls jobs in priority order and runs them with
+    the runner coroutine. Jobs still queued or running at shutdown are re-queued
+    on the next start. Job store calls run in worker threads, off the event loop.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[str, Dict], Awaitable[Dict]],
+        workers: int = int(os.getenv("FC_JOB_WORKERS", "2")),
+        max_depth: int = int(os.getenv("FC_JOB_MAX_DEPTH", "100")),
+        path: str = os.path.join(CACHE_DIR, "jobs.sqlite3"),
+        result_ttl: float = float(os.getenv("FC_JOB_RESULT_TTL", str(24 * 60 * 60))),
+    ):
+        """
+        Args:
+            runner: coroutine (kind, payload) -> result dict that executes a job.
+            workers: number of jobs run at the same time.
+            max_depth: maximum number of waiting jobs, further submissions are rejected.
+            path: SQLite file storing the jobs.
+            result_ttl: seconds finished jobs are kept.
+        """
+        self.runner = runner
+        self.workers = workers
+        self.max_depth = max_depth
+        self.path = path
+        self.result_ttl = result_ttl
+        self._db = None
+        self._lock = threading.Lock()
+        self._queue = None
+        self._tasks = []
+        self._watchers = {}
+        self._sequence = itertools.count()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        rows = await asyncio.to_thread(self._open_store)
+        self._queue = asyncio.PriorityQueue()
+        # Resume work interrupted by the last shutdown
+        for row in rows:
+            self._queue.put_nowait((row["priority"], next(self._sequence), row["id"]))
+        if rows:
+            logger.info(f"Re-queued {len(rows)} unfinished jobs")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self._close_store)
+
+    async def submit(self, kind: str, payload: Dict, priority: str = "normal") -> str:
+        """Queue a job and return its id.
+
+        Raises:
+            QueueFullError: when max_depth jobs are already waiting.
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue not started")
+        if self.depth >= self.max_depth:
+            raise QueueFullError(f"Job queue is full ({self.max_depth} jobs waiting)")
+
+        job_id = uuid.uuid4().hex
+        priority_value = PRIORITIES[priority]
+        await asyncio.to_thread(self._insert, job_id, kind, payload, priority_value)
+        self._queue.put_nowait((priority_value, next(self._sequence), job_id))
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """Current state of a job, None if unknown."""
+        return await asyncio.to_thread(self._load, job_id)
+
+    async def subscribe(self, job_id: str):
+        """Yield the job state now and after every change, until it is done or failed."""
+        updates = asyncio.Queue()
+        self._watchers.setdefault(job_id, set()).add(updates)
+        try:
+            job = await self.get(job_id)
+            while job is not None:
+                yield job
+                if job["status"] in (DONE, FAILED):
+                    break
+                job = await updates.get()
+        finally:
+            self._watchers[job_id].discard(updates)
+            if not self._watchers[job_id]:
+                del self._watchers[job_id]
+
+    async def _set_status(self, job_id: str, status: str, result: Dict = None, error: str = None):
+        await asyncio.to_thread(self._update, job_id, status, result, error)
+        if self._watchers.get(job_id):
+            job = await asyncio.to_thread(self._load, job_id)
+            for updates in self._watchers.get(job_id, ()):
+                updates.put_nowait(job)
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                row = await asyncio.to_thread(self._job_input, job_id)
+                if row is None:
+                    continue
+                await self._set_status(job_id, RUNNING)
+                try:
+                    result = await self.runner(row["kind"], json.loads(row["payload"]))
+                    await self._set_status(job_id, DONE, result=result)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Job {job_id} failed: {e}")
+                    await self._set_status(job_id, FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    # Job store, called in worker threads
+
+    def _open_store(self) -> List[sqlite3.Row]:
+        """Open the store, drop expired jobs and return the unfinished ones, marked queued again."""
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, priority INTEGER NOT NULL, "
+                "status TEXT NOT NULL, result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            now = time.time()
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, now - self.result_ttl)
+            )
+            rows = self._db.execute(
+                "SELECT id, priority FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = NULL, error = NULL, updated_at = ? WHERE status = ?",
+                (QUEUED, now, RUNNING),
+            )
+            self._db.commit()
+            return rows
+
+    def _close_store(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _insert(self, job_id: str, kind: str, payload: Dict, priority: int):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, payload, priority, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), priority, QUEUED, now, now),
+            )
+            self._db.commit()
+
+    def _job_input(self, job_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            if self._db is None:
+                return None
+            return self._db.execute("SELECT kind, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _load(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "priority": next(name for name, value in PRIORITIES.items() if value == row["priority"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def _update(self, job_id: str, status: str, result: Optional[Dict], error: Optional[str]):
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+            self._db.commit()
@@ -0,0 +1,191 @@
+import os
+import json
+import dotenv
+import logging
+import threading
+from typing import Tuple
+import google.generativeai as genai
+from groq import Groq, AsyncGroq
+from .schemas import STAGE_CONFIGS
+from .timing import timed
+
+dotenv.load_dotenv()
+
+genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages that talk to an LLM
+STAGES = ("extract", "questions", "questions_batch", "analyze", "report", "explain", "sources")
+
+# Default "<provider>:<model>" for every stage. Override one stage with an env var,
+# e.g. FC_LLM_QUESTIONS=groq:llama-3.3-70b-versatile
+DEFAULT_STAGE_MODELS = {
+    "extract": "gemini:gemini-2.0-flash",
+    "questions": "gemini:gemini-2.0-flash",
+    "questions_batch": "gemini:gemini-2.0-flash",
+    "analyze": "gemini:gemini-2.0-flash",
+    "report": "gemini:gemini-2.0-flash",
+    "explain": "gemini:gemini-2.0-flash",
+    "sources": "gemini:gemini-2.0-flash",
+}
+
+# Temperatures used for the Groq models, taken from the original Groq prompts
+GROQ_TEMPERATURES = {
+    "extract": 0.2,
+    "questions": 0.3,
+    "questions_batch": 0.3,
+    "analyze": 0.2,
+}
+
+PROVIDERS = ("gemini", "groq")
+
+# Stage name reported to fc.timing when it differs from the LLM stage
+TIMING_STAGES = {"questions_batch": "questions"}
+
+# Embedding model used for semantic lookups (claim cache)
+EMBEDDING_MODEL = os.getenv("FC_EMBEDDING_MODEL", "models/text-embedding-004")
+
+
+def stage_model(stage: str) -> Tuple[str, str]:
+    """Resolve the provider and model configured for a pipeline stage.
+
+    Args:
+        stage: one of STAGES.
+    Returns:
+        (provider, model_name) for the stage.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown LLM stage: {stage}")
+    spec = os.getenv(f"FC_LLM_{stage.upper()}", DEFAULT_STAGE_MODELS[stage])
+    provider, _, model_name = spec.partition(":")
+    if provider not in PROVIDERS or not model_name:
+        raise ValueError(f"Invalid LLM spec for stage {stage}: {spec!r}, expected '<provider>:<model>'")
+    return provider, model_name
+
+
+# Process-wide model handles, shared by every LLMClient, FactChecker and request
+_model_registry = {}
+_groq_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_gemini_model(stage: str, model_name: str = None):
+    """Return the shared GenerativeModel for a stage, building it on first use.
+
+    Args:
+        stage: one of STAGES, selects the generation config and response schema.
+        model_name: Gemini model to use. Defaults to the model configured for the stage.
+    Returns:
+        The cached genai.GenerativeModel.
+    """
+    if model_name is None:
+        model_name = stage_model(stage)[1]
+    key = (stage, model_name)
+    model = _model_registry.get(key)
+    if model is None:
+        with _registry_lock:
+            model = _model_registry.get(key)
+            if model is None:
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=STAGE_CONFIGS[stage],
+                )
+                _model_registry[key] = model
+    return model
+
+
+def get_groq_client(api_key: str, async_client: bool = False):
+    """Return the shared (Async)Groq client for an API key."""
+    key = (api_key, async_client)
+    client = _groq_registry.get(key)
+    if client is None:
+        with _registry_lock:
+            client = _groq_registry.get(key)
+            if client is None:
+                client = AsyncGroq(api_key=api_key) if async_client else Groq(api_key=api_key)
+                _groq_registry[key] = client
+    return client
+
+
+def _json_instruction(stage: str) -> str:
+    """Describe the expected JSON shape for providers without schema enforcement."""
+    schema = STAGE_CONFIGS[stage].get("response_schema")
+    if schema is None:
+        return "Respond with a single JSON object."
+    keys = list(schema.required) or list(schema.properties.keys())
+    return f"Respond with a single JSON object with the keys: {', '.join(keys)}."
+
+
+class LLMClient:
+    """Routes every pipeline stage to exactly one configured provider and model.
+
+    Holds no model state of its own: model objects and response schemas live in the
+    module-level registry, so creating a client per request is cheap.
+    """
+
+    def __init__(self, groq_api_key: str = None):
+        """
+        Args:
+            groq_api_key: API key for stages routed to Groq. Defaults to GROQ_API_KEY.
+        """
+        self.groq_api_key = groq_api_key or os.getenv("GROQ_API_KEY")
+
+    def _groq_request(self, stage: str, model_name: str, prompt: str) -> dict:
+        return {
+            "model": model_name,
+            "messages": [{"role": "user", "content": f"{prompt}\n\n{_json_instruction(stage)}"}],
+            "temperature": GROQ_TEMPERATURES.get(stage, 0.2),
+            "max_tokens": STAGE_CONFIGS[stage].get("max_output_tokens", 8192),
+            "response_format": {"type": "json_object"},
+        }
+
+    def complete_json(self, stage: str, prompt: str) -> dict:
+        """Send the prompt to the stage's model and parse the JSON answer."""
+        provider, model_name = stage_model(stage)
+        with timed(TIMING_STAGES.get(stage, stage)):
+            if provider == "groq":
+                client = get_groq_client(self.groq_api_key)
+                response = client.chat.completions.create(**self._groq_request(stage, model_name, prompt))
+                return json.loads(response.choices[0].message.content)
+
+            response = get_gemini_model(stage, model_name).generate_content(prompt)
+            return json.loads(response.text)
+
+    async def acomplete_json(self, stage: str, prompt: str) -> dict:
+        """Awaitable complete_json"""
+        provider, model_name = stage_model(stage)
+        with timed(TIMING_STAGES.get(stage, stage)):
+            if provider == "groq":
+                client = get_groq_client(self.groq_api_key, async_client=True)
+                response = await client.chat.completions.create(**self._groq_request(stage, model_name, prompt))
+                return json.loads(response.choices[0].message.content)
+
+            response = await get_gemini_model(stage, model_name).generate_content_async(prompt)
+            return json.loads(response.text)
+
+
+def embed_text(text: str) -> list:
+    """Embed a short text with the configured embedding model."""
+    return genai.embed_content(model=EMBEDDING_MODEL, content=text, task_type="semantic_similarity")["embedding"]
+
+
+async def aembed_text(text: str) -> list:
+    """Awaitable embed_text"""
+    result = await genai.embed_content_async(model=EMBEDDING_MODEL, content=text, task_type="semantic_similarity")
+    return result["embedding"]
+
+
+def embed_texts(texts: list) -> list:
+    """Embed several short texts with one embedding call, one embedding per text in order."""
+    if not texts:
+        return []
+    return genai.embed_content(model=EMBEDDING_MODEL, content=list(texts), task_type="semantic_similarity")["embedding"]
+
+
+async def aembed_texts(texts: list) -> list:
+    """Awaitable embed_texts"""
+    if not texts:
+        return []
+    result = await genai.embed_content_async(model=EMBEDDING_MODEL, content=list(texts), task_type="semantic_similarity")
+    return result["embedding"]
@@ -0,0 +1,92 @@
+import os
+import re
+import zlib
+import itertools
+from typing import Dict, List
+
+import numpy as np
+
+# Estimated Jaccard similarity above which two evidence texts are the same text
+NEAR_DUP_THRESHOLD = float(os.getenv("FC_NEAR_DUP_THRESHOLD", "0.7"))
+# Words per shingle
+SHINGLE_SIZE = 3
+# MinHash signature length, split into LSH bands of BAND_ROWS rows
+NUM_PERM = 64
+BAND_ROWS = 4
+
+_WORD_RE = re.compile(r"\w+")
+_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Hashed word shingles of a text; short texts become a single shingle."""
+    words = [w.lower() for w in _WORD_RE.findall(text)]
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i : i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+def minhash(shingle_set: set) -> np.ndarray:
+    """MinHash signature of a set of 32-bit shingle hashes."""
+    hashes = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    # (a * x + b) mod p for every permutation and shingle; the operands stay below 2^63
+    return ((np.outer(_A, hashes) + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def collapse_near_duplicates(evidence: List[Dict], threshold: float = NEAR_DUP_THRESHOLD) -> List[Dict]:
+    """Collapse evidence items whose texts are near-duplicates, such as syndicated wire copy.
+
+    Candidate pairs come from LSH banding of MinHash signatures and are kept when
+    their estimated Jaccard similarity reaches the threshold. Each cluster is
+    represented by its longest text; the other members' urls are listed in the
+    representative's "corroborating_urls".
+
+    Args:
+        evidence: evidence items with "text" and "url" keys.
+        threshold: minimum estimated Jaccard similarity of two near-duplicates.
+    Returns:
+        One item per cluster, in the order of each cluster's first item.
+    """
+    if len(evidence) < 2:
+        return evidence
+
+    signatures = [minhash(shingles(item["text"])) for item in evidence]
+    parent = list(range(len(evidence)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    candidates = set()
+    for band in range(0, NUM_PERM, BAND_ROWS):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            buckets.setdefault(signature[band : band + BAND_ROWS].tobytes(), []).append(i)
+        for members in buckets.values():
+            candidates.update(itertools.combinations(members, 2))
+    for i, j in candidates:
+        if np.mean(signatures[i] == signatures[j]) >= threshold:
+            parent[find(j)] = find(i)
+
+    clusters = {}
+    for i in range(len(evidence)):
+        clusters.setdefault(find(i), []).append(i)
+
+    collapsed = []
+    for members in sorted(clusters.values(), key=lambda m: m[0]):
+        representative = max(members, key=lambda i: len(evidence[i]["text"]))
+        item = dict(evidence[representative])
+        urls = list(item.get("corroborating_urls", []))
+        for i in members:
+            for url in [evidence[i]["url"], *evidence[i].get("corroborating_urls", [])]:
+                if url != item["url"] and url not in urls:
+                    urls.append(url)
+        if urls:
+            item["corroborating_urls"] = urls
+        collapsed.append(item)
+    return collapsed
@@ -3,8 +3,9 @@ import os
 from dotenv import load_dotenv
 from .news_summ import get_news
 from .fact_checker import FactChecker
-from .expAi import explain_factcheck_result, generate_visual_explanation
+from .expAi import aexplain_factcheck_result, generate_visual_explanation
 import uuid
+import asyncio
 import json
 
 load_dotenv()
@@ -52,15 +53,15 @@ class NewsFetcher:
                     self.fetched_pages.append(url)
 
                     # Get full text
-                    news_text = get_news(url)
+                    news_text = await asyncio.to_thread(get_news, url)
                     if news_text['status'] == 'error':
                         continue
                     
                     # Run fact check - it will be run through transformation pipeline
-                    fact_check_result = self.fact_checker.generate_report(news_text['text'])
+                    fact_check_result = await self.fact_checker.agenerate_report(news_text['text'])
                     
                     
-                    explanation = explain_factcheck_result(fact_check_result)
+                    explanation = await aexplain_factcheck_result(fact_check_result)
 
                     # Get visualization data
                     viz_data = generate_visual_explanation(explanation["explanation"])
@@ -0,0 +1,175 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from .coalesce import url_key
+from .html_text import extract_texts
+from .pdf_text import extract_pdf_texts
+from .evidence_index import get_evidence_index
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("FC_CACHE_DIR", "cache")
+
+# Pages fetched less than this many seconds ago are served without any request
+PAGE_CACHE_FRESH_SECONDS = float(os.getenv("FC_PAGE_CACHE_FRESH_SECONDS", str(60 * 60)))
+# Older pages are kept this long for conditional revalidation (ETag / Last-Modified)
+PAGE_CACHE_TTL = float(os.getenv("FC_PAGE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+# Maximum number of cached pages, least recently used ones are evicted first
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("FC_PAGE_CACHE_MAX_ENTRIES", "2000"))
+
+
+class PageCache:
+    """URL-keyed cache of the visible text of crawled pages, with validators for revalidation."""
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "page_cache.sqlite3"),
+        fresh_seconds: float = PAGE_CACHE_FRESH_SECONDS,
+        ttl: float = PAGE_CACHE_TTL,
+        max_entries: int = PAGE_CACHE_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            path: SQLite file backing the cache. Use ":memory:" for a process-local cache.
+            fresh_seconds: seconds a page is used without contacting its server.
+            ttl: seconds a page is kept for conditional revalidation.
+            max_entries: maximum number of pages kept.
+        """
+        self.fresh_seconds = fresh_seconds
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT PRIMARY KEY, url TEXT NOT NULL, text TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "truncated INTEGER NOT NULL, fetched_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self._db.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - self.ttl,))
+        self._db.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Cached page as {"url", "text", "etag", "last_modified", "truncated", "fetched_at", "fresh"}, None on a miss."""
+        now = time.time()
+        key = url_key(url)
+        with self._lock:
+            row = self._db.execute("SELECT * FROM pages WHERE key = ? AND fetched_at >= ?", (key, now - self.ttl)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE pages SET last_access = ? WHERE key = ?", (now, key))
+                self._db.commit()
+        if row is None:
+            return None
+        entry = {name: row[name] for name in ("url", "text", "etag", "last_modified", "fetched_at")}
+        entry["truncated"] = bool(row["truncated"])
+        entry["fresh"] = now - row["fetched_at"] < self.fresh_seconds
+        return entry
+
+    def put(self, url: str, text: str, etag: str = None, last_modified: str = None, truncated: bool = False):
+        """Store a page's visible text, evicting the least recently used pages beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (key, url, text, etag, last_modified, truncated, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url_key(url), url, text, etag, last_modified, int(truncated), now, now),
+            )
+            size = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            if size > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM pages WHERE key IN (SELECT key FROM pages ORDER BY last_access LIMIT ?)",
+                    (size - self.max_entries,),
+                )
+            self._db.commit()
+
+    def touch(self, url: str):
+        """Mark a page as fetched now, after the server confirmed it did not change."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE pages SET fetched_at = ?, last_access = ? WHERE key = ?", (now, now, url_key(url)))
+            self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
+
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Process-wide page cache, None when disabled with FC_PAGE_CACHE=0."""
+    global _page_cache
+    if os.getenv("FC_PAGE_CACHE", "1") != "1":
+        return None
+    if _page_cache is None:
+        with _page_cache_lock:
+            if _page_cache is None:
+                _page_cache = PageCache()
+    return _page_cache
+
+
+def page_texts(responses) -> List[Optional[str]]:
+    """Visible text of every crawled page, in order.
+
+    Pages the crawler served from the page cache are used as they are. Freshly
+    downloaded ones are extracted, large pages and PDFs in the process pool, cached
+    and added to the evidence index.
+
+    Args:
+        responses: crawl results, (success, response or None, url, query) tuples.
+    Returns:
+        The text of every page, None where the fetch failed or the page could not be parsed.
+    """
+    # A page shared by several queries is the same response object, extract it once
+    distinct, pdfs = {}, {}
+    for flag, response, _, _ in responses:
+        if not flag or getattr(response, "extracted", False):
+            continue
+        if getattr(response, "pdf", None) is not None:
+            pdfs.setdefault(id(response), response)
+        elif ".pdf" not in str(response.url):
+            # A PDF served as text would be parsed as garbage
+            distinct.setdefault(id(response), response)
+    extracted = dict(zip(distinct, extract_texts([response.text for response in distinct.values()])))
+    extracted.update(zip(pdfs, extract_pdf_texts([response.pdf for response in pdfs.values()])))
+    texts = [extracted.get(id(response)) for _, response, _, _ in responses]
+
+    cache = get_page_cache()
+    index = get_evidence_index()
+    stored = set()
+    for i, (flag, response, url, _) in enumerate(responses):
+        if flag and getattr(response, "extracted", False):
+            texts[i] = response.text
+        elif texts[i] is not None and id(response) not in stored:
+            stored.add(id(response))
+            if cache is not None:
+                headers = getattr(response, "headers", {})
+                cache.put(
+                    url,
+                    texts[i],
+                    etag=headers.get("etag"),
+                    last_modified=headers.get("last-modified"),
+                    truncated=getattr(response, "truncated", False),
+                )
+            if index is not None:
+                index.add_page_later(url, texts[i])
+    return texts
@@ -0,0 +1,190 @@
+"""Text extraction from PDF documents.
+
+Needs pypdf; without it PDFs are not downloaded at all. Only the first
+PDF_MAX_PAGES pages are read, in a process pool of their own, and a batch of
+PDFs gets PDF_EXTRACT_SECONDS at most. Workers still busy after that are
+killed and the pool is started again on demand.
+"""
+import io
+import os
+import re
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Pages of a PDF whose text is extracted
+PDF_MAX_PAGES = int(os.getenv("FC_PDF_MAX_PAGES", "10"))
+# Bytes downloaded per PDF at most. A cut-off PDF still yields the pages it holds.
+PDF_MAX_BYTES = int(os.getenv("FC_PDF_MAX_BYTES", str(8 * 1024 * 1024)))
+# Seconds spent extracting the PDFs of one crawl at most
+PDF_EXTRACT_SECONDS = float(os.getenv("FC_PDF_EXTRACT_SECONDS", "10"))
+# Extraction worker processes, 0 extracts in the calling thread
+PDF_POOL_WORKERS = int(os.getenv("FC_PDF_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+_CATALOG_RE = re.compile(rb"(\d+)\s+(\d+)\s+obj\s*<<(?:(?!endobj).){0,200}?/Type\s*/Catalog", re.S)
+
+
+def pdf_available() -> bool:
+    """Whether PDFs can be extracted, False when pypdf is missing or FC_PDF=0."""
+    return PdfReader is not None and os.getenv("FC_PDF", "1") == "1"
+
+
+def extract_pdf_text(data: bytes, max_pages: int = PDF_MAX_PAGES, max_seconds: float = None) -> str:
+    """Text of the first pages of a PDF, whitespace collapsed.
+
+    Args:
+        data: the PDF, possibly cut short.
+        max_pages: pages read at most.
+        max_seconds: no further page is read after this many seconds, None for no limit.
+    Returns:
+        The text, "" when the PDF has no text layer (e.g. scanned pages).
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+    if b"%%EOF" not in data[-1024:]:
+        data = _close_truncated(data)
+    # Not strict, so that the cross-reference table is rebuilt when it is missing
+    reader = PdfReader(io.BytesIO(data), strict=False)
+    texts = []
+    for i in range(min(max_pages, len(reader.pages))):
+        if deadline is not None and time.monotonic() > deadline:
+            logger.warning(f"PDF extraction ran out of time after {i} pages")
+            break
+        try:
+            texts.append(reader.pages[i].extract_text() or "")
+        except Exception:
+            # A page beyond the downloaded part of a truncated PDF
+            continue
+    return " ".join(" ".join(texts).split())
+
+
+def _close_truncated(data: bytes) -> bytes:
+    """Append a trailer to a PDF cut short by the download cap, so that the pages it holds can be read.
+
+    The trailer points at the document catalog; the reader rebuilds the
+    cross-reference table from the objects present.
+    """
+    match = _CATALOG_RE.search(data)
+    if match is None:
+        return data
+    return data + b"\ntrailer\n<< /Root %s %s R >>\nstartxref\n0\n%%%%EOF\n" % (match.group(1), match.group(2))
+
+
+_pool = None
+# Process ids of the pool's workers, each reports its own on start
+_pool_pids = None
+_pool_lock = threading.Lock()
+
+
+def _report_pid(pids):
+    pids.put(os.getpid())
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_pids
+    if PDF_POOL_WORKERS < 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Not fork: the server process runs threads (crawler loop, thread pools)
+                context = multiprocessing.get_context("spawn")
+                _pool_pids = context.SimpleQueue()
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_POOL_WORKERS, mp_context=context, initializer=_report_pid, initargs=(_pool_pids,)
+                )
+    return _pool
+
+
+def shutdown_pool(kill: bool = False):
+    """Stop the PDF worker processes, they are restarted on demand.
+
+    Args:
+        kill: terminate workers still extracting instead of waiting for them.
+    """
+    global _pool, _pool_pids
+    with _pool_lock:
+        pool, _pool = _pool, None
+        pids, _pool_pids = _pool_pids, None
+    if pool is None:
+        return
+    if kill:
+        # A running extraction cannot be cancelled, only its process can be stopped.
+        # A worker that has not reported yet has not started an extraction either.
+        while not pids.empty():
+            try:
+                os.kill(pids.get(), signal.SIGTERM)
+            except OSError:
+                pass
+    pool.shutdown(wait=not kill, cancel_futures=True)
+    pids.close()
+
+
+def extract_pdf_texts(
+    datas: List[Optional[bytes]], max_pages: int = PDF_MAX_PAGES, timeout: float = PDF_EXTRACT_SECONDS
+) -> List[Optional[str]]:
+    """extract_pdf_text for many PDFs in the process pool, within a shared time budget.
+
+    Args:
+        datas: PDF contents, None entries are passed through.
+        max_pages: pages read per PDF at most.
+        timeout: seconds to wait for all extractions together. Without the pool, the
+            PDFs extracted in this thread stop reading pages once it has passed.
+    Returns:
+        The text of every PDF, in order; None where the PDF was None, failed to parse or ran out of time.
+    """
+    deadline = time.monotonic() + timeout
+
+    def safe_extract(data):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning(f"PDF extraction ran out of time ({timeout}s)")
+            return None
+        try:
+            return extract_pdf_text(data, max_pages, max_seconds=remaining)
+        except Exception as e:
+            logger.warning(f"Failed to extract PDF text: {e}")
+            return None
+
+    texts = [None] * len(datas)
+    pending = [i for i, data in enumerate(datas) if data is not None]
+    pool = _get_pool() if pending else None
+    futures = {}
+    if pool is not None:
+        try:
+            futures = {i: pool.submit(extract_pdf_text, datas[i], max_pages, timeout) for i in pending}
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning(f"PDF extraction pool unavailable, parsing PDFs in-process: {e}")
+            shutdown_pool()
+            futures = {}
+
+    for i in pending:
+        if i not in futures:
+            texts[i] = safe_extract(datas[i])
+    timed_out = False
+    for i, future in futures.items():
+        try:
+            texts[i] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            timed_out = True
+        except BrokenProcessPool:
+            shutdown_pool()
+            texts[i] = safe_extract(datas[i])
+        except Exception as e:
+            logger.warning(f"Failed to extract PDF text: {e}")
+    if timed_out:
+        # The stuck workers would hold the pool for the next crawl
+        logger.warning(f"PDF extraction ran out of time ({timeout}s), restarting the PDF workers")
+        shutdown_pool(kill=True)
+    return texts
@@ -0,0 +1,401 @@
+"""Response schemas and generation configs for every LLM stage of the fact-check pipeline.
+
+Built once at import time and shared by all FactChecker instances and requests.
+"""
+from google.ai.generativelanguage_v1beta.types import content
+
+
+EXTRACT_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_schema": content.Schema(
+        type = content.Type.OBJECT,
+        enum = [],
+        required = ["claims"],
+        properties = {
+        "claims": content.Schema(
+            type = content.Type.ARRAY,
+            items = content.Schema(
+            type = content.Type.STRING,
+            ),
+        ),
+        },
+    ),
+    "response_mime_type": "application/json",
+}
+
+QUESTIONS_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_schema": content.Schema(
+        type = content.Type.OBJECT,
+        enum = [],
+        required = ["questions"],
+        properties = {
+        "questions": content.Schema(
+            type = content.Type.ARRAY,
+            items = content.Schema(
+            type = content.Type.STRING,
+            ),
+        ),
+        },
+    ),
+    "response_mime_type": "application/json",
+}
+
+# One structured request for every claim: [{"claim": ..., "questions": [...]}, ...]
+BATCH_QUESTIONS_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_schema": content.Schema(
+        type = content.Type.OBJECT,
+        enum = [],
+        required = ["claims"],
+        properties = {
+        "claims": content.Schema(
+            type = content.Type.ARRAY,
+            items = content.Schema(
+            type = content.Type.OBJECT,
+            required = ["claim", "questions"],
+            properties = {
+                "claim": content.Schema(
+                type = content.Type.STRING,
+                ),
+                "questions": content.Schema(
+                type = content.Type.ARRAY,
+                items = content.Schema(
+                    type = content.Type.STRING,
+                ),
+                ),
+            },
+            ),
+        ),
+        },
+    ),
+    "response_mime_type": "application/json",
+}
+
+ANALYSIS_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_schema": content.Schema(
+        type = content.Type.OBJECT,
+        enum = [],
+        required = ["confidence_score", "verified_status", "worthiness_score"],
+        properties = {
+        "confidence_score": content.Schema(
+            type = content.Type.INTEGER,
+        ),
+        "verified_status": content.Schema(
+            type = content.Type.INTEGER,
+        ),
+        "worthiness_score": content.Schema(
+            type = content.Type.INTEGER,
+        ),
+        },
+    ),
+    "response_mime_type": "application/json",
+}
+
+REPORT_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_schema": content.Schema(
+        type = content.Type.OBJECT,
+        enum = [],
+        required = ["overall_analysis", "claim_analysis", "meta_analysis"],
+        properties = {
+        "overall_analysis": content.Schema(
+            type = content.Type.OBJECT,
+            enum = [],
+            required = ["truth_score", "reliability_assessment", "key_findings", "patterns_identified"],
+            properties = {
+            "truth_score": content.Schema(
+                type = content.Type.NUMBER,
+            ),
+            "reliability_assessment": content.Schema(
+                type = content.Type.STRING,
+            ),
+            "key_findings": content.Schema(
+                type = content.Type.ARRAY,
+                items = content.Schema(
+                type = content.Type.STRING,
+                ),
+            ),
+            "patterns_identified": content.Schema(
+                type = content.Type.ARRAY,
+                items = content.Schema(
+                type = content.Type.STRING,
+                ),
+            ),
+            },
+        ),
+        "claim_analysis": content.Schema(
+            type = content.Type.ARRAY,
+            items = content.Schema(
+            type = content.Type.OBJECT,
+            required = ["claim", "verification_status", "confidence_level", "evidence_quality", "source_assessment", "misinformation_impact", "correction_suggestions"],
+            properties = {
+                "claim": content.Schema(
+                type = content.Type.STRING,
+                ),
+                "verification_status": content.Schema(
+                type = content.Type.STRING,
+                ),
+                "confidence_level": content.Schema(
+                type = content.Type.NUMBER,
+                ),
+                "evidence_quality": content.Schema(
+                type = content.Type.OBJECT,
+                required = ["strength", "gaps", "contradictions"],
+                properties = {
+                    "strength": content.Schema(
+                    type = content.Type.NUMBER,
+                    ),
+                    "gaps": content.Schema(
+                    type = content.Type.ARRAY,
+                    items = content.Schema(
+                        type = content.Type.STRING,
+                    ),
+                    ),
+                    "contradictions": content.Schema(
+                    type = content.Type.ARRAY,
+                    items = content.Schema(
+                        type = content.Type.STRING,
+                    ),
+                    ),
+                },
+                ),
+                "source_assessment": content.Schema(
+                type = content.Type.ARRAY,
+                items = content.Schema(
+                    type = content.Type.OBJECT,
+                    required = ["url", "credibility_metrics", "relevance_to_claim"],
+                    properties = {
+                    "url": content.Schema(
+                        type = content.Type.STRING,
+                    ),
+                    "credibility_metrics": content.Schema(
+                        type = content.Type.OBJECT,
+                        required = ["credibility_score", "bias_rating", "fact_checking_history"],
+                        properties = {
+                        "credibility_score": content.Schema(
+                            type = content.Type.NUMBER,
+                        ),
+                        "bias_rating": content.Schema(
+                            type = content.Type.STRING,
+                        ),
+                        "fact_checking_history": content.Schema(
+                            type = content.Type.NUMBER,
+                        ),
+                        },
+                    ),
+                    "relevance_to_claim": content.Schema(
+                        type = content.Type.NUMBER,
+                    ),
+                    },
+                ),
+                ),
+                "misinformation_impact": content.Schema(
+                type = content.Type.OBJECT,
+                required = ["severity", "affected_domains", "potential_consequences", "spread_risk"],
+                properties = {
+                    "severity": content.Schema(
+                    type = content.Type.NUMBER,
+                    ),
+                    "affected_domains": content.Schema(
+                    type = content.Type.ARRAY,
+                    items = content.Schema(
+                        type = content.Type.STRING,
+                    ),
+                    ),
+                    "potential_consequences": content.Schema(
+                    type = content.Type.ARRAY,
+                    items = content.Schema(
+                        type = content.Type.STRING,
+                    ),
+                    ),
+                    "spread_risk": content.Schema(
+                    type = content.Type.NUMBER,
+                    ),
+                },
+                ),
+                "correction_suggestions": content.Schema(
+                type = content.Type.OBJECT,
+                required = ["verified_facts", "recommended_sources", "context_missing"],
+                properties = {
+                    "verified_facts": content.Schema(
+                    type = content.Type.ARRAY,
+                    items = content.Schema(
+                        type = content.Type.STRING,
+                    ),
+                    ),
+                    "recommended_sources": content.Schema(
+                    type = content.Type.ARRAY,
+                    items = content.Schema(
+                        type = content.Type.OBJECT,
+                        properties = {
+                        "url": content.Schema(
+                            type = content.Type.STRING,
+                        ),
+                        "credibility_score": content.Schema(
+                            type = content.Type.NUMBER,
+                        ),
+                        "relevance": content.Schema(
+                            type = content.Type.NUMBER,
+                        ),
+                        },
+                    ),
+                    ),
+                    "context_missing": content.Schema(
+                    type = content.Type.ARRAY,
+                    items = content.Schema(
+                        type = content.Type.STRING,
+                    ),
+                    ),
+                },
+                ),
+            },
+            ),
+        ),
+        "meta_analysis": content.Schema(
+            type = content.Type.OBJECT,
+            required = ["information_ecosystem_impact", "recommended_actions", "prevention_strategies"],
+            properties = {
+            "information_ecosystem_impact": content.Schema(
+                type = content.Type.STRING,
+            ),
+            "recommended_actions": content.Schema(
+                type = content.Type.ARRAY,
+                items = content.Schema(
+                type = content.Type.STRING,
+                ),
+            ),
+            "prevention_strategies": content.Schema(
+                type = content.Type.ARRAY,
+                items = content.Schema(
+                type = content.Type.STRING,
+                ),
+            ),
+            },
+        ),
+        },
+    ),
+    "response_mime_type": "application/json",
+}
+
+EXPLAIN_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_schema": content.Schema(
+        type=content.Type.OBJECT,
+        required=["explanation_summary", "claim_explanations", "evidence_analysis", "trust_factors"],
+        properties={
+            "explanation_summary": content.Schema(
+                type=content.Type.STRING,
+            ),
+            "claim_explanations": content.Schema(
+                type=content.Type.ARRAY,
+                items=content.Schema(
+                    type=content.Type.OBJECT,
+                    required=["claim", "reasoning", "key_factors", "confidence_explanation"],
+                    properties={
+                        "claim": content.Schema(type=content.Type.STRING),
+                        "reasoning": content.Schema(type=content.Type.STRING),
+                        "key_factors": content.Schema(
+                            type=content.Type.ARRAY,
+                            items=content.Schema(type=content.Type.STRING)
+                        ),
+                        "confidence_explanation": content.Schema(type=content.Type.STRING)
+                    }
+                )
+            ),
+            "evidence_analysis": content.Schema(
+                type=content.Type.OBJECT,
+                required=["strength_explanation", "gap_analysis", "contradiction_details"],
+                properties={
+                    "strength_explanation": content.Schema(type=content.Type.STRING),
+                    "gap_analysis": content.Schema(type=content.Type.STRING),
+                    "contradiction_details": content.Schema(type=content.Type.STRING)
+                }
+            ),
+            "trust_factors": content.Schema(
+                type=content.Type.ARRAY,
+                items=content.Schema(
+                    type=content.Type.OBJECT,
+                    required=["factor", "impact", "recommendation"],
+                    properties={
+                        "factor": content.Schema(type=content.Type.STRING),
+                        "impact": content.Schema(type=content.Type.STRING),
+                        "recommendation": content.Schema(type=content.Type.STRING)
+                    }
+                )
+            )
+        }
+    ),
+    "response_mime_type": "application/json"
+}
+
+SOURCES_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_schema": content.Schema(
+        type = content.Type.OBJECT,
+        enum = [],
+        required = ["credibility_score", "fact_checking_history", "transparency_score", "expertise_level", "brief_explanation"],
+        properties = {
+        "credibility_score": content.Schema(
+            type = content.Type.INTEGER,
+        ),
+        "fact_checking_history": content.Schema(
+            type = content.Type.INTEGER,
+        ),
+        "transparency_score": content.Schema(
+            type = content.Type.INTEGER,
+        ),
+        "expertise_level": content.Schema(
+            type = content.Type.INTEGER,
+        ),
+        "brief_explanation": content.Schema(
+            type = content.Type.STRING,
+        ),
+        "additional_metrics": content.Schema(
+            type = content.Type.OBJECT,
+            properties = {
+            "citation_score": content.Schema(
+                type = content.Type.INTEGER,
+            ),
+            "peer_recognition": content.Schema(
+                type = content.Type.INTEGER,
+            ),
+            },
+        ),
+        },
+    ),
+    "response_mime_type": "application/json",
+}
+
+# Generation config for every stage served through the LLM client
+STAGE_CONFIGS = {
+    "extract": EXTRACT_CONFIG,
+    "questions": QUESTIONS_CONFIG,
+    "questions_batch": BATCH_QUESTIONS_CONFIG,
+    "analyze": ANALYSIS_CONFIG,
+    "report": REPORT_CONFIG,
+    "explain": EXPLAIN_CONFIG,
+    "sources": SOURCES_CONFIG,
+}
@@ -2,9 +2,12 @@ import json
 import requests
 import bs4
 from typing import List, Dict
-from concurrent.futures import ThreadPoolExecutor
 import os
-from web_helper import crawl_web, is_tag_visible
+from .web_helper import crawl_web, is_tag_visible
+from .page_cache import page_texts
+from .serper_cache import get_serper_cache
+from .serper_batcher import get_serper_batcher, search_serper
+from .snippet_anchor import find_anchor
 
 class SerperSearch:
     def __init__(self, api_key: str):
@@ -14,6 +17,7 @@ class SerperSearch:
             'X-API-KEY': api_key,
             'Content-Type': 'application/json'
         }
+        self.cache = get_serper_cache()
 
     def search(self, query: str, num_results: int = 3, extend_snippets: bool = True) -> List[Dict]:
         # Initial search request
@@ -23,16 +27,15 @@ class SerperSearch:
             'autocorrect': False
         }
         
-        response = requests.post(
-            self.base_url,
-            headers=self.headers,
-            json=payload
-        )
-        
-        if response.status_code != 200:
-            return []
+        results = self.cache.get(payload) if self.cache is not None else None
+        if results is None:
+            fetched = self._request([payload])
+            if fetched is None:
+                return []
 
-        results = response.json()
+            results = fetched[0]
+            if self.cache is not None:
+                self.cache.put(payload, results)
         
         # Handle answer box if present
         if 'answerBox' in results:
@@ -54,8 +57,11 @@ class SerperSearch:
                 str(query): [result['link'] for result in organic_results]
             }
             
-            # Crawl web pages for extended content
-            crawl_responses = crawl_web(query_url_dict)
+            # Crawl web pages for extended content, stopping once the snippet has been read
+            anchors = {}
+            for result in organic_results:
+                anchors.setdefault(result['link'], []).append(result.get('snippet', ''))
+            crawl_responses = crawl_web(query_url_dict, anchors)
             
             # Process crawled content
             extended_snippets = self._process_crawled_content(
@@ -89,35 +95,33 @@ class SerperSearch:
         ][:4]
 
     def _process_crawled_content(self, crawl_responses, original_snippets) -> List[str]:
-        def extend_snippet(response, original_snippet, flag):
-            if not flag or not response or '.pdf' in str(response.url):
+        def extend_snippet(text, original_snippet):
+            if text is None:
                 return original_snippet
             
             try:
-                soup = bs4.BeautifulSoup(response.text, 'html.parser')
-                text = soup.get_text()
-                
-                # Find the snippet context
-                snippet_start = text.find(original_snippet[:50])  # Use first 50 chars to find match
-                if snippet_start == -1:
+                # Find the snippet context, tolerating ellipses and spacing differences
+                anchor = find_anchor(text, original_snippet)
+                if anchor is None:
                     return original_snippet
+                snippet_start, snippet_end, _ = anchor
                 
                 # Extract extended context
                 pre_context = 0
                 post_context = 500
                 start = max(0, snippet_start - pre_context)
-                end = min(len(text), snippet_start + len(original_snippet) + post_context)
+                end = min(len(text), snippet_end + post_context)
                 
                 extended_text = text[start:end].strip()
                 return f"{extended_text}..."
             except Exception:
                 return original_snippet
 
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            extended_snippets = list(executor.map(
-                lambda x: extend_snippet(x[0][1], x[1], x[0][0]),
-                zip(crawl_responses, original_snippets)
-            ))
+        # Cached pages are reused, the others parsed (large ones in worker processes) and cached
+        texts = page_texts(crawl_responses)
+        extended_snippets = [
+            extend_snippet(text, snippet) for text, snippet in zip(texts, original_snippets)
+        ]
             
         return extended_snippets
 
@@ -125,22 +129,37 @@ class SerperSearch:
         """
         Perform batch searches for multiple queries
         """
-        url = "https://google.serper.dev/search"
-        
         queries_data = [{"q": query, "autocorrect": False} for query in queries]
-        payload = json.dumps(queries_data)
-        
-        response = requests.post(url, headers=self.headers, data=payload)
-        
-        if response.status_code != 200:
-            return {}
-            
-        results = response.json()
+        results = self.cache.get_many(queries_data) if self.cache is not None else [None] * len(queries_data)
+        # Only the queries missing from the cache go upstream
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            fetched = self._request([queries_data[i] for i in missing])
+            if fetched is None:
+                return {}
+
+            for i, result in zip(missing, fetched):
+                results[i] = result
+            if self.cache is not None:
+                self.cache.put_many([queries_data[i] for i in missing], fetched)
         return {
             query: self._process_single_response(response_data, num_results)
             for query, response_data in zip(queries, results)
         }
     
+    def _request(self, queries: List[Dict]):
+        """Serper responses to the queries, None when the request failed.
+
+        Queries share requests with concurrent searches through the process-wide batcher.
+        """
+        batcher = get_serper_batcher()
+        try:
+            if batcher is not None:
+                return batcher.search(self.api_key, queries)
+            return search_serper(self.api_key, queries)
+        except Exception:
+            return None
+
     def _process_single_response(self, response_data: Dict, num_results: int) -> List[Dict]:
         if 'answerBox' in response_data:
             return [{
@@ -0,0 +1,254 @@
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import backoff
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+SERPER_URL = "https://google.serper.dev/search"
+# Maximum number of queries in one Serper request
+SERPER_BATCH_SIZE = 100
+# Queries arriving within this many milliseconds of the first one share a request
+SERPER_BATCH_WINDOW_MS = float(os.getenv("FC_SERPER_BATCH_WINDOW_MS", "5"))
+# Batches sent at the same time
+SERPER_BATCH_WORKERS = int(os.getenv("FC_SERPER_BATCH_WORKERS", "4"))
+# Serper requests in flight at the same time, across all batches
+SERPER_MAX_PARALLEL = int(os.getenv("FC_SERPER_MAX_PARALLEL", "8"))
+SERPER_TIMEOUT = float(os.getenv("FC_SERPER_TIMEOUT", "30"))
+# Attempts per request and seconds spent retrying at most, on 429, 5xx and connection errors
+SERPER_MAX_TRIES = int(os.getenv("FC_SERPER_MAX_TRIES", "4"))
+SERPER_MAX_RETRY_SECONDS = float(os.getenv("FC_SERPER_MAX_RETRY_SECONDS", "20"))
+
+
+class SerperError(Exception):
+    """A Serper request failed."""
+
+
+class SerperRetryableError(SerperError):
+    """Serper rate limited the request (429) or failed on its side (5xx)."""
+
+
+_session = None
+_request_pool = None
+_session_lock = threading.Lock()
+
+
+def get_serper_session() -> requests.Session:
+    """Process-wide session, so that connections to Serper are kept alive and reused."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Retries are handled by post_serper, with backoff
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SERPER_MAX_PARALLEL, max_retries=0)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _get_request_pool() -> ThreadPoolExecutor:
+    global _request_pool
+    if _request_pool is None:
+        with _session_lock:
+            if _request_pool is None:
+                _request_pool = ThreadPoolExecutor(max_workers=SERPER_MAX_PARALLEL, thread_name_prefix="serper-request")
+    return _request_pool
+
+
+@backoff.on_exception(
+    backoff.expo,
+    (SerperRetryableError, requests.ConnectionError, requests.Timeout),
+    max_tries=SERPER_MAX_TRIES,
+    max_time=SERPER_MAX_RETRY_SECONDS,
+    logger=logger,
+)
+def post_serper(api_key: str, queries: List[Dict]) -> List[Dict]:
+    """Send one batch request to Serper, retried with exponential backoff when it is worth retrying.
+
+    Args:
+        api_key: the Serper API key.
+        queries: at most SERPER_BATCH_SIZE query dicts ({"q": ..., ...}).
+    Returns:
+        One response dict per query, in order.
+    Raises:
+        SerperError: the request failed, after the retries for 429 and 5xx responses.
+    """
+    headers = {
+        "X-API-KEY": api_key,
+        "Content-Type": "application/json",
+    }
+    response = get_serper_session().post(SERPER_URL, headers=headers, data=json.dumps(queries), timeout=SERPER_TIMEOUT)
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 403:
+        raise SerperError("Failed to authenticate. Check your API key.")
+    elif response.status_code == 429 or response.status_code >= 500:
+        raise SerperRetryableError(f"Serper returned {response.status_code}: {response.text[:200]}")
+    else:
+        raise SerperError(f"Error occurred: {response.text}")
+
+
+def search_serper(api_key: str, queries: List[Dict], batch_size: int = SERPER_BATCH_SIZE) -> List[Dict]:
+    """Responses to any number of queries, sent in parallel requests of batch_size queries.
+
+    At most SERPER_MAX_PARALLEL requests are in flight across the process.
+
+    Args:
+        api_key: the Serper API key.
+        queries: query dicts ({"q": ..., ...}).
+        batch_size: queries per request at most.
+    Returns:
+        One response dict per query, in order.
+    Raises:
+        SerperError: one of the requests failed.
+    """
+    chunks = [queries[i : i + batch_size] for i in range(0, len(queries), batch_size)]
+    futures = [_get_request_pool().submit(post_serper, api_key, chunk) for chunk in chunks]
+    batches = [future.result() for future in futures]
+    responses = []
+    for chunk, batch in zip(chunks, batches):
+        if len(batch) != len(chunk):
+            raise SerperError(f"Serper returned {len(batch)} responses for {len(chunk)} queries")
+        responses += batch
+    return responses
+
+
+class SerperBatcher:
+    """Merges the Serper queries of concurrent callers into shared batch requests.
+
+    A caller's queries wait up to window_ms for others to arrive, then every
+    waiting query is sent in parallel requests of at most SERPER_BATCH_SIZE
+    queries, one batch per API key. Identical queries are sent once. Each caller gets the
+    responses to its own queries. When a merged batch fails, every caller's queries are
+    sent again on their own, so a caller only gets the exception of its own request.
+    """
+
+    def __init__(
+        self,
+        window_ms: float = SERPER_BATCH_WINDOW_MS,
+        max_batch: int = SERPER_BATCH_SIZE,
+        workers: int = SERPER_BATCH_WORKERS,
+        send: Callable[[str, List[Dict], int], List[Dict]] = None,
+    ):
+        """
+        Args:
+            window_ms: milliseconds the first query of a batch waits for more.
+            max_batch: queries per request at most. A full batch is sent without waiting.
+            workers: batches sent at the same time.
+            send: sends a batch of queries in requests of at most max_batch queries, defaults to search_serper.
+        """
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.send = send
+        self.requests = 0
+        self.queries = 0
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._pending_count = 0
+        self._first_at = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="serper")
+        self._thread = None
+
+    def submit(self, api_key: str, queries: List[Dict]) -> Future:
+        """Queue queries, the future resolves to their responses in order."""
+        future = Future()
+        if not queries:
+            future.set_result([])
+            return future
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="serper-batcher", daemon=True)
+                self._thread.start()
+            if not self._pending_count:
+                self._first_at = time.monotonic()
+            self._pending.setdefault(api_key, []).append((queries, future))
+            self._pending_count += len(queries)
+            self._cond.notify()
+        return future
+
+    def search(self, api_key: str, queries: List[Dict]) -> List[Dict]:
+        """Responses to the queries, blocking the calling thread."""
+        return self.submit(api_key, queries).result()
+
+    async def asearch(self, api_key: str, queries: List[Dict]) -> List[Dict]:
+        """Awaitable search, safe to call from a running event loop."""
+        return await asyncio.wrap_future(self.submit(api_key, queries))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending_count:
+                    self._cond.wait()
+                while self._pending_count < self.max_batch:
+                    remaining = self._first_at + self.window - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                pending, self._pending, self._pending_count = self._pending, {}, 0
+            for api_key, waiters in pending.items():
+                self._executor.submit(self._flush, api_key, waiters)
+
+    def _flush(self, api_key: str, waiters: list):
+        unique = {}
+        for queries, _ in waiters:
+            for query in queries:
+                unique.setdefault(json.dumps(query, sort_keys=True), query)
+        keys = list(unique)
+        send = self.send or search_serper
+        try:
+            responses = dict(zip(keys, send(api_key, [unique[key] for key in keys], self.max_batch)))
+        except Exception as e:
+            if len(waiters) == 1:
+                waiters[0][1].set_exception(e)
+                return
+            # One caller's query may have broken the merged request: each caller retries on its own
+            logger.warning(f"Batch of {len(waiters)} callers failed, retrying per caller: {e}")
+            for queries, future in waiters:
+                self._executor.submit(self._send_one, api_key, queries, future)
+            return
+        self.requests += math.ceil(len(keys) / self.max_batch)
+        self.queries += sum(len(queries) for queries, _ in waiters)
+        if len(waiters) > 1:
+            logger.debug(f"Sent {len(keys)} queries of {len(waiters)} callers in one batch")
+        for queries, future in waiters:
+            future.set_result([responses[json.dumps(query, sort_keys=True)] for query in queries])
+
+    def _send_one(self, api_key: str, queries: List[Dict], future: Future):
+        send = self.send or search_serper
+        try:
+            responses = send(api_key, queries, self.max_batch)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        self.requests += math.ceil(len(queries) / self.max_batch)
+        self.queries += len(queries)
+        future.set_result(responses)
+
+    def stats(self) -> Dict:
+        return {"requests": self.requests, "queries": self.queries}
+
+
+_serper_batcher = None
+_serper_batcher_lock = threading.Lock()
+
+
+def get_serper_batcher() -> Optional[SerperBatcher]:
+    """Process-wide Serper batcher, None when disabled with FC_SERPER_BATCHER=0."""
+    global _serper_batcher
+    if os.getenv("FC_SERPER_BATCHER", "1") != "1":
+        return None
+    if _serper_batcher is None:
+        with _serper_batcher_lock:
+            if _serper_batcher is None:
+                _serper_batcher = SerperBatcher()
+    return _serper_batcher
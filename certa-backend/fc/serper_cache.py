@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("FC_CACHE_DIR", "cache")
+
+# Search results older than this are fetched again
+SERPER_CACHE_TTL = float(os.getenv("FC_SERPER_CACHE_TTL", str(6 * 60 * 60)))
+# Maximum number of cached responses, least recently used ones are evicted first
+SERPER_CACHE_MAX_ENTRIES = int(os.getenv("FC_SERPER_CACHE_MAX_ENTRIES", "20000"))
+
+# Serper's defaults for the parameters that are part of the key
+DEFAULT_NUM = 10
+DEFAULT_AUTOCORRECT = True
+
+
+def serper_key(query: Dict) -> str:
+    """Cache key of one Serper query object ({"q": ..., "num": ..., "autocorrect": ...}).
+
+    The query text is lowercased and its whitespace collapsed; parameters left out
+    take Serper's defaults so that explicit and implicit defaults share a key.
+    """
+    params = {name: value for name, value in query.items() if name != "q"}
+    params["q"] = " ".join(str(query["q"]).lower().split())
+    params["num"] = int(params.get("num", DEFAULT_NUM))
+    params["autocorrect"] = bool(params.get("autocorrect", DEFAULT_AUTOCORRECT))
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SerperCache:
+    """On-disk cache of Serper search responses with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "serper_cache.sqlite3"),
+        ttl: float = SERPER_CACHE_TTL,
+        max_entries: int = SERPER_CACHE_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            path: SQLite file backing the cache. Use ":memory:" for a process-local cache.
+            ttl: seconds a response stays valid.
+            max_entries: maximum number of responses kept.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        self._db.commit()
+        self._size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get_many(self, queries: List[Dict]) -> List[Optional[Dict]]:
+        """Cached response for every query object, in order, None for misses.
+
+        The stored searchParameters.q is replaced with the query as asked, since
+        queries differing only in case or spacing share an entry.
+        """
+        keys = [serper_key(query) for query in queries]
+        now = time.time()
+        with self._lock:
+            rows = {}
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                rows.update(self._db.execute(
+                    f"SELECT key, value FROM responses WHERE key IN ({','.join('?' * len(chunk))}) AND created_at >= ?",
+                    (*chunk, now - self.ttl),
+                ).fetchall())
+            if rows:
+                self._db.executemany("UPDATE responses SET last_access = ? WHERE key = ?", [(now, key) for key in rows])
+                self._db.commit()
+
+        responses = []
+        for query, key in zip(queries, keys):
+            value = rows.get(key)
+            if value is None:
+                self.misses += 1
+                responses.append(None)
+                continue
+            self.hits += 1
+            response = json.loads(value)
+            response.setdefault("searchParameters", {})["q"] = query["q"]
+            responses.append(response)
+        return responses
+
+    def get(self, query: Dict) -> Optional[Dict]:
+        return self.get_many([query])[0]
+
+    def put_many(self, queries: List[Dict], responses: List[Dict]):
+        """Store one response per query object, evicting the least recently used entries beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                [(serper_key(query), json.dumps(response), now, now) for query, response in zip(queries, responses)],
+            )
+            self._size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if self._size > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (self._size - self.max_entries,),
+                )
+                self._size = self.max_entries
+            self._db.commit()
+
+    def put(self, query: Dict, response: Dict):
+        self.put_many([query], [response])
+
+    def stats(self) -> Dict:
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_serper_cache = None
+_serper_cache_lock = threading.Lock()
+
+
+def get_serper_cache() -> Optional[SerperCache]:
+    """Process-wide Serper response cache, None when disabled with FC_SERPER_CACHE=0."""
+    global _serper_cache
+    if os.getenv("FC_SERPER_CACHE", "1") != "1":
+        return None
+    if _serper_cache is None:
+        with _serper_cache_lock:
+            if _serper_cache is None:
+                _serper_cache = SerperCache()
+    return _serper_cache
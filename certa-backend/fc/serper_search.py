@@ -1,4 +1,3 @@
-from concurrent.futures import ThreadPoolExecutor
 import json
 import requests
 import dotenv
@@ -14,8 +13,6 @@ import backoff
 import time
 import bs4
 import asyncio
-from httpx import AsyncHTTPTransport
-from httpx._client import AsyncClient
 
 
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:65.0) Gecko/20100101 Firefox/65.0"
@@ -24,57 +21,18 @@ MOBILE_USER_AGENT = "Mozilla/5.0 (Linux; Android 7.0; SM-G930V Build/NRD90M) App
 headers = {"User-Agent": USER_AGENT}
 
 
-def is_tag_visible(element: bs4.element) -> bool:
-    """Determines if an HTML element is visible.
+def crawl_web(query_url_dict: dict, anchors: dict = None):
+    """Fetch every url of {query: [urls]} with the shared crawler client
 
-    Args:
-        element: A BeautifulSoup element to check the visibility of.
-    returns:
-        Whether the element is visible.
+    Pages are streamed within a byte budget; with anchors ({url: [snippets]}) the
+    download stops once the snippets and the text following them have arrived.
     """
-    if element.parent.name in [
-        "style",
-        "script",
-        "head",
-        "title",
-        "meta",
-        "[document]",
-    ] or isinstance(element, bs4.element.Comment):
-        return False
-    return True
-
-
-transport = AsyncHTTPTransport(retries=3)
-
-
-async def httpx_get(url: str, headers: dict):
-    try:
-        async with AsyncClient(transport=transport) as client:
-            response = await client.get(url, headers=headers, timeout=3)
-            response = response if response.status_code == 200 else None
-            if not response:
-                return False, None
-            else:
-                return True, response
-    except Exception as e:  # noqa: F841
-        return False, None
-
+    return get_crawler().crawl(query_url_dict, anchors)
 
-async def httpx_bind_key(url: str, headers: dict, key: str = ""):
-    flag, response = await httpx_get(url, headers)
-    return flag, response, url, key
 
-
-def crawl_web(query_url_dict: dict):
-    tasks = list()
-    for query, urls in query_url_dict.items():
-        for url in urls:
-            task = httpx_bind_key(url=url, headers=headers, key=query)
-            tasks.append(task)
-    asyncio.set_event_loop(asyncio.SelectorEventLoop())
-    loop = asyncio.get_event_loop()
-    responses = loop.run_until_complete(asyncio.gather(*tasks))
-    return responses
+async def acrawl_web(query_url_dict: dict, anchors: dict = None):
+    """Awaitable crawl_web, safe to call from a running event loop"""
+    return await get_crawler().acrawl(query_url_dict, anchors)
 
 
 # @backoff.on_exception(backoff.expo, (requests.exceptions.RequestException, requests.exceptions.Timeout), max_tries=1,max_time=3)
@@ -90,17 +48,11 @@ def parse_response(response: requests.Response, url: str, query: str = None):
     html_content = response.text
     url = url
     try:
-        soup = bs4.BeautifulSoup(html_content, "html.parser")
-        texts = soup.findAll(text=True)
-        # Filter out invisible text from the page.
-        visible_text = filter(is_tag_visible, texts)
+        # Visible text only, spacing cleaned up
+        web_text = extract_text(html_content)
     except Exception as _:  # noqa: F841
         return None, url, query
 
-    # Returns all the text concatenated as a string.
-    web_text = " ".join(t.strip() for t in visible_text).strip()
-    # Clean up spacing.
-    web_text = " ".join(web_text.split())
     return web_text, url, query
 
 
@@ -121,19 +73,12 @@ def scrape_url(url: str, timeout: float = 3):
     except requests.exceptions.RequestException as _:  # noqa: F841
         return None, url
 
-    # Extract out all text from the tags
+    # Extract out all visible text, spacing cleaned up
     try:
-        soup = bs4.BeautifulSoup(response.text, "html.parser")
-        texts = soup.findAll(text=True)
-        # Filter out invisible text from the page.
-        visible_text = filter(is_tag_visible, texts)
+        web_text = extract_text(response.text)
     except Exception as _:  # noqa: F841
         return None, url
 
-    # Returns all the text concatenated as a string.
-    web_text = " ".join(t.strip() for t in visible_text).strip()
-    # Clean up spacing.
-    web_text = " ".join(web_text.split())
     return web_text, url
 
 
@@ -157,6 +102,15 @@ import os
 import logging
 from flask import g
 from logging.handlers import TimedRotatingFileHandler
+from .timing import timed
+from .serper_cache import SerperCache, get_serper_cache
+from .serper_batcher import get_serper_batcher, search_serper
+from .evidence_index import EvidenceIndex, get_evidence_index
+from .crawler import get_crawler
+from .html_text import extract_text, is_tag_visible  # noqa: F401
+from .snippet_anchor import find_anchor
+from .page_cache import page_texts
+from .near_dup import collapse_near_duplicates
 
 class CustomLogger:
     def __init__(self, name: str, loglevel=logging.INFO):
@@ -183,13 +137,29 @@ class CustomLogger:
 
 logger = CustomLogger(__name__).getlog()
 
+_DEFAULT_SERPER_CACHE = object()
+_DEFAULT_EVIDENCE_INDEX = object()
+
 
 class SerperEvidenceRetriever:
-    def __init__(self, api_key: str):
-        """Initialize the SerperEvidenceRetrieve class"""
+    def __init__(
+        self,
+        api_key: str,
+        serper_cache: SerperCache = _DEFAULT_SERPER_CACHE,
+        evidence_index: EvidenceIndex = _DEFAULT_EVIDENCE_INDEX,
+    ):
+        """Initialize the SerperEvidenceRetrieve class
+
+        Args:
+            api_key (str): the serper api key.
+            serper_cache (SerperCache, optional): cache of serper responses, None to disable. Defaults to the process-wide cache.
+            evidence_index (EvidenceIndex, optional): index of crawled passages searched before serper, None to disable.
+                Defaults to the process-wide index.
+        """
         self.lang = "en"
         self.serper_key = api_key
-        
+        self.serper_cache = get_serper_cache() if serper_cache is _DEFAULT_SERPER_CACHE else serper_cache
+        self.evidence_index = get_evidence_index() if evidence_index is _DEFAULT_EVIDENCE_INDEX else evidence_index
 
     def retrieve_evidence(self, claim_queries_dict, top_k: int = 3, snippet_extend_flag: bool = True):
         """Retrieve evidences for the given claims
@@ -204,18 +174,80 @@ class SerperEvidenceRetriever:
         """
         logger.info("Collecting evidences ...")
         query_list = [y for x in claim_queries_dict.items() for y in x[1]]
+        unique_queries, query_slots = self._dedup_queries(query_list)
         evidence_list = self._retrieve_evidence_4_all_claim(
-            query_list=query_list, top_k=top_k, snippet_extend_flag=snippet_extend_flag
+            query_list=unique_queries, top_k=top_k, snippet_extend_flag=snippet_extend_flag
+        )
+        evidence_list = self._expand_evidences(evidence_list, query_slots)
+        claim_evidence_dict = self._group_evidence_by_claim(claim_queries_dict, evidence_list)
+        logger.info("Collect evidences done!")
+
+        return claim_evidence_dict
+
+    async def aretrieve_evidence(self, claim_queries_dict, top_k: int = 3, snippet_extend_flag: bool = True):
+        """Awaitable retrieve_evidence, safe to call from a running event loop
+
+        Args:
+            claim_queries_dict (dict): a dictionary of claims and their corresponding queries.
+            top_k (int, optional): the number of top relevant results to retrieve. Defaults to 3.
+            snippet_extend_flag (bool, optional): whether to extend the snippet. Defaults to True.
+
+        Returns:
+            dict: a dictionary of claims and their corresponding evidences.
+        """
+        logger.info("Collecting evidences ...")
+        query_list = [y for x in claim_queries_dict.items() for y in x[1]]
+        unique_queries, query_slots = self._dedup_queries(query_list)
+        evidence_list = await self._aretrieve_evidence_4_all_claim(
+            query_list=unique_queries, top_k=top_k, snippet_extend_flag=snippet_extend_flag
         )
+        evidence_list = self._expand_evidences(evidence_list, query_slots)
+        claim_evidence_dict = self._group_evidence_by_claim(claim_queries_dict, evidence_list)
+        logger.info("Collect evidences done!")
+
+        return claim_evidence_dict
+
+    def _dedup_queries(self, query_list):
+        """Collapse identical and near-identical queries of all claims
 
+        Queries with the same words in the same order, ignoring case and punctuation,
+        are searched once. Every word is kept: "is" and "was" ask about different times,
+        and word order and repeated words change what a search engine returns.
+
+        Args:
+            query_list (list[str]): the queries of all claims.
+
+        Returns:
+            tuple[list[str], list[int]]: the distinct queries and, for every query, the index of its distinct query.
+        """
+        unique_queries = []
+        query_slots = []
+        slot_by_key = {}
+        for query in query_list:
+            key = " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+            if key not in slot_by_key:
+                slot_by_key[key] = len(unique_queries)
+                unique_queries.append(query)
+            query_slots.append(slot_by_key[key])
+        if len(unique_queries) < len(query_list):
+            logger.info(f"Searching {len(unique_queries)} distinct queries out of {len(query_list)}")
+        return unique_queries, query_slots
+
+    def _expand_evidences(self, evidence_list, query_slots):
+        """Evidences of every original query from those of the distinct queries"""
+        return [[dict(evidence) for evidence in evidence_list[slot]] for slot in query_slots]
+
+    def _group_evidence_by_claim(self, claim_queries_dict, evidence_list):
         i = 0
         claim_evidence_dict = {}
         for claim, queries in claim_queries_dict.items():
             evidences_per_query_L = evidence_list[i : i + len(queries)]
-            claim_evidence_dict[claim] = [e for evidences in evidences_per_query_L for e in evidences]
+            # Syndicated copies of the same text are kept once, with the other urls as corroborating_urls
+            claim_evidence_dict[claim] = collapse_near_duplicates(
+                [e for evidences in evidences_per_query_L for e in evidences]
+            )
             i += len(queries)
         assert i == len(evidence_list)
-        logger.info("Collect evidences done!")
 
         return claim_evidence_dict
 
@@ -224,6 +256,65 @@ class SerperEvidenceRetriever:
     ) -> list[list[str]]:
         """Retrieve evidences for the given queries
 
+        Queries the local evidence index answers well are not searched on the web.
+
+        Args:
+            query_list (list[str]): a list of queries to retrieve evidences for.
+            top_k (int, optional): the number of top relevant results to retrieve. Defaults to 3.
+            snippet_extend_flag (bool, optional): whether to extend the snippet. Defaults to True.
+
+        Returns:
+            list[list[]]: a list of [a list of evidences for each given query].
+        """
+        with timed("search"):
+            evidences, remote = self._local_evidences(query_list, top_k)
+        if remote:
+            found = self._serper_evidences([query_list[i] for i in remote], top_k, snippet_extend_flag)
+            for i, query_evidences in zip(remote, found):
+                evidences[i] = query_evidences
+        return evidences
+
+    async def _aretrieve_evidence_4_all_claim(
+        self, query_list: list[str], top_k: int = 3, snippet_extend_flag: bool = True
+    ) -> list[list[str]]:
+        """Async counterpart of _retrieve_evidence_4_all_claim"""
+        with timed("search"):
+            evidences, remote = await asyncio.to_thread(self._local_evidences, query_list, top_k)
+        if remote:
+            found = await self._aserper_evidences([query_list[i] for i in remote], top_k, snippet_extend_flag)
+            for i, query_evidences in zip(remote, found):
+                evidences[i] = query_evidences
+        return evidences
+
+    def _local_evidences(self, query_list, top_k):
+        """Evidences from the local evidence index, for the queries it covers well
+
+        Args:
+            query_list (list[str]): the queries to search.
+            top_k (int): the number of evidences needed per query.
+
+        Returns:
+            tuple[list[list], list[int]]: the evidences of every query (empty when not answered locally)
+                and the indices of the queries left for serper.
+        """
+        evidences = [[] for _ in query_list]
+        if self.evidence_index is None:
+            return evidences, list(range(len(query_list)))
+        remote = []
+        for i, hits in enumerate(self.evidence_index.lookup_many(query_list, top_k)):
+            if hits is None:
+                remote.append(i)
+            else:
+                evidences[i] = [{"text": hit["text"], "url": hit["url"]} for hit in hits]
+        if len(remote) < len(query_list):
+            logger.info(f"Evidence index answered {len(query_list) - len(remote)}/{len(query_list)} queries")
+        return evidences, remote
+
+    def _serper_evidences(
+        self, query_list: list[str], top_k: int = 3, snippet_extend_flag: bool = True
+    ) -> list[list[str]]:
+        """Retrieve evidences for the given queries from serper and the crawled result pages
+
         Args:
             query_list (list[str]): a list of queries to retrieve evidences for.
             top_k (int, optional): the number of top relevant results to retrieve. Defaults to 3.
@@ -237,16 +328,71 @@ class SerperEvidenceRetriever:
         evidences = [[] for _ in query_list]
 
         # get the response from serper
-        serper_responses = []
-        for i in range(0, len(query_list), 100):
-            batch_query_list = query_list[i : i + 100]
-            batch_response = self._request_serper_api(batch_query_list)
-            if batch_response is None:
-                logger.error("Serper API request error!")
-                return evidences
-            else:
-                serper_responses += batch_response.json()
+        serper_responses, missing = self._cached_serper_responses(query_list)
+        if missing:
+            with timed("search"):
+                fetched = self._request_serper_api([query_list[j] for j in missing])
+            self._store_serper_responses(query_list, missing, fetched, serper_responses)
+
+        query_url_dict, _snippet_to_check = self._collect_serper_evidences(
+            evidences, query_list, serper_responses, top_k, snippet_extend_flag
+        )
+
+        # return if there is no snippet to check or snippet_extend_flag is False
+        if (len(_snippet_to_check) == 0) or (not snippet_extend_flag):
+            return evidences
+
+        # crawl web for queries without answer box
+        with timed("crawl"):
+            responses = crawl_web(query_url_dict, self._crawl_anchors(query_url_dict, _snippet_to_check))
+        with timed("parse"):
+            self._merge_extended_snippets(evidences, query_list, responses, _snippet_to_check)
+
+        return evidences
+
+    async def _aserper_evidences(
+        self, query_list: list[str], top_k: int = 3, snippet_extend_flag: bool = True
+    ) -> list[list[str]]:
+        """Async counterpart of _serper_evidences
+
+        The Serper requests and the crawl are awaited, while the Serper cache and parsing
+        run in worker threads so the calling event loop keeps serving other requests.
+        """
+        evidences = [[] for _ in query_list]
+
+        serper_responses, missing = await asyncio.to_thread(self._cached_serper_responses, query_list)
+        if missing:
+            with timed("search"):
+                fetched = await self._arequest_serper_api([query_list[j] for j in missing])
+            await asyncio.to_thread(self._store_serper_responses, query_list, missing, fetched, serper_responses)
+
+        query_url_dict, _snippet_to_check = self._collect_serper_evidences(
+            evidences, query_list, serper_responses, top_k, snippet_extend_flag
+        )
+
+        if (len(_snippet_to_check) == 0) or (not snippet_extend_flag):
+            return evidences
+
+        with timed("crawl"):
+            responses = await acrawl_web(query_url_dict, self._crawl_anchors(query_url_dict, _snippet_to_check))
+        with timed("parse"):
+            await asyncio.to_thread(self._merge_extended_snippets, evidences, query_list, responses, _snippet_to_check)
 
+        return evidences
+
+    def _collect_serper_evidences(self, evidences, query_list, serper_responses, top_k, snippet_extend_flag):
+        """Fill evidences in place from the serper responses
+
+        Args:
+            evidences (list[list]): the evidence list to fill, one entry per query.
+            query_list (list[str]): the queries sent to serper.
+            serper_responses (list[dict]): the serper responses, one per query.
+            top_k (int): the number of top relevant results to keep.
+            snippet_extend_flag (bool): whether the snippets will be extended by crawling.
+
+        Returns:
+            tuple[dict, list[str]]: the urls to crawl keyed by query index, and the snippets to extend, in crawl order.
+        """
         # get the responses for queries with an answer box
         query_url_dict = {}
         url_to_date = {}  # TODO: decide whether to use date
@@ -282,59 +428,53 @@ class SerperEvidenceRetriever:
 
                 # Save date for each url
                 url_to_date.update({_result.get("link"): _result.get("date") for _result in topk_results})
-                # Save query-url pair, 1 query may have multiple urls
-                query_url_dict.update({query: [_result.get("link") for _result in topk_results]})
+                # Save query-url pair, 1 query may have multiple urls. Keyed by index: queries may repeat
+                query_url_dict[i] = [_result.get("link") for _result in topk_results]
                 _snippet_to_check += [_result["snippet"] if "snippet" in _result else "" for _result in topk_results]
 
-        # return if there is no snippet to check or snippet_extend_flag is False
-        if (len(_snippet_to_check) == 0) or (not snippet_extend_flag):
-            return evidences
+        return query_url_dict, _snippet_to_check
 
-        # crawl web for queries without answer box
-        responses = crawl_web(query_url_dict)
-        # Get extended snippets based on the snippet from serper
-        flag_to_check = [_item[0] for _item in responses]
-        response_to_check = [_item[1] for _item in responses]
+    def _crawl_anchors(self, query_url_dict, _snippet_to_check):
+        """Map every url to crawl to the snippets that will be looked up in its page"""
+        anchors = {}
+        urls = [url for urls in query_url_dict.values() for url in urls]
+        for url, snippet in zip(urls, _snippet_to_check):
+            anchors.setdefault(url, []).append(snippet)
+        return anchors
+
+    def _merge_extended_snippets(self, evidences, query_list, responses, _snippet_to_check):
+        """Extend the snippets from the crawled pages and add them to evidences in place"""
+        # Get extended snippets based on the snippet from serper; crawl results are tagged with the query index
         url_to_check = [_item[2] for _item in responses]
         query_to_check = [_item[3] for _item in responses]
 
-        def bs4_parse_text(response, snippet, flag):
-            """Parse the text from the response and extend the snippet
+        def extend_snippet(text, snippet):
+            """Extend the snippet with the page text around it
 
             Args:
-                response (web response): the response from the web
+                text (str): the visible text of the page, None if it was not crawled or parsed
                 snippet (str): the snippet to extend from the search result
-                flag (bool): flag to extend the snippet
 
             Returns:
-                _type_: _description_
+                str: the extended snippet, or the snippet itself if it is not found in the page
             """
-            if flag and ".pdf" not in str(response.url):
-                soup = bs4.BeautifulSoup(response.text, "html.parser")
-                text = soup.get_text()
-                # Search for the snippet in text
-                snippet_start = text.find(snippet[:-10])
-                if snippet_start == -1:
-                    return snippet
-                else:
-                    pre_context_range = 0  # Number of characters around the snippet to display
-                    post_context_range = 500  # Number of characters around the snippet to display
-                    start = max(0, snippet_start - pre_context_range)
-                    end = snippet_start + len(snippet) + post_context_range
-                    return text[start:end] + " ..."
-            else:
+            if text is None:
+                return snippet
+            # Search for the snippet in text, tolerating ellipses and spacing differences
+            anchor = find_anchor(text, snippet)
+            if anchor is None:
                 return snippet
+            else:
+                snippet_start, snippet_end, _ = anchor
+                pre_context_range = 0  # Number of characters around the snippet to display
+                post_context_range = 500  # Number of characters around the snippet to display
+                start = max(0, snippet_start - pre_context_range)
+                end = snippet_end + post_context_range
+                return text[start:end] + " ..."
 
-        # Question: if os.cpu_count() cause problems when running in parallel?
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            _extended_snippet = list(
-                executor.map(
-                    lambda _r, _s, _f: bs4_parse_text(_r, _s, _f),
-                    response_to_check,
-                    _snippet_to_check,
-                    flag_to_check,
-                )
-            )
+        # Cached pages are reused, the others parsed (large ones in worker processes) and cached
+        _page_texts = page_texts(responses)
+        _extended_snippet = [extend_snippet(_t, _s) for _t, _s in zip(_page_texts, _snippet_to_check)]
 
         # merge the snippets by query
         query_snippet_url_dict = {}
@@ -344,43 +484,69 @@ class SerperEvidenceRetriever:
             query_snippet_url_dict[_query] = _snippet_url_list
 
         # extend the evidence list for each query
-        for _query in query_snippet_url_dict.keys():
-            _query_index = query_list.index(_query)
-            _snippet_url_list = query_snippet_url_dict[_query]
+        for _query_index, _snippet_url_list in query_snippet_url_dict.items():
             evidences[_query_index] += [
                 {"text": re.sub(r"\n+", "\n", snippet), "url": _url} for snippet, _url in _snippet_url_list
             ]
 
-        return evidences
+    def _cached_serper_responses(self, query_list):
+        """Look up the queries in the serper cache
+
+        Args:
+            query_list (list[str]): the queries to search.
+
+        Returns:
+            tuple[list, list[int]]: one response per query (None when not cached) and the indices of the uncached queries.
+        """
+        if self.serper_cache is None:
+            return [None] * len(query_list), list(range(len(query_list)))
+        responses = self.serper_cache.get_many(self._serper_queries(query_list))
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if len(missing) < len(query_list):
+            logger.info(f"Serper cache hit for {len(query_list) - len(missing)}/{len(query_list)} queries")
+        return responses, missing
+
+    def _store_serper_responses(self, query_list, batch_indices, batch_responses, serper_responses):
+        """Put the fetched responses in place in serper_responses and in the serper cache"""
+        for i, response in zip(batch_indices, batch_responses):
+            serper_responses[i] = response
+        if self.serper_cache is not None:
+            self.serper_cache.put_many(self._serper_queries([query_list[i] for i in batch_indices]), batch_responses)
+
+    def _serper_queries(self, questions):
+        return [{"q": question, "autocorrect": False} for question in questions]
 
     def _request_serper_api(self, questions):
         """Request the serper api
 
+        The questions share requests with those of concurrent callers through the
+        process-wide batcher, or go out in parallel requests of their own when it is disabled.
+
         Args:
             questions (list): a list of questions to request the serper api.
 
         Returns:
-            web response: the response from the serper api
+            list[dict]: the serper response for each question
         """
-        url = "https://google.serper.dev/search"
+        queries = self._serper_queries(questions)
+        batcher = get_serper_batcher()
+        if batcher is not None:
+            return batcher.search(self.serper_key, queries)
+        return search_serper(self.serper_key, queries)
 
-        headers = {
-            "X-API-KEY": self.serper_key,
-            "Content-Type": "application/json",
-        }
+    async def _arequest_serper_api(self, questions):
+        """Request the serper api without blocking the event loop
 
-        questions_data = [{"q": question, "autocorrect": False} for question in questions]
-        payload = json.dumps(questions_data)
-        response = None
-        response = requests.request("POST", url, headers=headers, data=payload)
-
-        if response.status_code == 200:
-            return response
-        elif response.status_code == 403:
-            raise Exception("Failed to authenticate. Check your API key.")
-        else:
-            raise Exception(f"Error occurred: {response.text}")
+        Args:
+            questions (list): a list of questions to request the serper api.
 
+        Returns:
+            list[dict]: the serper response for each question
+        """
+        batcher = get_serper_batcher()
+        if batcher is not None:
+            return await batcher.asearch(self.serper_key, self._serper_queries(questions))
+        return await asyncio.to_thread(self._request_serper_api, questions)
 
 if __name__ == "__main__":
     import argparse
@@ -0,0 +1,65 @@
+import os
+import re
+from collections import Counter
+from typing import Optional, Tuple
+
+# Words per shingle compared between snippet and page
+ANCHOR_NGRAM = 3
+# Minimum fraction of the snippet's shingles found together in the page
+ANCHOR_MIN_SCORE = float(os.getenv("FC_ANCHOR_MIN_SCORE", "0.5"))
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def find_anchor(text: str, snippet: str, min_score: float = ANCHOR_MIN_SCORE) -> Optional[Tuple[int, int, float]]:
+    """Locate a search-result snippet in page text, tolerating ellipses, dates and spacing.
+
+    Both sides are reduced to lowercase words and compared as overlapping word
+    n-grams. The page window, at most about twice the snippet long, holding the
+    most distinct snippet n-grams wins. Runs in time linear in the page length.
+
+    Args:
+        text: the page text.
+        snippet: the snippet to locate.
+        min_score: minimum fraction of the snippet's n-grams the window must contain.
+    Returns:
+        (start, end, score): character span in text of the best window, from its first
+        to its last matched word, and its score. None when no window reaches min_score.
+    """
+    snippet_words = [w.lower() for w in _WORD_RE.findall(snippet)]
+    if not snippet_words:
+        return None
+    n = min(ANCHOR_NGRAM, len(snippet_words))
+    grams = {tuple(snippet_words[i : i + n]) for i in range(len(snippet_words) - n + 1)}
+
+    words = list(_WORD_RE.finditer(text))
+    lowered = [m.group().lower() for m in words]
+    # Word index and n-gram of every page n-gram that also occurs in the snippet
+    matches = []
+    for j in range(len(words) - n + 1):
+        gram = tuple(lowered[j : j + n])
+        if gram in grams:
+            matches.append((j, gram))
+    if not matches:
+        return None
+
+    # Ellipses in the snippet stand for skipped page text, so allow the window some slack
+    span = max(2 * len(snippet_words), len(snippet_words) + 50)
+    in_window = Counter()
+    best_count, best_first, best_last = 0, 0, 0
+    lo = 0
+    for hi, (j, gram) in enumerate(matches):
+        in_window[gram] += 1
+        while j - matches[lo][0] >= span:
+            old = matches[lo][1]
+            in_window[old] -= 1
+            if not in_window[old]:
+                del in_window[old]
+            lo += 1
+        if len(in_window) > best_count:
+            best_count, best_first, best_last = len(in_window), matches[lo][0], j
+
+    score = best_count / len(grams)
+    if score < min_score:
+        return None
+    return words[best_first].start(), words[best_last + n - 1].end(), score
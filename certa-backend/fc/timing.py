@@ -0,0 +1,52 @@
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Pipeline stages reported by the benchmark harness, in pipeline order
+STAGES = ("extract", "questions", "search", "crawl", "parse", "analyze", "report", "explain")
+
+_collectors = []
+_collectors_lock = threading.Lock()
+
+
+class StageTimings:
+    """Wall-clock durations of every timed call, grouped by stage."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.durations[stage].append(seconds)
+
+    def totals(self) -> dict:
+        with self._lock:
+            return {stage: sum(values) for stage, values in self.durations.items()}
+
+
+@contextmanager
+def collect_timings():
+    """Collect the stage timings of everything run inside the block, from any thread."""
+    timings = StageTimings()
+    with _collectors_lock:
+        _collectors.append(timings)
+    try:
+        yield timings
+    finally:
+        with _collectors_lock:
+            _collectors.remove(timings)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a pipeline stage. Costs one clock read when nobody is collecting."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _collectors:
+            elapsed = time.perf_counter() - start
+            for timings in list(_collectors):
+                timings.add(stage, elapsed)
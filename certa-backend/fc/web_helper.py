@@ -3,8 +3,8 @@ import backoff
 import time
 import bs4
 import asyncio
-from httpx import AsyncHTTPTransport
-from httpx._client import AsyncClient
+from .crawler import get_crawler
+from .html_text import extract_text, is_tag_visible  # noqa: F401
 
 
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:65.0) Gecko/20100101 Firefox/65.0"
@@ -13,57 +13,18 @@ MOBILE_USER_AGENT = "Mozilla/5.0 (Linux; Android 7.0; SM-G930V Build/NRD90M) App
 headers = {"User-Agent": USER_AGENT}
 
 
-def is_tag_visible(element: bs4.element) -> bool:
-    """Determines if an HTML element is visible.
+def crawl_web(query_url_dict: dict, anchors: dict = None):
+    """Fetch every url of {query: [urls]} with the shared crawler client
 
-    Args:
-        element: A BeautifulSoup element to check the visibility of.
-    returns:
-        Whether the element is visible.
+    Pages are streamed within a byte budget; with anchors ({url: [snippets]}) the
+    download stops once the snippets and the text following them have arrived.
     """
-    if element.parent.name in [
-        "style",
-        "script",
-        "head",
-        "title",
-        "meta",
-        "[document]",
-    ] or isinstance(element, bs4.element.Comment):
-        return False
-    return True
-
+    return get_crawler().crawl(query_url_dict, anchors)
 
-transport = AsyncHTTPTransport(retries=3)
 
-
-async def httpx_get(url: str, headers: dict):
-    try:
-        async with AsyncClient(transport=transport) as client:
-            response = await client.get(url, headers=headers, timeout=3)
-            response = response if response.status_code == 200 else None
-            if not response:
-                return False, None
-            else:
-                return True, response
-    except Exception as e:  # noqa: F841
-        return False, None
-
-
-async def httpx_bind_key(url: str, headers: dict, key: str = ""):
-    flag, response = await httpx_get(url, headers)
-    return flag, response, url, key
-
-
-def crawl_web(query_url_dict: dict):
-    tasks = list()
-    for query, urls in query_url_dict.items():
-        for url in urls:
-            task = httpx_bind_key(url=url, headers=headers, key=query)
-            tasks.append(task)
-    asyncio.set_event_loop(asyncio.SelectorEventLoop())
-    loop = asyncio.get_event_loop()
-    responses = loop.run_until_complete(asyncio.gather(*tasks))
-    return responses
+async def acrawl_web(query_url_dict: dict, anchors: dict = None):
+    """Awaitable crawl_web, safe to call from a running event loop"""
+    return await get_crawler().acrawl(query_url_dict, anchors)
 
 
 # @backoff.on_exception(backoff.expo, (requests.exceptions.RequestException, requests.exceptions.Timeout), max_tries=1,max_time=3)
@@ -79,17 +40,11 @@ def parse_response(response: requests.Response, url: str, query: str = None):
     html_content = response.text
     url = url
     try:
-        soup = bs4.BeautifulSoup(html_content, "html.parser")
-        texts = soup.findAll(text=True)
-        # Filter out invisible text from the page.
-        visible_text = filter(is_tag_visible, texts)
+        # Visible text only, spacing cleaned up
+        web_text = extract_text(html_content)
     except Exception as _:  # noqa: F841
         return None, url, query
 
-    # Returns all the text concatenated as a string.
-    web_text = " ".join(t.strip() for t in visible_text).strip()
-    # Clean up spacing.
-    web_text = " ".join(web_text.split())
     return web_text, url, query
 
 
@@ -110,19 +65,12 @@ def scrape_url(url: str, timeout: float = 3):
     except requests.exceptions.RequestException as _:  # noqa: F841
         return None, url
 
-    # Extract out all text from the tags
+    # Extract out all visible text, spacing cleaned up
     try:
-        soup = bs4.BeautifulSoup(response.text, "html.parser")
-        texts = soup.findAll(text=True)
-        # Filter out invisible text from the page.
-        visible_text = filter(is_tag_visible, texts)
+        web_text = extract_text(response.text)
     except Exception as _:  # noqa: F841
         return None, url
 
-    # Returns all the text concatenated as a string.
-    web_text = " ".join(t.strip() for t in visible_text).strip()
-    # Clean up spacing.
-    web_text = " ".join(web_text.split())
     return web_text, url
 
 
@@ -7,15 +7,15 @@ from contextlib import asynccontextmanager
 import asyncio
 import logging
 import json
-import nest_asyncio
-
-nest_asyncio.apply()
 from pydantic import BaseModel
 from Gemini.final import get_gemini_analysis
 import os
 from tempfile import NamedTemporaryFile
 from routes.news_fetch import news_router
-from routes.user_inputs import input_router
+from routes.user_inputs import input_router, job_queue
+from fc.crawler import get_crawler
+from fc.html_text import shutdown_pool as shutdown_html_pool
+from fc.pdf_text import shutdown_pool as shutdown_pdf_pool
 import hypercorn.asyncio
 from hypercorn.config import Config
 
@@ -29,8 +29,16 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Failed to connect to database on startup: {e}")
         raise
+    # Shared crawler client: pooled, keep-alive connections for evidence pages
+    crawler = get_crawler()
+    crawler.start()
+    await job_queue.start()
     background_tasks = set()
     yield
+    await job_queue.stop()
+    await asyncio.to_thread(crawler.stop)
+    await asyncio.to_thread(shutdown_html_pool)
+    await asyncio.to_thread(shutdown_pdf_pool)
     # Shutdown: Close database connection and clean up tasks
     try:
         await Database.close_db()
@@ -1,13 +1,17 @@
 from .news_summ import get_news
-from fastapi import Depends, APIRouter, HTTPException
+from fastapi import Depends, APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from .auth import get_current_user
 import os
 from dotenv import load_dotenv
 from fc.newsfetcher import NewsFetcher
 import json
 import asyncio
-from fc.expAi import explain_factcheck_result, generate_visual_explanation
+from contextlib import aclosing
+from fc.expAi import aexplain_factcheck_result, generate_visual_explanation
 from fc.fact_checker import FactChecker
+from fc.job_queue import JobQueue, QueueFullError, PRIORITIES
+from fc.coalesce import SingleFlight, text_key, url_key
 from pydub import AudioSegment
 
 from pydantic import BaseModel
@@ -38,72 +42,224 @@ logger = logging.getLogger(__name__)
 
 input_router = APIRouter()
 
-@input_router.post("/get-fc-url")
-async def get_fc_url(input_data: UrlInput):
-    try:
-        print(f"Fetching news from URL: {input_data.url}")
-        news_text = get_news(input_data.url)
+class NewsFetchError(Exception):
+    """The article behind a URL could not be fetched or parsed."""
+
+# Identical fact-check inputs arriving together share one pipeline run
+fact_check_flight = SingleFlight()
+
+async def compute_fact_check(kind: str, value: str) -> dict:
+    if kind == "url":
+        print(f"Fetching news from URL: {value}")
+        news_text = await asyncio.to_thread(get_news, value)
         print(f"News fetch result: {news_text['status']}")
-      
         if news_text['status'] == 'error':
             print(f"Error message: {news_text.get('message', 'Unknown error')}")
-            return {
-                "status": "Unable to fetch the news from the url. Please try a different link",
-                "content": None
-            }
-        
-        groq_api_key=os.getenv("GROQ_API_KEY")
-        serper_api_key=os.getenv("SERPER_API_KEY")
-        if not groq_api_key or not serper_api_key:
-            raise HTTPException(status_code=500, detail="Missing GROQ_API_KEY or SERPER_API_KEY environment variable")
-        print(f"API keys present: GROQ={groq_api_key is not None}, SERPER={serper_api_key is not None}")
-        
-        fact_checker = FactChecker(groq_api_key=groq_api_key, serper_api_key=serper_api_key)
-        # Run fact check - it will be run through transformation pipeline
-        fact_check_result = fact_checker.generate_report(news_text['text'])
-        
-        explanation = explain_factcheck_result(fact_check_result)
-
-        
-        #return an object with fact check result and visualization data, and explanation
+            raise NewsFetchError(news_text.get('message', 'Unknown error'))
+        value = news_text['text']
+
+    fact_checker = get_fact_checker()
+    # Run fact check - it will be run through transformation pipeline
+    fact_check_result = await fact_checker.agenerate_report(value)
+    
+    explanation = await aexplain_factcheck_result(fact_check_result)
+
+    #return an object with fact check result and visualization data, and explanation
+    return {
+        "fact_check_result": fact_check_result,
+        "explanation": explanation["explanation"],
+    }
+
+async def coalesced_fact_check(kind: str, value: str) -> dict:
+    """compute_fact_check, shared between concurrent requests for the same text or canonical URL."""
+    key = url_key(value) if kind == "url" else text_key(value)
+    return await fact_check_flight.do(key, lambda: compute_fact_check(kind, value))
+
+@input_router.post("/get-fc-url")
+async def get_fc_url(input_data: UrlInput, enqueue: bool = False, priority: str = "normal"):
+    if enqueue:
+        return await enqueue_fact_check("url", {"url": input_data.url}, priority)
+    try:
+        content = await coalesced_fact_check("url", input_data.url)
         return {
             "status": "success",
-            "content": {
-                "fact_check_result": fact_check_result,
-                "explanation": explanation["explanation"],
-            }
+            "content": content,
+        }
+    except NewsFetchError:
+        return {
+            "status": "Unable to fetch the news from the url. Please try a different link",
+            "content": None
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Exception in get_fc_url: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     
 @input_router.post("/get-fc-text")
-async def get_fc_text(input_data: TextInput):
+async def get_fc_text(input_data: TextInput, enqueue: bool = False, priority: str = "normal"):
+    if enqueue:
+        return await enqueue_fact_check("text", {"text": input_data.text}, priority)
     try:
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        serper_api_key = os.getenv("SERPER_API_KEY")
-        if not groq_api_key or not serper_api_key:
-            raise HTTPException(status_code=500, detail="Missing GROQ_API_KEY or SERPER_API_KEY environment variable")
-        
-        fact_checker = FactChecker(groq_api_key=groq_api_key, serper_api_key=serper_api_key)
-        # Run fact check - it will be run through transformation pipeline
-        fact_check_result = fact_checker.generate_report(input_data.text)
-        
-        explanation = explain_factcheck_result(fact_check_result)
-
-        
-        #return an object with fact check result and visualization data, and explanation
+        content = await coalesced_fact_check("text", input_data.text)
         return {
             "status": "success",
-            "content": {
-                "fact_check_result": fact_check_result,
-                "explanation": explanation["explanation"],
-                
-            }
+            "content": content,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def get_fact_checker() -> FactChecker:
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    serper_api_key = os.getenv("SERPER_API_KEY")
+    if not groq_api_key or not serper_api_key:
+        raise HTTPException(status_code=500, detail="Missing GROQ_API_KEY or SERPER_API_KEY environment variable")
+    return FactChecker(groq_api_key=groq_api_key, serper_api_key=serper_api_key)
+
+async def fact_check_events(fact_checker: FactChecker, news_text: str):
+    """Pipeline events from FactChecker.astream_report, then the explanation.
+
+    A failure ends the stream with a single "error" event. Closing the stream early
+    closes the pipeline's too, cancelling the claims still being analyzed.
+    """
+    try:
+        async with aclosing(fact_checker.astream_report(news_text)) as events:
+            async for event in events:
+                yield event
+                if event["event"] == "report":
+                    explanation = await aexplain_factcheck_result(event["data"])
+                    yield {"event": "explanation", "data": explanation["explanation"]}
+    except Exception as e:
+        logger.error(f"Error in fact check stream: {str(e)}")
+        yield {"event": "error", "data": {"message": str(e)}}
+
+async def sse_events(events):
+    async with aclosing(events):
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        sse_events(events),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@input_router.post("/get-fc-url/stream")
+async def stream_fc_url(input_data: UrlInput):
+    """Server-sent events version of /get-fc-url: claims, each verdict, the report, the explanation."""
+    fact_checker = get_fact_checker()
+    news_text = await asyncio.to_thread(get_news, input_data.url)
+    if news_text['status'] == 'error':
+        return {
+            "status": "Unable to fetch the news from the url. Please try a different link",
+            "content": None
+        }
+    return sse_response(fact_check_events(fact_checker, news_text['text']))
+
+@input_router.post("/get-fc-text/stream")
+async def stream_fc_text(input_data: TextInput):
+    """Server-sent events version of /get-fc-text: claims, each verdict, the report, the explanation."""
+    fact_checker = get_fact_checker()
+    return sse_response(fact_check_events(fact_checker, input_data.text))
+
+@input_router.websocket("/ws/fc")
+async def fact_check_socket(websocket: WebSocket):
+    """Fact-check over a WebSocket: send {"text": ...} or {"url": ...}, receive the stream events as JSON."""
+    await websocket.accept()
+
+    while True:
+        try:
+            request = await websocket.receive_json()
+            fact_checker = get_fact_checker()
+
+            news_text = request.get("text")
+            if not news_text and request.get("url"):
+                news = await asyncio.to_thread(get_news, request["url"])
+                if news['status'] == 'error':
+                    await websocket.send_json({"event": "error", "data": {"message": news.get('message', 'Unable to fetch the news from the url')}})
+                    continue
+                news_text = news['text']
+            if not news_text:
+                await websocket.send_json({"event": "error", "data": {"message": "Send a 'text' or 'url' field"}})
+                continue
+
+            # Closed as soon as sending fails, not when the generator is collected
+            async with aclosing(fact_check_events(fact_checker, news_text)) as events:
+                async for event in events:
+                    await websocket.send_json(event)
+
+        except WebSocketDisconnect:
+            break
+        except HTTPException as e:
+            await websocket.send_json({"event": "error", "data": {"message": e.detail}})
+        except Exception as e:
+            await websocket.send_json({"event": "error", "data": {"message": str(e)}})
+            break
+
+async def run_fact_check_job(kind: str, payload: dict) -> dict:
+    """Job runner for the background queue, returns the same content as /get-fc-text and /get-fc-url."""
+    return await coalesced_fact_check(kind, payload[kind])
+
+# Started and stopped from the app lifespan in main.py
+job_queue = JobQueue(runner=run_fact_check_job)
+
+async def enqueue_fact_check(kind: str, payload: dict, priority: str) -> JSONResponse:
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
+    try:
+        job_id = await job_queue.submit(kind, payload, priority=priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "queued",
+            "content": {"job_id": job_id, "status_url": f"/jobs/{job_id}"},
+        },
+    )
+
+@input_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@input_router.websocket("/ws/jobs/{job_id}")
+async def job_socket(websocket: WebSocket, job_id: str):
+    """Push the job state on every change until it is done or failed."""
+    await websocket.accept()
+    try:
+        found = False
+        async for job in job_queue.subscribe(job_id):
+            found = True
+            await websocket.send_json(job)
+        if not found:
+            await websocket.send_json({"status": "error", "message": "Job not found"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+def transcribe_audio(audio_path: str) -> str | None:
+    # Transcribe audio (speech_recognition internally uses audioread for mp3 etc.)
+    recognizer = sr.Recognizer()
+
+    try:
+        with sr.AudioFile(audio_path) as source:
+            audio_data = recognizer.record(source)
+            return getattr(recognizer, 'recognize_google')(audio_data)  # type: ignore
+    except sr.UnknownValueError:
+        logger.error("Google Speech Recognition could not understand audio")
+    except sr.RequestError as e:
+        logger.error(f"Could not request results from Google Speech Recognition service; {e}")
+    except Exception as e:
+        logger.error(f"Error transcribing audio: {str(e)}")
+    return None
+
 @input_router.post("/get-fc-audio")
 async def get_fc_audio(file: UploadFile = File(...)):
     """
@@ -122,23 +278,8 @@ async def get_fc_audio(file: UploadFile = File(...)):
             audio_path = temp_file.name
 
         try:
-            # Transcribe audio (speech_recognition internally uses audioread for mp3 etc.)
-            recognizer = sr.Recognizer()
-            transcribed_text = None
-
-            try:
-                with sr.AudioFile(audio_path) as source:
-                    audio_data = recognizer.record(source)
-                    transcribed_text = getattr(recognizer, 'recognize_google')(audio_data)  # type: ignore
-            except sr.UnknownValueError:
-                logger.error("Google Speech Recognition could not understand audio")
-                transcribed_text = None
-            except sr.RequestError as e:
-                logger.error(f"Could not request results from Google Speech Recognition service; {e}")
-                transcribed_text = None
-            except Exception as e:
-                logger.error(f"Error transcribing audio: {str(e)}")
-                transcribed_text = None
+            # Transcription reads the file and calls Google synchronously, keep it off the event loop
+            transcribed_text = await asyncio.to_thread(transcribe_audio, audio_path)
 
             if not transcribed_text:
                 return {
@@ -157,8 +298,8 @@ async def get_fc_audio(file: UploadFile = File(...)):
                 )
 
             fact_checker = FactChecker(groq_api_key=groq_api_key, serper_api_key=serper_api_key)
-            fact_check_result = fact_checker.generate_report(transcribed_text)
-            explanation = explain_factcheck_result(fact_check_result)
+            fact_check_result = await fact_checker.agenerate_report(transcribed_text)
+            explanation = await aexplain_factcheck_result(fact_check_result)
 
             return {
                 "status": "success",
@@ -173,7 +314,7 @@ async def get_fc_audio(file: UploadFile = File(...)):
             # cleanup
             if os.path.exists(audio_path):
                 try:
-                    time.sleep(0.2)
+                    await asyncio.sleep(0.2)
                     os.remove(audio_path)
                 except Exception as cleanup_err:
                     logger.warning(f"Could not delete temp file {audio_path}: {cleanup_err}")
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Caches and indexes of the modules under test go to a throwaway directory,
+# and no process-wide cache is shared between tests
+os.environ["FC_CACHE_DIR"] = tempfile.mkdtemp(prefix="fc-tests-")
+for switch in ("FC_CLAIM_CACHE", "FC_SERPER_CACHE", "FC_PAGE_CACHE", "FC_EVIDENCE_INDEX"):
+    os.environ.setdefault(switch, "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+import pytest
+
+from fc.claim_cache import ClaimCache, claim_signature, normalize_claim
+
+
+class Embedder:
+    """Embeds texts by their first word, counting the calls."""
+
+    VECTORS = {"cats": [1.0, 0.0, 0.0], "felines": [0.99, 0.05, 0.0], "dogs": [0.0, 1.0, 0.0]}
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [self.VECTORS.get(text.split()[0].lower(), [0.0, 0.0, 1.0]) for text in texts]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "claims.sqlite3")
+
+
+def test_normalize_claim():
+    assert normalize_claim("  The Moon,   is MADE of cheese! ") == "the moon is made of cheese"
+
+
+def test_claim_signature():
+    assert claim_signature(normalize_claim("Unemployment rose 3.5% in 2023")) == ([3, 5, 2023], 0)
+    assert claim_signature(normalize_claim("X didn't win, nor did Y")) == ([], 2)
+
+
+def test_exact_hit_and_miss(cache_path):
+    cache = ClaimCache(path=cache_path)
+    cache.put("The sky is blue.", {"verdict": 1})
+    assert cache.get("the sky is blue") == {"verdict": 1}
+    assert cache.get("the sky is green") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "semantic_hits": 0, "misses": 1}
+
+
+def test_misses_are_embedded_in_one_call(cache_path):
+    embed = Embedder()
+    cache = ClaimCache(path=cache_path, embed_fn=embed)
+    cache.get("cats purr")
+    cache.put("cats purr", {"verdict": "purr"})
+    embed.calls.clear()
+    values = cache.get_many(["cats purr", "felines purr loudly", "dogs bark", "zebras"])
+    assert values == [{"verdict": "purr"}, {"verdict": "purr"}, None, None]
+    assert embed.calls == [["felines purr loudly", "dogs bark", "zebras"]]
+    assert cache.semantic_hits == 1
+
+
+def test_async_lookup_runs_sync_embedder_in_thread(cache_path):
+    embed = Embedder()
+    cache = ClaimCache(path=cache_path, embed_fn=embed)
+    cache.get("cats purr")
+    cache.put("cats purr", {"verdict": "purr"})
+    embed.calls.clear()
+    values = asyncio.run(cache.aget_many(["felines purr", "dogs bark"]))
+    assert values == [{"verdict": "purr"}, None]
+    assert embed.calls == [["felines purr", "dogs bark"]]
+
+
+def test_embedding_of_a_miss_is_stored_by_put(cache_path):
+    embed = Embedder()
+    cache = ClaimCache(path=cache_path, embed_fn=embed)
+    assert cache.get("dogs bark") is None
+    cache.put("dogs bark", {"verdict": "bark"})
+    assert cache.get("dogs howl at night") == {"verdict": "bark"}
+
+
+def test_similarity_matrix_is_cached_and_invalidated_on_put(cache_path):
+    cache = ClaimCache(path=cache_path, embed_fn=Embedder())
+    cache.get("cats purr")
+    cache.put("cats purr", {"verdict": "purr"})
+    cache.get("felines purr")
+    matrix = cache._matrix
+    assert matrix is not None
+    cache.get("felines meow")
+    assert cache._matrix is matrix
+    cache.get("dogs bark")
+    cache.put("dogs bark", {"verdict": "bark"})
+    assert cache._matrix is None
+    assert cache.get("dogs woof") == {"verdict": "bark"}
+
+
+def test_last_access_is_written_in_batches(cache_path, monkeypatch):
+    cache = ClaimCache(path=cache_path, embed_fn=Embedder())
+    cache.get("cats purr")
+    cache.put("cats purr", {"verdict": "purr"})
+    written = cache._db.execute("SELECT last_access FROM claims").fetchone()[0]
+
+    time.sleep(0.01)
+    assert cache.get("felines purr") == {"verdict": "purr"}
+    assert cache._db.execute("SELECT last_access FROM claims").fetchone()[0] == written
+
+    cache.flush()
+    assert cache._db.execute("SELECT last_access FROM claims").fetchone()[0] > written
+
+
+def test_expired_entries_are_dropped(cache_path):
+    cache = ClaimCache(path=cache_path, ttl=0.05, embed_fn=Embedder())
+    cache.get("cats purr")
+    cache.put("cats purr", {"verdict": "purr"})
+    time.sleep(0.1)
+    assert cache.get("cats purr") is None
+    assert cache.get("felines purr") is None
+    cache.flush()
+    assert cache._db.execute("SELECT COUNT(*) FROM claims").fetchone()[0] == 0
+
+
+def test_lru_eviction_and_persistence(cache_path):
+    cache = ClaimCache(path=cache_path, max_entries=2)
+    cache.put("one", {"n": 1})
+    cache.put("two", {"n": 2})
+    cache.get("one")
+    cache.put("three", {"n": 3})
+    assert cache.get("two") is None
+
+    reloaded = ClaimCache(path=cache_path, max_entries=2)
+    assert reloaded.get("one") == {"n": 1}
+    assert reloaded.get("three") == {"n": 3}
+
+
+def test_failing_embedder_is_a_miss(cache_path):
+    def fail(texts):
+        raise RuntimeError("quota")
+
+    cache = ClaimCache(path=cache_path, embed_fn=fail)
+    assert cache.get_many(["cats", "dogs"]) == [None, None]
+    assert cache.misses == 2
+
+
+def test_paraphrase_with_another_number_or_negation_is_not_served(cache_path):
+    cache = ClaimCache(path=cache_path, embed_fn=Embedder())
+    cache.get("cats rose 3% in 2023")
+    cache.put("cats rose 3% in 2023", {"verdict": "True"})
+
+    assert cache.get("felines rose 3% in 2023") == {"verdict": "True"}
+    assert cache.get("felines rose 5% in 2023") is None
+    assert cache.get("felines rose 3% in 2024") is None
+    assert cache.get("felines did not rise 3% in 2023") is None
+    assert cache.get("felines didn't rise 3% in 2023") is None
+
+
+def test_aput_stores_the_verdict(cache_path):
+    cache = ClaimCache(path=cache_path)
+    asyncio.run(cache.aput("The sky is blue.", {"verdict": 1}))
+    assert ClaimCache(path=cache_path).get("the sky is blue") == {"verdict": 1}
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from fc.coalesce import SingleFlight, canonical_url, text_key, url_key
+
+
+def test_text_key_ignores_case_and_whitespace():
+    assert text_key("Breaking  News\n today") == text_key("breaking news today")
+    assert text_key("breaking news") != text_key("breaking news today")
+
+
+def test_canonical_url():
+    assert canonical_url("HTTPS://WWW.Example.com/a/?utm_source=x&b=2&a=1#top") == "https://example.com/a?a=1&b=2"
+    assert url_key("https://example.com/a/") == url_key("https://www.example.com/a?fbclid=1")
+    assert url_key("https://example.com/a") != url_key("https://example.com/b")
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "report"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", compute) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["report"] * 5
+    assert len(calls) == 1
+    assert flight.shared == 4
+
+
+def test_failures_are_not_retained():
+    flight = SingleFlight()
+    attempts = []
+
+    async def compute():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("llm down")
+        return "ok"
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await flight.do("k", compute)
+        return await flight.do("k", compute)
+
+    assert asyncio.run(run()) == "ok"
+    assert len(attempts) == 2
+
+
+def test_results_expire_after_retain_seconds():
+    flight = SingleFlight(retain_seconds=0.01)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        first = await flight.do("k", compute)
+        await asyncio.sleep(0)
+        second = await flight.do("k", compute)
+        await asyncio.sleep(0.02)
+        third = await flight.do("k", compute)
+        return first, second, third
+
+    assert asyncio.run(run()) == (1, 1, 2)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_computation():
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", compute))
+        second = asyncio.ensure_future(flight.do("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
@@ -0,0 +1,280 @@
+import asyncio
+import sqlite3
+import threading
+
+import httpx
+
+import fc.crawler as crawler_module
+from fc.crawler import AnchorWatcher, Crawler
+from fc.fetch_scheduler import FETCH_MIN_SAMPLES, FetchScheduler
+from fc.page_cache import PageCache
+
+ANCHOR = "the committee approved the budget on tuesday"
+
+
+def feed_all(watcher, chunks):
+    return [watcher.feed(chunk) for chunk in chunks]
+
+
+def test_anchor_in_visible_text_stops_after_post_context():
+    watcher = AnchorWatcher([ANCHOR], post_context=20)
+    assert feed_all(watcher, [f"<p>{ANCHOR.title()}.</p>", "<p>" + "x " * 20 + "</p>"]) == [False, True]
+
+
+def test_script_and_style_contents_are_not_visible():
+    watcher = AnchorWatcher([ANCHOR], post_context=20)
+    page = (
+        f"<html><head><title>{ANCHOR}</title><style>body {{ content: '{ANCHOR}' }}</style></head>"
+        f"<body><script>var s = '{ANCHOR}' + '{'y ' * 50}';</script><!-- {ANCHOR} --><p>unrelated</p>"
+    )
+    assert watcher.feed(page) is False
+    assert "committee" not in watcher.text
+    assert watcher.text == "unrelated"
+
+
+def test_blocks_split_across_chunks_are_skipped():
+    watcher = AnchorWatcher([ANCHOR], post_context=0)
+    chunks = ["<p>before</p><scr", "ipt type='x'>var a = '", ANCHOR, "';</scr", "ipt ><p>after", "</p>"]
+    assert not any(feed_all(watcher, chunks))
+    assert watcher.text == "before after"
+
+
+def test_header_element_is_visible():
+    watcher = AnchorWatcher([ANCHOR], post_context=0)
+    assert watcher.feed(f"<header>{ANCHOR}</header>") is True
+
+
+def test_unfinished_tag_is_kept_for_the_next_chunk():
+    watcher = AnchorWatcher(["alpha beta"], post_context=0)
+    watcher.feed("<p>alpha <a hr")
+    assert "hr" not in watcher.text
+    assert watcher.feed('ef="/x">beta</a></p>') is True
+
+
+class BrokenPageCache:
+    hits = revalidated = misses = 0
+
+    def get(self, url):
+        raise sqlite3.OperationalError("database is locked")
+
+    def touch(self, url):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def run_fetch(handler, url, crawler=None):
+    crawler = crawler or Crawler()
+
+    async def fetch():
+        await crawler._open()
+        await crawler._client.aclose()
+        crawler._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await crawler._fetch(url)
+        finally:
+            await crawler._close()
+
+    return asyncio.run(fetch())
+
+
+def test_page_cache_error_counts_as_a_miss(monkeypatch):
+    monkeypatch.setattr(crawler_module, "get_page_cache", lambda: BrokenPageCache())
+    ok, page = run_fetch(
+        lambda request: httpx.Response(200, headers={"content-type": "text/html"}, text="<p>fresh</p>"),
+        "https://example.com/a",
+    )
+    assert ok
+    assert page.text == "<p>fresh</p>"
+    assert not page.extracted
+
+
+def test_cache_lookup_runs_off_the_crawler_loop(monkeypatch):
+    loop_threads = []
+
+    class RecordingCache(BrokenPageCache):
+        def get(self, url):
+            loop_threads.append(threading.current_thread())
+            return None
+
+    monkeypatch.setattr(crawler_module, "get_page_cache", lambda: RecordingCache())
+    run_fetch(lambda request: httpx.Response(200, text="ok"), "https://example.com/b")
+    assert loop_threads and loop_threads[0] is not threading.main_thread()
+
+
+async def slow_body(parts, delay):
+    for part in parts:
+        await asyncio.sleep(delay)
+        yield part
+
+
+def test_scheduler_records_time_to_headers_only():
+    scheduler = FetchScheduler(hedge=False)
+    crawler = Crawler(scheduler=scheduler)
+
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "text/html"}, content=slow_body([b"<p>a</p>"] * 3, 0.1))
+
+    ok, page = run_fetch(handler, "https://slow-body.example/", crawler)
+    assert ok and page.text == "<p>a</p>" * 3
+    (latency,) = scheduler.domains["slow-body.example"].latencies
+    assert latency < 0.1
+
+
+def test_losing_hedge_is_cancelled_once_headers_arrive():
+    scheduler = FetchScheduler(min_hedge_delay=0.05)
+    for _ in range(FETCH_MIN_SAMPLES):
+        scheduler.record("hedged.example", 0.01, ok=True)
+    crawler = Crawler(scheduler=scheduler)
+    requests = []
+    cancelled = []
+
+    async def handler(request):
+        requests.append(request)
+        if len(requests) == 1:
+            try:
+                await asyncio.sleep(2)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        # The winner's body is slower than the hedge delay, the race is over by then
+        return httpx.Response(200, headers={"content-type": "text/html"}, content=slow_body([b"<p>b</p>"] * 2, 0.1))
+
+    ok, page = run_fetch(handler, "https://hedged.example/", crawler)
+    assert ok and page.text == "<p>b</p>" * 2
+    assert len(requests) == 2
+    assert cancelled == [True]
+    assert scheduler.hedge_wins == 1
+
+
+def test_idle_host_slots_are_bounded(monkeypatch):
+    monkeypatch.setattr(crawler_module, "CRAWL_MAX_HOSTS", 2)
+    crawler = Crawler()
+    crawler._host_users["busy"] += 1
+    for host in ("busy", "a", "b", "c"):
+        crawler._host_slot(host)
+    assert list(crawler._host_slots) == ["busy", "c"]
+
+
+def open_breaker(scheduler, host):
+    for _ in range(scheduler.breaker_failures):
+        scheduler.record(host, 0.0, ok=False)
+
+
+def test_open_breaker_serves_the_stale_cached_page(monkeypatch):
+    cache = PageCache(path=":memory:", fresh_seconds=0)
+    cache.put("https://down.example/a", "Stale text", etag='"v1"')
+    monkeypatch.setattr(crawler_module, "get_page_cache", lambda: cache)
+    scheduler = FetchScheduler()
+    open_breaker(scheduler, "down.example")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(500)
+
+    ok, page = run_fetch(handler, "https://down.example/a", Crawler(scheduler=scheduler))
+    assert ok and page.extracted and page.text == "Stale text"
+    assert requests == []
+
+    ok, page = run_fetch(handler, "https://down.example/uncached", Crawler(scheduler=scheduler))
+    assert (ok, page) == (False, None)
+    assert requests == []
+
+
+def html_handler(seen):
+    def handler(request):
+        seen.append((str(request.url), threading.current_thread().name))
+        return httpx.Response(200, headers={"content-type": "text/html"}, text=f"<p>{request.url.path}</p>")
+
+    return handler
+
+
+def test_start_crawl_stop_lifecycle():
+    seen = []
+    crawler = Crawler(transport=httpx.MockTransport(html_handler(seen)))
+    crawler.start()
+    thread = crawler._thread
+    crawler.start()
+    assert crawler.running and crawler._thread is thread and thread.is_alive()
+
+    results = crawler.crawl({"q1": ["https://a.example/1"], "q2": ["https://b.example/2"]})
+    assert [(ok, page.text, url, query) for ok, page, url, query in results] == [
+        (True, "<p>/1</p>", "https://a.example/1", "q1"),
+        (True, "<p>/2</p>", "https://b.example/2", "q2"),
+    ]
+    assert {name for _, name in seen} == {"crawler"}
+
+    client = crawler._client
+    crawler.stop()
+    assert not crawler.running
+    assert client.is_closed
+    assert not thread.is_alive()
+    crawler.stop()
+
+    # Started again on the next crawl
+    assert crawler.crawl({"q": ["https://a.example/3"]})[0][1].text == "<p>/3</p>"
+    crawler.stop()
+
+
+def test_acrawl_from_another_event_loop():
+    seen = []
+    crawler = Crawler(transport=httpx.MockTransport(html_handler(seen)))
+
+    async def crawl_twice():
+        return await asyncio.gather(
+            crawler.acrawl({"q": ["https://a.example/1"]}), crawler.acrawl({"q": ["https://a.example/2"]})
+        )
+
+    try:
+        first, second = asyncio.run(crawl_twice())
+        # A second caller loop shares the same crawler loop and client
+        third = asyncio.run(crawler.acrawl({"q": ["https://a.example/3"]}))
+    finally:
+        crawler.stop()
+    assert [result[0][1].text for result in (first, second, third)] == ["<p>/1</p>", "<p>/2</p>", "<p>/3</p>"]
+    assert {name for _, name in seen} == {"crawler"}
+
+
+def test_get_crawler_is_shared_and_started_lazily(monkeypatch):
+    monkeypatch.setattr(crawler_module, "_crawler", None)
+    crawler = crawler_module.get_crawler()
+    assert crawler_module.get_crawler() is crawler
+    assert not crawler.running
+
+
+def test_bodies_are_cut_at_the_byte_cap(monkeypatch):
+    monkeypatch.setattr(crawler_module, "PDF_MAX_BYTES", 300)
+
+    def handler(request):
+        if request.url.path.endswith(".pdf"):
+            return httpx.Response(200, headers={"content-type": "application/pdf"}, content=b"%PDF" + b"x" * 5000)
+        return httpx.Response(200, headers={"content-type": "text/html"}, content=b"a" * 5000)
+
+    ok, page = run_fetch(handler, "https://big.example/page", Crawler(max_bytes=1000))
+    assert ok and page.truncated and page.text == "a" * 1000
+
+    ok, page = run_fetch(handler, "https://big.example/doc.pdf", Crawler(max_bytes=1000))
+    assert ok and page.truncated and page.text == "" and len(page.pdf) == 300
+
+
+def test_bodies_are_cut_at_the_read_deadline():
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "text/html"}, content=slow_body([b"<p>x</p>"] * 20, 0.02))
+
+    crawler = Crawler(max_read_seconds=0.1, scheduler=FetchScheduler(hedge=False))
+    ok, page = run_fetch(handler, "https://slow.example/", crawler)
+    assert ok and page.truncated
+    assert 0 < page.text.count("<p>x</p>") < 20
+
+
+def test_each_distinct_url_is_fetched_once():
+    seen = []
+    crawler = Crawler(transport=httpx.MockTransport(html_handler(seen)))
+    try:
+        results = crawler.crawl({"q1": ["https://a.example/1", "https://a.example/2"], "q2": ["https://a.example/1"]})
+    finally:
+        crawler.stop()
+    assert sorted(url for url, _ in seen) == ["https://a.example/1", "https://a.example/2"]
+    assert [(url, query) for _, _, url, query in results] == [
+        ("https://a.example/1", "q1"), ("https://a.example/2", "q1"), ("https://a.example/1", "q2")
+    ]
+    assert results[0][1] is results[2][1]
@@ -0,0 +1,169 @@
+import sqlite3
+import time
+
+import pytest
+
+from fc.evidence_index import EvidenceIndex, split_passages
+from fc.serper_search import SerperEvidenceRetriever
+
+PAGES = {
+    "https://a.example/1": "The city council approved the new transit budget on Tuesday after a long debate.",
+    "https://b.example/2": "Council members approved the transit budget on Tuesday, local reporters said.",
+    "https://c.example/3": "On Tuesday the council approved a transit budget of four million dollars.",
+    "https://d.example/4": "Gardening tips for the spring season, with tulips and roses.",
+}
+
+
+class Embedder:
+    """Embeds texts by whether they mention gardening, counting the calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[1.0, 0.0] if "garden" in text.lower() else [0.0, 1.0] for text in texts]
+
+
+@pytest.fixture(params=["memory", "file"])
+def index(request, tmp_path):
+    path = ":memory:" if request.param == "memory" else str(tmp_path / "index.sqlite3")
+    index = EvidenceIndex(path=path)
+    for url, text in PAGES.items():
+        index.add_page(url, text)
+    return index
+
+
+def test_split_passages_overlap():
+    text = " ".join(str(i) for i in range(10))
+    assert split_passages(text, 4) == ["0 1 2 3", "2 3 4 5", "4 5 6 7", "6 7 8 9"]
+    assert split_passages("", 4) == []
+
+
+def test_search_ranks_by_bm25_one_passage_per_page(index):
+    hits = index.search("council approved transit budget tuesday", top_k=5)
+    assert {hit["url"] for hit in hits} == {"https://a.example/1", "https://b.example/2", "https://c.example/3"}
+    assert all(hit["coverage"] == 1.0 for hit in hits)
+    assert hits == sorted(hits, key=lambda hit: hit["score"], reverse=True)
+
+
+def test_lookup_needs_top_k_well_covered_passages(index):
+    assert len(index.lookup("council approved transit budget", top_k=3)) == 3
+    assert index.lookup("council approved transit budget", top_k=4) is None
+    assert index.lookup("tulips council volcano eruption", top_k=1) is None
+    assert index.stats()["hits"] == 1
+    assert index.stats()["misses"] == 2
+
+
+def test_lookup_many_keeps_query_order(index):
+    results = index.lookup_many(["spring gardening tulips roses", "zeppelin", "council transit budget"], top_k=1)
+    assert results[0][0]["url"] == "https://d.example/4"
+    assert results[1] is None
+    assert results[2] is not None
+
+
+def test_empty_index_answers_without_searching(tmp_path):
+    index = EvidenceIndex(path=str(tmp_path / "empty.sqlite3"))
+    index._lexical = None  # any search would fail
+    assert index.lookup_many(["anything", "at all"]) == [None, None]
+    assert index.stats()["misses"] == 2
+
+
+def test_reindexing_a_page_replaces_its_passages(index):
+    index.add_page("https://d.example/4", "Volcano eruption reported near the coast.")
+    assert index.search("tulips roses", top_k=1) == []
+    assert index.search("volcano eruption", top_k=1)[0]["url"] == "https://d.example/4"
+    assert index.stats()["pages"] == 4
+
+
+def test_oldest_pages_are_evicted(tmp_path):
+    index = EvidenceIndex(path=str(tmp_path / "small.sqlite3"), max_pages=2)
+    for url, text in PAGES.items():
+        index.add_page(url, text)
+    assert index.stats()["pages"] == 2
+    assert index.search("council approved", top_k=3)[0]["url"] == "https://c.example/3"
+    df = dict(index._db.execute("SELECT term, df FROM terms"))
+    assert df["council"] == 1
+    assert "debate" not in df
+
+
+def test_index_persists_and_replaces_older_layouts(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    old = sqlite3.connect(path)
+    old.execute("CREATE TABLE postings (term TEXT, passage_id INTEGER, tf INTEGER, length INTEGER)")
+    old.commit()
+    old.close()
+
+    index = EvidenceIndex(path=path)
+    index.add_page("https://a.example/1", PAGES["https://a.example/1"])
+    reopened = EvidenceIndex(path=path)
+    assert reopened.stats()["pages"] == 1
+    assert reopened.search("transit budget", top_k=1)[0]["url"] == "https://a.example/1"
+
+
+def test_dense_queries_are_embedded_in_one_call(tmp_path):
+    embed = Embedder()
+    index = EvidenceIndex(path=str(tmp_path / "dense.sqlite3"), embed_fn=embed)
+    for url, text in PAGES.items():
+        index.add_page(url, text)
+    assert len(embed.calls) == len(PAGES)
+    embed.calls.clear()
+    results = index.lookup_many(["gardening", "council budget", "transit"], top_k=1, min_coverage=0.0)
+    assert embed.calls == [["gardening", "council budget", "transit"]]
+    assert results[0][0]["url"] == "https://d.example/4"
+
+
+def test_retriever_skips_serper_for_queries_answered_locally(index, monkeypatch):
+    retriever = SerperEvidenceRetriever(api_key="test", serper_cache=None, evidence_index=index)
+    sent = []
+    monkeypatch.setattr(
+        retriever, "_serper_evidences", lambda queries, top_k, extend: sent.append(queries) or [[] for _ in queries]
+    )
+    evidences = retriever._retrieve_evidence_4_all_claim(["council approved transit budget", "moon landing"], top_k=3)
+    assert sent == [["moon landing"]]
+    assert len(evidences[0]) == 3
+    assert evidences[1] == []
+
+
+def test_common_terms_are_left_out_of_the_match_only(tmp_path, monkeypatch):
+    monkeypatch.setattr("fc.evidence_index.INDEX_COMMON_TERM_MIN_DF", 0)
+    index = EvidenceIndex(path=str(tmp_path / "common.sqlite3"))
+    for i in range(20):
+        index.add_page(f"https://filler.example/{i}", f"budget report number {i}")
+    index.add_page("https://a.example/1", PAGES["https://a.example/1"])
+    hits = index.search("budget council", top_k=1, min_coverage=1.0)
+    assert hits[0]["url"] == "https://a.example/1"
+    # "budget" is in every passage: it is not matched, but still counts for coverage
+    assert hits[0]["coverage"] == 1.0
+    assert index.search("budget", top_k=1)
+
+
+def test_stale_pages_fall_through_to_serper(tmp_path, monkeypatch):
+    index = EvidenceIndex(path=str(tmp_path / "stale.sqlite3"), max_age=0.05)
+    for url, text in PAGES.items():
+        index.add_page(url, text)
+    retriever = SerperEvidenceRetriever(api_key="test", serper_cache=None, evidence_index=index)
+    sent = []
+    monkeypatch.setattr(
+        retriever, "_serper_evidences", lambda queries, top_k, extend: sent.append(queries) or [[] for _ in queries]
+    )
+    assert retriever._retrieve_evidence_4_all_claim(["council approved transit budget"], top_k=3)[0]
+    assert sent == []
+
+    time.sleep(0.1)
+    assert index.search("council approved transit budget", top_k=3) == []
+    retriever._retrieve_evidence_4_all_claim(["council approved transit budget"], top_k=3)
+    assert sent == [["council approved transit budget"]]
+
+
+def test_reindexing_renews_unchanged_pages_and_drops_stale_ones(tmp_path):
+    index = EvidenceIndex(path=str(tmp_path / "renew.sqlite3"), max_age=0.1)
+    index.add_page("https://a.example/1", PAGES["https://a.example/1"])
+    index.add_page("https://d.example/4", PAGES["https://d.example/4"])
+    time.sleep(0.15)
+    index.add_page("https://a.example/1", PAGES["https://a.example/1"])
+    assert index.search("transit budget", top_k=1)[0]["url"] == "https://a.example/1"
+
+    index.add_page("https://b.example/2", PAGES["https://b.example/2"])
+    assert index.stats()["pages"] == 2
+    assert index.search("tulips roses", top_k=1) == []
@@ -0,0 +1,30 @@
+from fc.evidence_ranker import BM25, estimate_tokens, select_evidence, tokenize
+
+
+def test_tokenize_drops_case_punctuation_and_stopwords():
+    assert tokenize("The Moon is made of Cheese!") == ["moon", "made", "cheese"]
+
+
+def test_bm25_prefers_documents_with_rare_query_terms():
+    scores = BM25(["the moon is bright", "cheese is tasty", "moon cheese myths"]).score("moon cheese")
+    assert scores[2] > scores[0] > 0
+    assert scores[2] > scores[1] > 0
+
+
+def test_select_evidence_ranks_dedups_and_keeps_budget():
+    evidence = [
+        {"text": "Unrelated sports results from the weekend."},
+        {"text": "The moon is not made of cheese, NASA says."},
+        {"text": "the moon is not made of cheese, NASA says"},
+        {"text": "Cheese " * 200},
+        {"text": "Moon rocks are basalt."},
+    ]
+    selected = select_evidence("the moon is made of cheese", evidence, token_budget=40)
+    assert selected[0] is evidence[1]
+    assert evidence[2] not in selected
+    assert evidence[3] not in selected
+    assert sum(estimate_tokens(item["text"]) for item in selected) <= 40
+
+
+def test_select_evidence_without_evidence():
+    assert select_evidence("claim", [], token_budget=100) == []
@@ -0,0 +1,328 @@
+import asyncio
+
+import pytest
+
+from fc.fact_checker import Claim, FactChecker
+
+
+def make_claim(statement: str, score: int = 50) -> Claim:
+    return Claim(
+        statement=statement,
+        confidence_score=score,
+        verified_status=score,
+        key_evidence=[],
+        sources=[],
+        worthiness_score=score,
+    )
+
+
+class DictCache:
+    """Claim cache stand-in holding verdicts by claim text."""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.stored = []
+
+    def get_many(self, claims):
+        return [self.values.get(claim) for claim in claims]
+
+    async def aget_many(self, claims):
+        return self.get_many(claims)
+
+    def put(self, claim, value):
+        self.stored.append(claim)
+
+    async def aput(self, claim, value):
+        self.put(claim, value)
+
+
+@pytest.fixture
+def fact_checker(monkeypatch):
+    checker = FactChecker(groq_api_key="test", serper_api_key="test", claim_cache=None)
+    checker.search_client.serper_cache = None
+    checker.search_client.evidence_index = None
+    prompts = []
+    monkeypatch.setattr(checker.llm, "complete_json", lambda stage, prompt: prompts.append(prompt) or {})
+    checker.prompts = prompts
+    return checker
+
+
+def test_report_keeps_duplicate_claims_by_position(fact_checker, monkeypatch):
+    claims = ["A", "B", "A", "C"]
+    monkeypatch.setattr(fact_checker, "extract_claims", lambda text: {"claims": claims})
+    calls = []
+
+    def analyze_claim(claim, evidence_dict=None, check_cache=True):
+        calls.append(claim)
+        if claim == "C":
+            raise RuntimeError("analysis failed")
+        return make_claim(claim, score=len(calls))
+
+    monkeypatch.setattr(fact_checker, "analyze_claim", analyze_claim)
+    report = fact_checker.generate_report("news", max_concurrent_claims=1, batch_questions=False)
+
+    assert calls == ["A", "B", "A", "C"]
+    assert report["claim_errors"] == [{"claim": "C", "error": "analysis failed"}]
+    prompt = fact_checker.prompts[-1]
+    assert prompt.count('"statement": "A"') == 2
+    assert prompt.index('"statement": "A"') < prompt.index('"statement": "B"')
+
+
+def test_report_merges_cached_and_analyzed_claims_in_order(fact_checker, monkeypatch):
+    fact_checker.claim_cache = DictCache({"B": vars(make_claim("B", score=90))})
+    monkeypatch.setattr(fact_checker, "extract_claims", lambda text: {"claims": ["A", "B", "A"]})
+    monkeypatch.setattr(
+        fact_checker, "analyze_claim", lambda claim, evidence_dict=None, check_cache=True: make_claim(claim)
+    )
+    fact_checker.generate_report("news", batch_questions=False)
+
+    prompt = fact_checker.prompts[-1]
+    positions = [prompt.index(f'"statement": "{c}"', start) for c, start in (("A", 0), ("B", 0))]
+    assert positions[0] < positions[1] < prompt.rindex('"statement": "A"')
+
+
+def test_analyze_each_returns_claims_and_errors_by_position(fact_checker, monkeypatch):
+    def analyze_claim(claim, evidence_dict=None, check_cache=True):
+        if claim == "bad":
+            raise ValueError("no")
+        return make_claim(claim)
+
+    monkeypatch.setattr(fact_checker, "analyze_claim", analyze_claim)
+    outcomes = fact_checker._analyze_each(["x", "bad", "y"], max_concurrent_claims=3)
+    assert [outcome.statement for outcome in (outcomes[0], outcomes[2])] == ["x", "y"]
+    assert isinstance(outcomes[1], ValueError) and str(outcomes[1]) == "no"
+    assert fact_checker._analyze_each([]) == []
+
+
+def test_claim_questions_map_matches_text_then_position(fact_checker):
+    claims = ["Water boils at 100C", "The moon is made of cheese"]
+    result = {
+        "claims": [
+            {"claim": "The moon is made of cheese", "questions": ["moon composition"]},
+            {"claim": "Water boils at 100 degrees", "questions": ["boiling point"]},
+        ]
+    }
+    # The second entry is a reworded first claim, but entries are not in claim order
+    assert fact_checker._claim_questions_map(claims, result) == {"The moon is made of cheese": ["moon composition"]}
+
+    result["claims"].reverse()
+    assert fact_checker._claim_questions_map(claims, result) == {
+        "Water boils at 100C": ["boiling point"],
+        "The moon is made of cheese": ["moon composition"],
+    }
+
+
+def test_claim_questions_map_leaves_out_dropped_claims(fact_checker):
+    result = {"claims": [{"claim": "A", "questions": ["a?"]}, {"claim": "B", "questions": []}]}
+    assert fact_checker._claim_questions_map(["A", "B", "C"], result) == {"A": ["a?"]}
+
+
+def test_batched_evidence_falls_back_when_search_fails(fact_checker, monkeypatch):
+    monkeypatch.setattr(
+        fact_checker, "generate_verification_questions_batch", lambda claims: {claim: ["q"] for claim in claims}
+    )
+
+    def fail(claim_queries_dict):
+        raise RuntimeError("serper down")
+
+    monkeypatch.setattr(fact_checker.search_client, "retrieve_evidence", fail)
+    assert fact_checker._batched_evidence(["A"]) is None
+
+
+def test_dropped_claims_get_their_own_questions(fact_checker, monkeypatch):
+    monkeypatch.setattr(fact_checker, "extract_claims", lambda text: {"claims": ["A", "B"]})
+    monkeypatch.setattr(fact_checker, "generate_verification_questions_batch", lambda claims: {"A": ["a?"]})
+    single = []
+    monkeypatch.setattr(
+        fact_checker, "generate_verification_questions", lambda claim: single.append(claim) or {"questions": ["b?"]}
+    )
+    searched = []
+
+    def retrieve_evidence(claim_queries_dict):
+        searched.append(claim_queries_dict)
+        return {claim: [{"text": "t", "url": f"https://{claim}.example"}] for claim in claim_queries_dict}
+
+    monkeypatch.setattr(fact_checker.search_client, "retrieve_evidence", retrieve_evidence)
+    monkeypatch.setattr(fact_checker, "_analysis_prompt", lambda claim, evidence: claim)
+    monkeypatch.setattr(
+        fact_checker.llm,
+        "complete_json",
+        lambda stage, prompt: {"confidence_score": 1, "verified_status": 1, "worthiness_score": 1},
+    )
+    fact_checker.generate_report("news", max_concurrent_claims=1)
+
+    assert single == ["B"]
+    assert searched == [{"A": ["a?"]}, {"B": ["b?"]}]
+
+
+def test_async_batched_evidence_falls_back_when_search_fails(fact_checker, monkeypatch):
+    async def questions(claims):
+        return {claim: ["q"] for claim in claims}
+
+    async def fail(claim_queries_dict):
+        raise RuntimeError("serper down")
+
+    monkeypatch.setattr(fact_checker, "agenerate_verification_questions_batch", questions)
+    monkeypatch.setattr(fact_checker, "asearch_evidence", fail)
+    assert asyncio.run(fact_checker._abatched_evidence(["A"])) is None
+
+
+def test_verdicts_without_evidence_are_not_cached(fact_checker):
+    fact_checker.claim_cache = DictCache()
+    fact_checker._store_claim(make_claim("no evidence"))
+    with_evidence = make_claim("with evidence")
+    with_evidence.key_evidence = [{"text": "t", "url": "https://example.com"}]
+    fact_checker._store_claim(with_evidence)
+    assert fact_checker.claim_cache.stored == ["with evidence"]
+
+
+class AsyncPipeline:
+    """Stubbed LLM and search for the async pipeline, recording what each stage was asked."""
+
+    def __init__(self, claims, delays=None, failing=()):
+        self.claims = claims
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.calls = []
+        self.searched = []
+        self.cancelled = []
+
+    async def acomplete_json(self, stage, prompt):
+        self.calls.append((stage, prompt))
+        if stage == "extract":
+            return {"claims": self.claims}
+        if stage == "questions_batch":
+            asked = [line.split(". ", 1)[1] for line in prompt.splitlines() if line[:1].isdigit()]
+            return {"claims": [{"claim": claim, "questions": [f"{claim}?"]} for claim in asked]}
+        if stage == "questions":
+            return {"questions": [f"{prompt.rsplit(chr(10), 1)[-1]}?"]}
+        if stage == "analyze":
+            claim = prompt.split("Claim: ", 1)[1].split("\n", 1)[0]
+            try:
+                await asyncio.sleep(self.delays.get(claim, 0))
+            except asyncio.CancelledError:
+                self.cancelled.append(claim)
+                raise
+            if claim in self.failing:
+                raise RuntimeError(f"analysis of {claim} failed")
+            return {"confidence_score": 80, "verified_status": 70, "worthiness_score": 5}
+        if stage == "report":
+            return {"summary": "ok"}
+        raise AssertionError(stage)
+
+    async def aretrieve_evidence(self, claim_queries_dict):
+        self.searched.append(claim_queries_dict)
+        return {claim: [{"text": f"{claim} evidence", "url": f"https://{claim}.example"}] for claim in claim_queries_dict}
+
+    def stage_prompts(self, stage):
+        return [prompt for called, prompt in self.calls if called == stage]
+
+
+@pytest.fixture
+def async_pipeline(fact_checker, monkeypatch):
+    def install(claims, **kwargs):
+        pipeline = AsyncPipeline(claims, **kwargs)
+        monkeypatch.setattr(fact_checker.llm, "acomplete_json", pipeline.acomplete_json)
+        monkeypatch.setattr(fact_checker.search_client, "aretrieve_evidence", pipeline.aretrieve_evidence)
+        return pipeline
+
+    return install
+
+
+def report_statements(prompt):
+    return [part.split('"', 1)[0] for part in prompt.split('"statement": "')[1:]]
+
+
+def test_async_report_keeps_claim_order_and_captures_errors(fact_checker, async_pipeline):
+    # The first claim finishes last, the failing one in between
+    pipeline = async_pipeline(["A", "B", "A", "C"], delays={"A": 0.05}, failing={"C"})
+    report = asyncio.run(fact_checker.agenerate_report("news", max_concurrent_claims=4))
+
+    assert report["original_text"] == "news"
+    assert report["detailed_analysis"] == {"summary": "ok"}
+    assert report["claim_errors"] == [{"claim": "C", "error": "analysis of C failed"}]
+    assert report_statements(pipeline.stage_prompts("report")[0]) == ["A", "B", "A"]
+    # One batched question call and one search for all claims
+    assert len(pipeline.stage_prompts("questions_batch")) == 1
+    assert pipeline.stage_prompts("questions") == []
+    assert pipeline.searched == [{"A": ["A?"], "B": ["B?"], "C": ["C?"]}]
+
+
+def test_async_report_merges_cached_claims_and_stores_new_verdicts(fact_checker, async_pipeline):
+    cached = make_claim("B", score=90)
+    fact_checker.claim_cache = DictCache({"B": vars(cached)})
+    pipeline = async_pipeline(["A", "B", "C"], delays={"A": 0.05})
+    report = asyncio.run(fact_checker.agenerate_report("news"))
+
+    assert report["claim_errors"] == []
+    analyzed = [prompt.split("Claim: ", 1)[1].split("\n", 1)[0] for prompt in pipeline.stage_prompts("analyze")]
+    assert sorted(analyzed) == ["A", "C"]
+    assert "B" not in pipeline.stage_prompts("questions_batch")[0]
+    report_prompt = pipeline.stage_prompts("report")[0]
+    assert report_statements(report_prompt) == ["A", "B", "C"]
+    assert '"confidence_score": 90' in report_prompt
+    assert sorted(fact_checker.claim_cache.stored) == ["A", "C"]
+
+
+def test_async_report_falls_back_to_per_claim_questions(fact_checker, async_pipeline, monkeypatch):
+    pipeline = async_pipeline(["A", "B"])
+
+    async def fail(claims):
+        raise RuntimeError("batch failed")
+
+    monkeypatch.setattr(fact_checker, "agenerate_verification_questions_batch", fail)
+    report = asyncio.run(fact_checker.agenerate_report("news", max_concurrent_claims=1))
+
+    assert report["claim_errors"] == []
+    assert len(pipeline.stage_prompts("questions")) == 2
+    assert pipeline.searched == [{"A": ["A?"]}, {"B": ["B?"]}]
+    assert report_statements(pipeline.stage_prompts("report")[0]) == ["A", "B"]
+
+
+def test_async_report_without_claims(fact_checker, async_pipeline):
+    pipeline = async_pipeline([])
+    report = asyncio.run(fact_checker.agenerate_report("news"))
+    assert report["claim_errors"] == []
+    assert [stage for stage, _ in pipeline.calls] == ["extract", "report"]
+
+
+async def collect_events(stream, until=None):
+    events = []
+    async for event in stream:
+        events.append(event)
+        if until is not None and until(event):
+            break
+    return events
+
+
+def test_stream_report_events_arrive_as_verdicts_are_ready(fact_checker, async_pipeline):
+    fact_checker.claim_cache = DictCache({"B": vars(make_claim("B", score=90))})
+    async_pipeline(["A", "B", "C", "D"], delays={"A": 0.1, "D": 0.03}, failing={"D"})
+    events = asyncio.run(collect_events(fact_checker.astream_report("news", max_concurrent_claims=3)))
+
+    assert [event["event"] for event in events] == ["claims", "claim", "claim", "claim_error", "claim", "report"]
+    assert events[0]["data"] == {"claims": ["A", "B", "C", "D"]}
+    assert [(event["data"]["index"], event["data"].get("cached")) for event in events[1:5]] == [
+        (1, True), (2, False), (3, None), (0, False)
+    ]
+    assert events[3]["data"] == {"index": 3, "claim": "D", "error": "analysis of D failed"}
+    report = events[-1]["data"]
+    assert report["claim_errors"] == [{"claim": "D", "error": "analysis of D failed"}]
+    assert report["detailed_analysis"] == {"summary": "ok"}
+
+
+def test_closing_the_stream_cancels_claims_in_flight(fact_checker, async_pipeline):
+    pipeline = async_pipeline(["A", "B"], delays={"A": 5})
+
+    async def run():
+        stream = fact_checker.astream_report("news", max_concurrent_claims=2)
+        events = await collect_events(stream, until=lambda event: event["event"] == "claim")
+        # A client disconnect closes the stream while A is still being analyzed
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return events
+
+    events = asyncio.run(run())
+    assert events[-1]["data"]["statement"] == "B"
+    assert pipeline.cancelled == ["A"]
+    assert pipeline.stage_prompts("report") == []
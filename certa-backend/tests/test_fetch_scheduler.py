@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from fc.fetch_scheduler import FETCH_MIN_SAMPLES, FetchScheduler
+
+
+def warm(scheduler, domain, latency, count=FETCH_MIN_SAMPLES):
+    for _ in range(count):
+        scheduler.record(domain, latency, ok=True)
+
+
+def test_timeout_follows_p95_within_bounds():
+    scheduler = FetchScheduler(default_timeout=3, min_timeout=1, max_timeout=6)
+    assert scheduler.timeout("a.example") == 3
+    warm(scheduler, "a.example", 0.1)
+    assert scheduler.timeout("a.example") == 1
+    warm(scheduler, "b.example", 2.0)
+    assert scheduler.timeout("b.example") == 4
+    warm(scheduler, "c.example", 10.0)
+    assert scheduler.timeout("c.example") == 6
+
+
+def test_breaker_opens_after_consecutive_failures():
+    scheduler = FetchScheduler(breaker_failures=3, breaker_seconds=60)
+    for _ in range(2):
+        scheduler.record("down.example", 1.0, ok=False)
+    assert scheduler.allow("down.example")
+    scheduler.record("down.example", 1.0, ok=False)
+    assert not scheduler.allow("down.example")
+    assert scheduler.stats()["open_circuits"] == 1
+
+
+def test_domain_history_is_bounded():
+    scheduler = FetchScheduler(max_domains=3)
+    for domain in ("a", "b", "c"):
+        scheduler.record(domain, 0.1, ok=True)
+    scheduler.record("a", 0.1, ok=True)
+    scheduler.record("d", 0.1, ok=True)
+    assert list(scheduler.domains) == ["c", "a", "d"]
+
+
+def test_no_hedge_without_history():
+    scheduler = FetchScheduler()
+    assert scheduler.hedge_delay("new.example") is None
+
+
+def test_slow_attempt_is_hedged_and_cancelled():
+    scheduler = FetchScheduler(min_hedge_delay=0.01)
+    warm(scheduler, "slow.example", 0.01)
+    calls = []
+    cancelled = []
+
+    async def attempt():
+        calls.append(len(calls))
+        try:
+            await asyncio.sleep(1 if len(calls) == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return len(calls)
+
+    async def run():
+        result = await scheduler.run("slow.example", attempt)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == 2
+    assert cancelled == [True]
+    assert scheduler.hedged == scheduler.hedge_wins == 1
+
+
+def test_successful_loser_is_discarded():
+    scheduler = FetchScheduler(min_hedge_delay=0.01)
+    warm(scheduler, "tie.example", 0.01)
+    discarded = []
+
+    async def discard(result):
+        discarded.append(result)
+
+    async def run():
+        # Both attempts finish in the same loop iteration
+        ready = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().call_later(0.05, ready.set_result, None)
+        results = iter(["first", "second"])
+
+        async def attempt():
+            result = next(results)
+            await ready
+            return result
+
+        return await scheduler.run("tie.example", attempt, discard=discard)
+
+    winner = asyncio.run(run())
+    assert len(discarded) == 1
+    assert discarded[0] != winner
+
+
+def test_both_attempts_failing_raise_the_first_error():
+    scheduler = FetchScheduler(min_hedge_delay=0.01)
+    warm(scheduler, "bad.example", 0.01)
+    errors = iter([ValueError("first"), ValueError("second")])
+
+    async def attempt():
+        error = next(errors)
+        await asyncio.sleep(0.05)
+        raise error
+
+    with pytest.raises(ValueError, match="first"):
+        asyncio.run(scheduler.run("bad.example", attempt))
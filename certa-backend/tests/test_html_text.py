@@ -0,0 +1,41 @@
+import pytest
+
+import fc.html_text as html_text
+from fc.html_text import ENGINES, extract_text, extract_texts
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>Page title</title><meta name="x" content="y">
+<style>body { color: red }</style></head>
+<body><h1>Rates  rise</h1>
+<script>var hidden = "not text";</script>
+<!-- a comment -->
+<p>The bank raised
+   rates on <b>Wednesday</b>.</p></body></html>"""
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engines_agree_on_visible_text(engine):
+    assert extract_text(PAGE, engine) == "Rates rise The bank raised rates on Wednesday ."
+
+
+def test_empty_and_unknown_engine():
+    assert extract_text("  \n ") == ""
+    assert extract_text("<p>Hello</p>", "no-such-engine") == "Hello"
+
+
+def test_falls_back_to_bs4_when_the_engine_fails(monkeypatch):
+    def broken(html):
+        raise ValueError("cannot parse")
+
+    monkeypatch.setitem(ENGINES, "broken", broken)
+    assert extract_text("<p>Hello</p>", "broken") == "Hello"
+
+
+def test_extract_texts_keeps_order_and_nones(monkeypatch):
+    monkeypatch.setattr(html_text, "HTML_POOL_MIN_CHARS", 40)
+    large = "<p>" + "word " * 20 + "</p>"
+    try:
+        texts = extract_texts(["<p>small</p>", None, large])
+    finally:
+        html_text.shutdown_pool()
+    assert texts == ["small", None, " ".join(["word"] * 20)]
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+import pytest
+
+from fc.job_queue import DONE, FAILED, JobQueue, QueueFullError
+
+
+async def _wait_until_finished(queue, job_id):
+    async for job in queue.subscribe(job_id):
+        pass
+    return job
+
+
+def test_jobs_run_in_priority_order():
+    async def run():
+        ran = []
+        gate = asyncio.Event()
+
+        async def runner(kind, payload):
+            if kind == "gate":
+                await gate.wait()
+            ran.append(kind)
+            return {}
+
+        queue = JobQueue(runner, workers=1, path=":memory:")
+        await queue.start()
+        first = await queue.submit("gate", {})
+        await asyncio.sleep(0)
+        ids = [await queue.submit(kind, {}, priority=kind) for kind in ("low", "normal", "high")]
+        gate.set()
+        for job_id in [first] + ids:
+            await _wait_until_finished(queue, job_id)
+        await queue.stop()
+        return ran
+
+    assert asyncio.run(run()) == ["gate", "high", "normal", "low"]
+
+
+def test_submit_rejects_jobs_beyond_max_depth():
+    async def run():
+        queue = JobQueue(lambda kind, payload: None, workers=0, max_depth=2, path=":memory:")
+        await queue.start()
+        await queue.submit("a", {})
+        await queue.submit("b", {})
+        try:
+            with pytest.raises(QueueFullError):
+                await queue.submit("c", {})
+            assert queue.depth == 2
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_subscribe_follows_a_job_until_it_fails():
+    async def run():
+        async def runner(kind, payload):
+            if payload["fail"]:
+                raise ValueError("no claims found")
+            return {"claims": 2}
+
+        queue = JobQueue(runner, workers=1, path=":memory:")
+        await queue.start()
+        ok = await queue.submit("text", {"fail": False})
+        bad = await queue.submit("text", {"fail": True})
+        statuses = [job["status"] async for job in queue.subscribe(bad)]
+        done = await _wait_until_finished(queue, ok)
+        failed = await queue.get(bad)
+        await queue.stop()
+        return statuses, done, failed
+
+    statuses, done, failed = asyncio.run(run())
+    assert statuses[-1] == FAILED
+    assert done["status"] == DONE and done["result"] == {"claims": 2}
+    assert failed["error"] == "no claims found" and failed["priority"] == "normal"
+
+
+def test_unfinished_jobs_resume_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def run():
+        async def runner(kind, payload):
+            return {"echo": payload["n"]}
+
+        idle = JobQueue(runner, workers=0, path=path)
+        await idle.start()
+        job_id = await idle.submit("text", {"n": 7})
+        await idle.stop()
+
+        queue = JobQueue(runner, workers=1, path=path)
+        await queue.start()
+        job = await _wait_until_finished(queue, job_id)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job["status"] == DONE and job["result"] == {"echo": 7}
+
+
+def test_job_store_runs_off_the_event_loop(monkeypatch):
+    store_threads = []
+    update = JobQueue._update
+
+    def recording_update(self, *args):
+        store_threads.append(threading.current_thread())
+        return update(self, *args)
+
+    monkeypatch.setattr(JobQueue, "_update", recording_update)
+
+    async def run():
+        async def runner(kind, payload):
+            return {}
+
+        queue = JobQueue(runner, workers=1, path=":memory:")
+        await queue.start()
+        job = await _wait_until_finished(queue, await queue.submit("text", {}))
+        await queue.stop()
+        return job
+
+    assert asyncio.run(run())["status"] == DONE
+    assert len(store_threads) == 2
+    assert threading.main_thread() not in store_threads
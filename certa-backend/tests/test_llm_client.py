@@ -0,0 +1,86 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import fc.llm_client as llm_client
+from fc.llm_client import LLMClient, stage_model
+from fc.schemas import STAGE_CONFIGS
+from fc.timing import collect_timings
+
+
+class FakeGroq:
+    def __init__(self, answer):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.answer = answer
+
+    def create(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(self.answer)))])
+
+
+def test_stage_model_defaults_and_overrides(monkeypatch):
+    assert stage_model("analyze") == ("gemini", "gemini-2.0-flash")
+    monkeypatch.setenv("FC_LLM_QUESTIONS", "groq:llama-3.3-70b-versatile")
+    assert stage_model("questions") == ("groq", "llama-3.3-70b-versatile")
+
+
+@pytest.mark.parametrize("spec", ["openai:gpt", "groq:", "gemini"])
+def test_stage_model_rejects_invalid_specs(monkeypatch, spec):
+    monkeypatch.setenv("FC_LLM_EXTRACT", spec)
+    with pytest.raises(ValueError):
+        stage_model("extract")
+
+
+def test_unknown_stage():
+    with pytest.raises(ValueError):
+        stage_model("summarize")
+
+
+def test_groq_stage_is_sent_only_to_groq(monkeypatch):
+    groq = FakeGroq({"claims": ["The sky is green."]})
+    monkeypatch.setenv("FC_LLM_EXTRACT", "groq:llama-3.3-70b-versatile")
+    monkeypatch.setattr(llm_client, "get_groq_client", lambda api_key, async_client=False: groq)
+    monkeypatch.setattr(llm_client, "get_gemini_model", pytest.fail)
+
+    with collect_timings() as timings:
+        answer = LLMClient(groq_api_key="key").complete_json("extract", "Extract the claims.")
+
+    assert answer == {"claims": ["The sky is green."]}
+    (request,) = groq.requests
+    assert request["model"] == "llama-3.3-70b-versatile"
+    assert request["temperature"] == 0.2
+    assert request["response_format"] == {"type": "json_object"}
+    assert request["messages"][0]["content"].startswith("Extract the claims.")
+    assert len(timings.durations["extract"]) == 1
+
+
+def test_gemini_stage_timing_uses_pipeline_stage(monkeypatch):
+    model = SimpleNamespace(generate_content=lambda prompt: SimpleNamespace(text='{"questions": []}'))
+    monkeypatch.setattr(llm_client, "get_gemini_model", lambda stage, model_name=None: model)
+
+    with collect_timings() as timings:
+        answer = LLMClient().complete_json("questions_batch", "Ask.")
+
+    assert answer == {"questions": []}
+    assert list(timings.durations) == ["questions"]
+
+
+def test_every_stage_has_a_config():
+    assert set(STAGE_CONFIGS) == set(llm_client.STAGES)
+
+
+def test_model_handles_and_groq_clients_are_shared(monkeypatch):
+    built = []
+    monkeypatch.setattr(llm_client, "_model_registry", {})
+    monkeypatch.setattr(llm_client.genai, "GenerativeModel", lambda **kwargs: built.append(kwargs) or object())
+
+    first = llm_client.get_gemini_model("analyze")
+    assert llm_client.get_gemini_model("analyze") is first
+    assert llm_client.get_gemini_model("report") is not first
+    assert [kwargs["generation_config"] for kwargs in built] == [STAGE_CONFIGS["analyze"], STAGE_CONFIGS["report"]]
+
+    monkeypatch.setattr(llm_client, "_groq_registry", {})
+    assert llm_client.get_groq_client("key") is llm_client.get_groq_client("key")
+    assert llm_client.get_groq_client("key", async_client=True) is not llm_client.get_groq_client("key")
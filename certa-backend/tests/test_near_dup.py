@@ -0,0 +1,31 @@
+from fc.near_dup import collapse_near_duplicates, minhash, shingles
+
+WIRE = (
+    "The central bank raised interest rates by a quarter point on Wednesday, citing persistent inflation "
+    "in services and a tight labor market, and signalled that further increases remain possible this year."
+)
+
+
+def test_shingles_and_signature_of_identical_texts():
+    assert shingles("a b c d") == shingles("A b, c d!")
+    assert (minhash(shingles(WIRE)) == minhash(shingles(WIRE))).all()
+
+
+def test_syndicated_copies_collapse_into_the_longest():
+    evidence = [
+        {"text": WIRE, "url": "https://a.example/1"},
+        {"text": "Unrelated: the local team won the cup final after extra time.", "url": "https://b.example/2"},
+        {"text": WIRE + " Markets fell.", "url": "https://c.example/3"},
+    ]
+    collapsed = collapse_near_duplicates(evidence)
+    assert [item["url"] for item in collapsed] == ["https://c.example/3", "https://b.example/2"]
+    assert collapsed[0]["corroborating_urls"] == ["https://a.example/1"]
+
+
+def test_distinct_texts_are_kept():
+    evidence = [
+        {"text": WIRE, "url": "https://a.example/1"},
+        {"text": "A storm closed schools across the region for two days.", "url": "https://b.example/2"},
+    ]
+    assert [item["url"] for item in collapse_near_duplicates(evidence)] == ["https://a.example/1", "https://b.example/2"]
+    assert collapse_near_duplicates(evidence[:1]) == evidence[:1]
@@ -0,0 +1,60 @@
+import time
+from types import SimpleNamespace
+
+import fc.page_cache as page_cache
+from fc.page_cache import PageCache, page_texts
+
+
+def test_fresh_then_stale_then_touched():
+    cache = PageCache(path=":memory:", fresh_seconds=0.05)
+    cache.put("https://example.com/a", "Body text", etag='"v1"', truncated=True)
+
+    entry = cache.get("https://example.com/a")
+    assert entry["fresh"] and entry["truncated"]
+    assert entry["text"] == "Body text" and entry["etag"] == '"v1"'
+
+    time.sleep(0.1)
+    assert not cache.get("https://example.com/a")["fresh"]
+    cache.touch("https://example.com/a")
+    assert cache.get("https://example.com/a")["fresh"]
+
+
+def test_misses_expired_pages_and_evicts_least_recently_used():
+    cache = PageCache(path=":memory:", ttl=0.05)
+    cache.put("https://example.com/old", "Old")
+    time.sleep(0.1)
+    assert cache.get("https://example.com/old") is None
+
+    cache = PageCache(path=":memory:", max_entries=2)
+    cache.put("https://example.com/a", "A")
+    time.sleep(0.01)
+    cache.put("https://example.com/b", "B")
+    time.sleep(0.01)
+    cache.get("https://example.com/a")
+    time.sleep(0.01)
+    cache.put("https://example.com/c", "C")
+    assert cache.get("https://example.com/b") is None
+    assert cache.get("https://example.com/a")["text"] == "A"
+    assert cache.stats()["entries"] == 2
+
+
+def test_page_texts_extracts_once_and_caches(monkeypatch):
+    cache = PageCache(path=":memory:")
+    monkeypatch.setattr(page_cache, "get_page_cache", lambda: cache)
+    shared = SimpleNamespace(
+        url="https://example.com/a", text="<html><body><p>Shared page</p></body></html>", headers={"etag": '"v1"'}
+    )
+    cached = SimpleNamespace(url="https://example.com/b", text="Already extracted", extracted=True)
+    responses = [
+        (True, shared, "https://example.com/a", "q1"),
+        (True, shared, "https://example.com/a", "q2"),
+        (True, cached, "https://example.com/b", "q1"),
+        (False, None, "https://example.com/c", "q1"),
+    ]
+
+    texts = page_texts(responses)
+
+    assert texts == ["Shared page", "Shared page", "Already extracted", None]
+    assert cache.get("https://example.com/a")["etag"] == '"v1"'
+    assert cache.get("https://example.com/b") is None
+    assert cache.stats()["entries"] == 1
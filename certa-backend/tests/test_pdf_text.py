@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import fc.pdf_text as pdf_text
+from fc.pdf_text import extract_pdf_text, extract_pdf_texts, shutdown_pool
+
+pypdf = pytest.importorskip("pypdf")
+PageObject = pypdf.PageObject
+
+
+def make_pdf(pages) -> bytes:
+    """A minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def test_extracts_text_up_to_the_page_cap():
+    data = make_pdf(["first page", "second page", "third page"])
+    assert extract_pdf_text(data) == "first page second page third page"
+    assert extract_pdf_text(data, max_pages=2) == "first page second page"
+
+
+def test_truncated_pdf_yields_the_pages_it_holds():
+    data = make_pdf(["kept page", "lost page " * 50])
+    cut = data.index(b"lost page")
+    assert extract_pdf_text(data[:cut]) == "kept page"
+
+
+def test_in_process_extraction_stops_at_the_deadline(monkeypatch):
+    monkeypatch.setattr(pdf_text, "PDF_POOL_WORKERS", 0)
+    data = make_pdf([f"page {i}" for i in range(5)])
+    reads = []
+    extract_text = PageObject.extract_text
+
+    def slow_extract_text(page, *args, **kwargs):
+        reads.append(page)
+        time.sleep(0.1)
+        return extract_text(page, *args, **kwargs)
+
+    monkeypatch.setattr(PageObject, "extract_text", slow_extract_text)
+    texts = extract_pdf_texts([data, None, data], timeout=0.15)
+    assert texts[1] is None
+    assert texts[0].startswith("page 0")
+    assert texts[2] is None
+    assert len(reads) < 5
+
+
+def test_timed_out_workers_are_killed(monkeypatch):
+    shutdown_pool()
+    monkeypatch.setattr(pdf_text, "PDF_POOL_WORKERS", 1)
+    pool = pdf_text._get_pool()
+    worker = pool.submit(os.getpid).result()
+    future = pool.submit(time.sleep, 30)
+    time.sleep(0.5)
+
+    started = time.monotonic()
+    shutdown_pool(kill=True)
+    while worker in {process.pid for process in multiprocessing.active_children()}:
+        assert time.monotonic() - started < 5
+        time.sleep(0.05)
+    assert future.cancelled() or future.done()
+    assert pdf_text._get_pool() is not pool
+    shutdown_pool()
+
+
+def test_pool_extraction_and_timeout():
+    data = make_pdf(["pooled page"])
+    assert extract_pdf_texts([data, None]) == ["pooled page", None]
+    assert extract_pdf_texts([data], timeout=0) == [None]
+    shutdown_pool()
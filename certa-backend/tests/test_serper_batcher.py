@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import backoff
+import pytest
+import requests
+
+import fc.serper_batcher as serper_batcher
+from fc.serper_batcher import SerperBatcher, SerperError, SerperRetryableError, post_serper, search_serper
+
+
+class FakeSerper:
+    """Records the batches sent, failing any batch that holds a poisoned query."""
+
+    def __init__(self, poison=None):
+        self.poison = poison
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, api_key, queries, batch_size):
+        with self.lock:
+            self.batches.append([query["q"] for query in queries])
+        if any(query["q"] == self.poison for query in queries):
+            raise SerperError("bad query")
+        return [{"answer": query["q"]} for query in queries]
+
+
+def submit_together(batcher, callers):
+    return [batcher.submit("key", [{"q": q} for q in queries]) for queries in callers]
+
+
+def test_concurrent_callers_share_a_request_and_dedup():
+    send = FakeSerper()
+    batcher = SerperBatcher(window_ms=50, send=send)
+    futures = submit_together(batcher, [["a", "b"], ["b", "c"]])
+    assert [future.result(timeout=5) for future in futures] == [
+        [{"answer": "a"}, {"answer": "b"}],
+        [{"answer": "b"}, {"answer": "c"}],
+    ]
+    assert send.batches == [["a", "b", "c"]]
+    assert batcher.stats() == {"requests": 1, "queries": 4}
+
+
+def test_failed_batch_is_retried_per_caller():
+    send = FakeSerper(poison="bad")
+    batcher = SerperBatcher(window_ms=50, send=send)
+    good, bad = submit_together(batcher, [["a"], ["bad", "b"]])
+    assert good.result(timeout=5) == [{"answer": "a"}]
+    with pytest.raises(SerperError):
+        bad.result(timeout=5)
+    assert send.batches[0] == ["a", "bad", "b"]
+    assert sorted(send.batches[1:]) == [["a"], ["bad", "b"]]
+
+
+def test_single_caller_failure_is_not_retried():
+    send = FakeSerper(poison="bad")
+    batcher = SerperBatcher(window_ms=1, send=send)
+    with pytest.raises(SerperError):
+        batcher.search("key", [{"q": "bad"}])
+    assert send.batches == [["bad"]]
+
+
+def test_empty_queries_resolve_immediately():
+    assert SerperBatcher(send=FakeSerper()).search("key", []) == []
+
+
+class FakeSession:
+    """Serper session stand-in answering posts from a list of status codes, or echoing the queries."""
+
+    def __init__(self, statuses=(), delays=None):
+        self.statuses = list(statuses)
+        self.delays = delays or {}
+        self.posts = []
+        self.lock = threading.Lock()
+
+    def post(self, url, headers, data, timeout):
+        queries = json.loads(data)
+        with self.lock:
+            self.posts.append([query["q"] for query in queries])
+            status = self.statuses.pop(0) if self.statuses else 200
+        if status == "reset":
+            raise requests.ConnectionError("connection reset")
+        # Not time.sleep, which the tests replace to skip the backoff waits
+        threading.Event().wait(self.delays.get(queries[0]["q"], 0))
+        return SimpleNamespace(
+            status_code=status, text=f"status {status}", json=lambda: [{"answer": query["q"]} for query in queries]
+        )
+
+
+@pytest.fixture
+def session(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(backoff._sync.time, "sleep", sleeps.append)
+
+    def install(*args, **kwargs):
+        session = FakeSession(*args, **kwargs)
+        session.sleeps = sleeps
+        monkeypatch.setattr(serper_batcher, "_session", session)
+        return session
+
+    return install
+
+
+def test_rate_limited_and_failed_connections_are_retried(session):
+    fake = session([429, "reset", 200])
+    assert post_serper("key", [{"q": "a"}]) == [{"answer": "a"}]
+    assert len(fake.posts) == 3
+    assert len(fake.sleeps) == 2
+
+
+def test_client_errors_are_not_retried(session):
+    fake = session([400])
+    with pytest.raises(SerperError) as raised:
+        post_serper("key", [{"q": "a"}])
+    assert not isinstance(raised.value, SerperRetryableError)
+    assert len(fake.posts) == 1 and fake.sleeps == []
+
+
+def test_retries_stop_after_max_tries(session):
+    fake = session([503] * 10)
+    with pytest.raises(SerperRetryableError):
+        post_serper("key", [{"q": "a"}])
+    assert len(fake.posts) == serper_batcher.SERPER_MAX_TRIES
+
+
+def test_chunks_are_sent_in_parallel_and_answers_keep_query_order(session):
+    # The first chunk answers last
+    fake = session(delays={"q0": 0.2, "q100": 0.1, "q200": 0.1})
+    queries = [{"q": f"q{i}"} for i in range(250)]
+    started = time.monotonic()
+    responses = search_serper("key", queries, batch_size=100)
+    assert time.monotonic() - started < 0.35
+    assert [response["answer"] for response in responses] == [query["q"] for query in queries]
+    assert sorted(len(chunk) for chunk in fake.posts) == [50, 100, 100]
@@ -0,0 +1,50 @@
+import time
+
+from fc.serper_cache import SerperCache, serper_key
+
+
+def test_key_ignores_case_spacing_and_explicit_defaults():
+    assert serper_key({"q": "Paris  Climate"}) == serper_key({"q": "paris climate", "num": 10, "autocorrect": True})
+    assert serper_key({"q": "paris"}) != serper_key({"q": "paris", "num": 20})
+
+
+def test_hit_keeps_the_query_as_asked():
+    cache = SerperCache(path=":memory:")
+    cache.put({"q": "paris climate"}, {"organic": [1], "searchParameters": {"q": "paris climate"}})
+
+    miss, hit = cache.get_many([{"q": "berlin"}, {"q": "Paris Climate"}])
+
+    assert miss is None
+    assert hit["organic"] == [1]
+    assert hit["searchParameters"]["q"] == "Paris Climate"
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_expired_responses_are_misses():
+    cache = SerperCache(path=":memory:", ttl=0.05)
+    cache.put({"q": "paris"}, {"organic": []})
+    time.sleep(0.1)
+
+    assert cache.get({"q": "paris"}) is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SerperCache(path=":memory:", max_entries=2)
+    cache.put({"q": "a"}, {"n": 1})
+    time.sleep(0.01)
+    cache.put({"q": "b"}, {"n": 2})
+    time.sleep(0.01)
+    cache.get({"q": "a"})
+    time.sleep(0.01)
+    cache.put({"q": "c"}, {"n": 3})
+
+    assert cache.get({"q": "b"}) is None
+    assert cache.get({"q": "a"}) == {"n": 1, "searchParameters": {"q": "a"}}
+    assert cache.stats()["entries"] == 2
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "serper.sqlite3")
+    SerperCache(path=path).put({"q": "paris"}, {"n": 1})
+
+    assert SerperCache(path=path).get({"q": "paris"})["n"] == 1
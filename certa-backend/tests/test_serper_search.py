@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+from fc.serper_cache import SerperCache
+from fc.serper_search import SerperEvidenceRetriever
+
+
+def retriever():
+    return SerperEvidenceRetriever(api_key="test", serper_cache=None, evidence_index=None)
+
+
+def test_dedup_collapses_case_and_punctuation():
+    queries = ["Did the moon landing happen?", "did the moon  landing happen", "Did the moon-landing happen"]
+    unique, slots = retriever()._dedup_queries(queries)
+    assert unique == ["Did the moon landing happen?"]
+    assert slots == [0, 0, 0]
+
+
+def test_dedup_keeps_stopwords_and_tense():
+    queries = ["Who is the CEO of Acme?", "Who was the CEO of Acme?", "who is CEO of Acme"]
+    unique, slots = retriever()._dedup_queries(queries)
+    assert unique == queries
+    assert slots == [0, 1, 2]
+
+
+def test_dedup_keeps_word_order_and_repeats():
+    queries = ["dog bites man", "man bites dog", "dog dog bites man"]
+    unique, slots = retriever()._dedup_queries(queries)
+    assert unique == queries
+    assert slots == [0, 1, 2]
+
+
+def test_expand_evidences_copies_per_query():
+    evidences = retriever()._expand_evidences([[{"text": "a"}]], [0, 0])
+    assert evidences == [[{"text": "a"}], [{"text": "a"}]]
+    assert evidences[0][0] is not evidences[1][0]
+
+
+def test_async_serper_cache_reads_and_writes_run_off_the_event_loop(monkeypatch):
+    class ThreadRecordingCache(SerperCache):
+        def __init__(self):
+            super().__init__(path=":memory:")
+            self.threads = []
+
+        def get_many(self, queries):
+            self.threads.append(threading.get_ident())
+            return super().get_many(queries)
+
+        def put_many(self, queries, responses):
+            self.threads.append(threading.get_ident())
+            super().put_many(queries, responses)
+
+    def answer(query):
+        return {"searchParameters": {"q": query}, "answerBox": {"answer": query.upper()}}
+
+    cache = ThreadRecordingCache()
+    cache.put({"q": "cached", "autocorrect": False}, answer("cached"))
+    cache.threads.clear()
+    search = SerperEvidenceRetriever(api_key="test", serper_cache=cache, evidence_index=None)
+    sent = []
+
+    async def request(questions):
+        sent.append(questions)
+        return [answer(question) for question in questions]
+
+    monkeypatch.setattr(search, "_arequest_serper_api", request)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        evidences = await search._aserper_evidences(["cached", "fresh"], top_k=3, snippet_extend_flag=False)
+        return loop_thread, evidences
+
+    loop_thread, evidences = asyncio.run(run())
+    assert sent == [["fresh"]]
+    assert [evidence[0]["text"] for evidence in evidences] == ["cached\nAnswer: CACHED", "fresh\nAnswer: FRESH"]
+    assert len(cache.threads) == 2 and loop_thread not in cache.threads
+    assert cache.get({"q": "fresh", "autocorrect": False}) is not None
@@ -0,0 +1,28 @@
+from fc.snippet_anchor import find_anchor
+
+PAGE = (
+    "Home | News | Sport. Posted 12 March 2024. The city council voted on Tuesday to approve the new "
+    "transit budget, which adds three bus lines and extends service hours. Critics said the plan "
+    "ignores cyclists. Related stories: weather, traffic."
+)
+
+
+def test_finds_the_snippet_span():
+    start, end, score = find_anchor(PAGE, "council voted on Tuesday to approve the new transit budget")
+    assert PAGE[start:end] == "council voted on Tuesday to approve the new transit budget"
+    assert score == 1.0
+
+
+def test_tolerates_ellipses_dates_and_spacing():
+    snippet = "Mar 12, 2024 — The city council voted on Tuesday ... adds three bus lines and extends service hours."
+    found = find_anchor(PAGE, snippet)
+    assert found is not None
+    start, end, score = found
+    assert "council voted" in PAGE[start:end]
+    assert PAGE[start:end].endswith("service hours")
+    assert 0.5 <= score < 1.0
+
+
+def test_missing_snippet():
+    assert find_anchor(PAGE, "the mayor resigned after a corruption scandal") is None
+    assert find_anchor(PAGE, "...") is None
@@ -0,0 +1,41 @@
+import threading
+import time
+
+from fc.timing import collect_timings, timed
+
+
+def test_stages_are_collected_from_every_thread():
+    def work():
+        with timed("search"):
+            time.sleep(0.01)
+
+    with collect_timings() as timings:
+        with timed("extract"):
+            pass
+        threads = [threading.Thread(target=work) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(timings.durations["search"]) == 3
+    assert len(timings.durations["extract"]) == 1
+    assert timings.totals()["search"] >= 0.03
+
+
+def test_nothing_is_recorded_outside_a_collector():
+    with collect_timings() as timings:
+        pass
+    with timed("crawl"):
+        pass
+    assert timings.totals() == {}
+
+
+def test_failing_stage_is_still_timed():
+    with collect_timings() as timings:
+        try:
+            with timed("analyze"):
+                raise ValueError
+        except ValueError:
+            pass
+    assert len(timings.durations["analyze"]) == 1
@@ -0,0 +1,145 @@
+import asyncio
+import json
+from contextlib import aclosing
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fc.coalesce import SingleFlight
+
+# The routes module pulls in the news fetching, audio and auth dependencies of the whole app
+user_inputs = pytest.importorskip("routes.user_inputs")
+
+
+class StubFactChecker:
+    """FactChecker stand-in answering with canned reports, recording the texts it was given."""
+
+    def __init__(self):
+        self.texts = []
+        self.error = None
+        self.events = [
+            {"event": "claims", "data": {"claims": ["A"]}},
+            {"event": "claim", "data": {"index": 0, "cached": False, "statement": "A"}},
+            {"event": "report", "data": {"original_text": "news", "claim_errors": []}},
+        ]
+        self.stream_error = None
+        self.stream_closed = False
+
+    async def agenerate_report(self, news_text):
+        self.texts.append(news_text)
+        if self.error is not None:
+            raise self.error
+        return {"original_text": news_text, "detailed_analysis": {"summary": "ok"}, "claim_errors": []}
+
+    async def astream_report(self, news_text):
+        self.texts.append(news_text)
+        try:
+            for event in self.events:
+                yield event
+            if self.stream_error is not None:
+                raise self.stream_error
+        finally:
+            self.stream_closed = True
+
+
+@pytest.fixture
+def checker(monkeypatch):
+    checker = StubFactChecker()
+
+    async def explain(result):
+        return {"explanation": f"explained {result['original_text']}"}
+
+    monkeypatch.setattr(user_inputs, "get_fact_checker", lambda: checker)
+    monkeypatch.setattr(user_inputs, "aexplain_factcheck_result", explain)
+    monkeypatch.setattr(user_inputs, "fact_check_flight", SingleFlight())
+    return checker
+
+
+@pytest.fixture
+def client(checker):
+    app = FastAPI()
+    app.include_router(user_inputs.input_router)
+    return TestClient(app)
+
+
+def test_fact_check_text_runs_the_async_pipeline(client, checker):
+    response = client.post("/get-fc-text", json={"text": "The moon is made of cheese."})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "success",
+        "content": {
+            "fact_check_result": {
+                "original_text": "The moon is made of cheese.",
+                "detailed_analysis": {"summary": "ok"},
+                "claim_errors": [],
+            },
+            "explanation": "explained The moon is made of cheese.",
+        },
+    }
+    assert checker.texts == ["The moon is made of cheese."]
+
+
+def test_fact_check_text_failure_is_a_server_error(client, checker):
+    checker.error = RuntimeError("LLM quota exceeded")
+    response = client.post("/get-fc-text", json={"text": "news"})
+    assert response.status_code == 500
+    assert response.json() == {"detail": "LLM quota exceeded"}
+
+
+def test_fact_check_url_that_cannot_be_fetched(client, checker, monkeypatch):
+    monkeypatch.setattr(user_inputs, "get_news", lambda url: {"status": "error", "message": "404"})
+    response = client.post("/get-fc-url", json={"url": "https://example.com/gone"})
+    assert response.status_code == 200
+    assert response.json()["content"] is None
+    assert checker.texts == []
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_text_stream_sends_events_then_the_explanation(client, checker):
+    response = client.post("/get-fc-text/stream", json={"text": "news"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [name for name, _ in events] == ["claims", "claim", "report", "explanation"]
+    assert events[2][1] == {"original_text": "news", "claim_errors": []}
+    assert events[3][1] == "explained news"
+    assert checker.stream_closed
+
+
+def test_stream_failure_ends_with_an_error_event(client, checker):
+    checker.events = checker.events[:1]
+    checker.stream_error = RuntimeError("extraction failed")
+    events = parse_sse(client.post("/get-fc-text/stream", json={"text": "news"}).text)
+    assert events == [("claims", {"claims": ["A"]}), ("error", {"message": "extraction failed"})]
+
+
+def test_websocket_streams_events_per_request(client, checker):
+    with client.websocket_connect("/ws/fc") as websocket:
+        websocket.send_json({"text": "news"})
+        names = []
+        while not names or names[-1] != "explanation":
+            names.append(websocket.receive_json()["event"])
+        assert names == ["claims", "claim", "report", "explanation"]
+
+        websocket.send_json({})
+        assert websocket.receive_json() == {"event": "error", "data": {"message": "Send a 'text' or 'url' field"}}
+
+
+def test_stopping_the_events_closes_the_pipeline(checker):
+    async def first_event():
+        async with aclosing(user_inputs.fact_check_events(checker, "news")) as events:
+            async for event in events:
+                return event
+
+    assert asyncio.run(first_event())["event"] == "claims"
+    assert checker.stream_closed